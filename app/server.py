@@ -0,0 +1,530 @@
+"""İlk yardım chatbot'unun Streamlit'siz HTTP servisi (ASGI).
+
+Uç noktalar:
+    POST /ask          {"question", "backend"?, "k"?, "timeout"?, "use_cache"?, "session_id"?,
+                        "documents"?, "pages"?} -> JSON cevap
+    POST /ask/stream   aynı gövde -> text/event-stream (delta olayları, sonda "done")
+    GET  /health       backend başına hazır olma durumu; pipeline ve en az bir model hazır değilse 503
+    GET  /metrics      Prometheus metin formatında metrikler
+    GET  /documents    Korpustaki dokümanlar (PDF_DIR verildiyse)
+
+Bloklayan işler (retrieval, Flan-T5, Gemini) `SERVER_MAX_ACTIVE` thread'lik
+havuzda çalışır; event loop yalnızca HTTP ile uğraşır. Flan-T5 tekil
+istekleri micro-batcher üzerinden batch'lenir. Aynı anda en fazla
+`SERVER_MAX_ACTIVE + SERVER_MAX_QUEUE` istek kabul edilir, fazlası 429 alır.
+Her isteğin bir son süresi vardır; süresi dolan istek 504 döner ve henüz
+başlamamışsa hiç çalıştırılmaz. Modeller açılışta arka planda yüklenir; servis
+bu sırada istek kabul eder, henüz hazır olmayan modeli isteyen istek yüklemeyi
+(son süresi içinde) bekler. `session_id` verilen isteklerde takip soruları önceki
+soruyla birleştirilir ve yakın sorularda önceki parçalar yeniden kullanılır
+(oturumlar `SESSION_TTL` sn kullanılmazsa veya toplam `SESSION_MAX_MB` aşılınca atılır).
+`PDF_DIR` verilirse tek PDF yerine dizindeki tüm PDF'lerden oluşan korpus aranır;
+istekler "documents" (doküman kimlikleri) ve "pages" ([ilk, son]) ile daraltılabilir.
+
+Çalıştırma:
+    uvicorn app.server:app --host 0.0.0.0 --port 8000
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from dotenv import load_dotenv
+from rag.metrics import PrometheusSink, get_metrics
+from rag.retrievers import page_range
+from rag.registry import (
+    get_registry, get_pipeline, get_corpus, get_generation_batcher, get_retrieval_batcher, get_answer_cache,
+    get_session_store
+)
+from models.backends import BACKENDS, backend_loader, get_backend
+from models.answer_cache import cached_generate, cached_generate_stream
+from models.intent_router import get_intent_router
+
+load_dotenv()
+
+PDF_PATH = os.getenv("PDF_PATH", os.path.join("data", "ilk-yardim.pdf"))
+CHROMA_DIR = os.getenv("CHROMA_DIR", "chroma_db")
+PDF_DIR = os.getenv("PDF_DIR") or None
+MAX_BODY_BYTES = 64 * 1024
+MAX_SESSION_ID_LENGTH = 128
+# Metrik etiketi olarak kullanılan yollar; diğerleri "other" sayılır (sınırsız seri oluşmasın)
+ROUTES = frozenset({"/health", "/documents", "/metrics", "/ask", "/ask/stream"})
+
+
+class Overloaded(Exception):
+    """Kuyruk dolu (429)"""
+
+
+class DeadlineExceeded(Exception):
+    """İstek son süresi doldu (504)"""
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class Admission:
+    """Çalışan + sırada bekleyen iş sayısını sınırlayan kabul kapısı.
+
+    İş, thread havuzundaki görevi bitene kadar yer tutar; son süresi dolup
+    istemciye 504 dönülse bile arka planda süren iş yeni istekler için yer açmaz.
+    Akışlı isteklerde görev, iptal edilen model üretimi gerçekten durunca biter.
+    """
+
+    def __init__(self, max_active, max_queue):
+        self.limit = max_active + max_queue
+        self.max_active = max_active
+        self._pending = 0
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def enter(self):
+        with self._lock:
+            if self._pending >= self.limit:
+                self.rejected += 1
+                raise Overloaded(f"Sunucu meşgul ({self._pending} iş sırada)")
+            self._pending += 1
+
+    def leave(self):
+        with self._lock:
+            self._pending -= 1
+
+    def stats(self):
+        with self._lock:
+            return {"pending": self._pending, "limit": self.limit, "rejected": self.rejected}
+
+
+class ChatbotService:
+    """HTTP katmanından bağımsız soru-cevap servisi"""
+
+    def __init__(self, pdf_path=PDF_PATH, chroma_dir=CHROMA_DIR, backends=None, max_active=None,
+                 max_queue=None, default_timeout=None, max_timeout=120.0, pdf_dir=PDF_DIR):
+        self.pdf_path = pdf_path
+        self.pdf_dir = pdf_dir
+        self.chroma_dir = chroma_dir
+        names = backends or os.getenv("SERVER_BACKENDS", "flan_t5,gemini").split(",")
+        self.backends = [name.strip() for name in names if name.strip() in BACKENDS]
+        if "gemini" in self.backends and not os.getenv("GEMINI_API_KEY"):
+            print("GEMINI_API_KEY bulunamadı, Gemini devre dışı.")
+            self.backends.remove("gemini")
+        max_active = max_active or int(os.getenv("SERVER_MAX_ACTIVE", "4"))
+        max_queue = max_queue if max_queue is not None else int(os.getenv("SERVER_MAX_QUEUE", "16"))
+        self.default_timeout = default_timeout or float(os.getenv("SERVER_TIMEOUT", "60"))
+        self.max_timeout = max_timeout
+        self.admission = Admission(max_active, max_queue)
+        self.executor = ThreadPoolExecutor(max_workers=max_active, thread_name_prefix="serve")
+        self.registry = get_registry()
+        self.intent_router = get_intent_router()
+        self.metrics = get_metrics()
+        self.sessions = get_session_store(
+            ttl_seconds=float(os.getenv("SESSION_TTL", "1800")),
+            max_bytes=int(float(os.getenv("SESSION_MAX_MB", "32")) * 1024 * 1024)
+        )
+        if not any(isinstance(sink, PrometheusSink) for sink in self.metrics.sinks):
+            self.metrics.add_sink(PrometheusSink())
+
+    # --- yaşam döngüsü ---
+
+    def warmup(self):
+        """Pipeline ve modelleri arka planda yüklemeye başla (bloklamaz)"""
+        loaders = [("pipeline", self.pipeline)]
+        loaders += [(name, backend_loader(name)) for name in self.backends]
+        return self.registry.warmup_async(loaders)
+
+    @property
+    def ready(self):
+        return self.registry.background.is_ready("pipeline") and any(
+            self.registry.background.is_ready(name) for name in self.backends
+        )
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.registry.clear()
+
+    def pipeline(self):
+        if self.pdf_dir:
+            return get_corpus(self.pdf_dir, self.chroma_dir)
+        return get_pipeline(self.pdf_path, self.chroma_dir)
+
+    def model(self, name):
+        return get_backend(name)
+
+    # --- istek işleme ---
+
+    def parse_request(self, body):
+        """İstek gövdesini doğrula; (soru, backend, k, son süre, önbellek, oturum, filtreler) döndür"""
+        question = str(body.get("question") or "").strip()
+        if not question:
+            raise HTTPError(400, "'question' alanı gerekli")
+        backend = body.get("backend") or (self.backends[0] if self.backends else None)
+        if backend not in self.backends:
+            raise HTTPError(400, f"Geçersiz backend: {backend} (kullanılabilir: {', '.join(self.backends)})")
+        state = self.registry.readiness().get(backend)
+        if state is not None and state["status"] == "error":
+            raise HTTPError(503, f"{backend} yüklenemedi: {state['error']}")
+        try:
+            k = int(body.get("k", 3))
+            timeout = min(float(body.get("timeout", self.default_timeout)), self.max_timeout)
+        except (TypeError, ValueError):
+            raise HTTPError(400, "'k' ve 'timeout' sayı olmalı")
+        if not 1 <= k <= 10:
+            raise HTTPError(400, "'k' 1 ile 10 arasında olmalı")
+        session_id = body.get("session_id")
+        if session_id is not None and (not isinstance(session_id, str) or not session_id
+                                       or len(session_id) > MAX_SESSION_ID_LENGTH):
+            raise HTTPError(400, f"'session_id' en fazla {MAX_SESSION_ID_LENGTH} karakterlik bir metin olmalı")
+        return (question, backend, k, time.monotonic() + timeout, bool(body.get("use_cache", True)), session_id,
+                self.parse_filters(body))
+
+    def parse_filters(self, body):
+        """"documents" ve "pages" alanlarını get_contexts_chunks filtrelerine ((ad, değer), ...) çevir"""
+        filters = []
+        documents = body.get("documents")
+        if documents is not None:
+            if not self.pdf_dir:
+                raise HTTPError(400, "'documents' yalnızca korpus modunda (PDF_DIR) kullanılabilir")
+            if not isinstance(documents, list) or not documents or not all(isinstance(d, str) for d in documents):
+                raise HTTPError(400, "'documents' doküman kimliklerinden oluşan bir liste olmalı")
+            known = {entry["id"] for entry in self.pipeline().list_documents()}
+            unknown = [doc_id for doc_id in documents if doc_id not in known]
+            if unknown:
+                raise HTTPError(400, f"Bilinmeyen doküman: {', '.join(unknown)}")
+            filters.append(("documents", tuple(sorted(set(documents)))))
+        pages = body.get("pages")
+        if pages is not None:
+            try:
+                start, end = pages
+                pages = page_range((start, end))
+            except (TypeError, ValueError):
+                raise HTTPError(400, "'pages' [ilk, son] biçiminde olmalı (uçlardan biri null olabilir)")
+            if pages is not None:
+                filters.append(("pages", pages))
+        return tuple(filters)
+
+    def route(self, question):
+        """Sosyal/ret niyetleri için modelsiz cevap; değilse None"""
+        intent = self.intent_router.route(question)
+        if intent:
+            return {"answer": self.intent_router.respond(intent), "intent": intent, "from_cache": False,
+                    "sources": []}
+        return None
+
+    def submit(self, fn, *args):
+        """İşi havuza gönder; kabul kapısından geçemezse Overloaded"""
+        self.admission.enter()
+        try:
+            future = self.executor.submit(fn, *args)
+        except Exception:
+            self.admission.leave()
+            raise
+        future.add_done_callback(lambda _: self.admission.leave())
+        return future
+
+    def answer(self, question, backend, k, deadline, use_cache, session_id=None, filters=()):
+        """Thread havuzunda çalışır: retrieval + üretim (önbellekli)"""
+        _check_deadline(deadline)
+        pipeline = self.pipeline()
+        model = self.model(backend)
+        # İstek sürerken slot yeniden bağlansa da pipeline ve model kapatılmaz
+        with self.registry.lease(pipeline, model):
+            session, query = self._session_query(session_id, question)
+            fetch_context = self._context_fetcher(pipeline, query, k, deadline, session, filters)
+            if backend == "flan_t5":
+                batcher = get_generation_batcher(model, backend)
+                generate = lambda query, context: batcher.process((query, context), timeout=_remaining(deadline))
+            else:
+                generate = model.generate_answer
+            answer, context, from_cache = cached_generate(
+                get_answer_cache(pipeline), _cache_namespace(backend, k, filters), query, fetch_context, generate,
+                skip_cache=not use_cache
+            )
+            return self._result(session, question, query, answer, context, from_cache)
+
+    def answer_stream(self, question, backend, k, deadline, use_cache, emit, cancelled, session_id=None,
+                      filters=()):
+        """Thread havuzunda çalışır: parçaları emit(("delta", metin)) ile, sonucu ("done", sonuç) ile gönderir"""
+        _check_deadline(deadline)
+        pipeline = self.pipeline()
+        model = self.model(backend)
+        with self.registry.lease(pipeline, model):
+            self._stream(pipeline, model, question, backend, k, deadline, use_cache, emit, cancelled, session_id,
+                         filters)
+
+    def _stream(self, pipeline, model, question, backend, k, deadline, use_cache, emit, cancelled, session_id,
+                filters):
+        session, query = self._session_query(session_id, question)
+        # İstemci ayrılınca veya süre dolunca `cancelled` set edilir; model üretimi bir sonraki token'da durur
+        stream = cached_generate_stream(
+            get_answer_cache(pipeline), _cache_namespace(backend, k, filters), query,
+            self._context_fetcher(pipeline, query, k, deadline, session, filters),
+            lambda query, context: model.generate_answer_stream(query, context, stop_event=cancelled),
+            skip_cache=not use_cache
+        )
+        try:
+            while not cancelled.is_set():
+                try:
+                    delta = next(stream)
+                except StopIteration as stop:
+                    answer, context, from_cache = stop.value
+                    emit(("done", self._result(session, question, query, answer, context, from_cache)))
+                    return
+                emit(("delta", delta))
+        finally:
+            # Model akışı üretim thread'i bitene kadar kapanmaz; kabul kapısındaki yer ancak sonra boşalır
+            stream.close()
+
+    def _session_query(self, session_id, question):
+        """(oturum, bağımsız sorgu); oturumsuz isteklerde soru olduğu gibi kullanılır"""
+        if session_id is None:
+            return None, question
+        session = self.sessions.get(session_id)
+        return session, self.sessions.standalone_query(session, question)
+
+    def _result(self, session, question, query, answer, context, from_cache):
+        result = {"answer": answer, "intent": None, "from_cache": from_cache, "sources": _sources(context)}
+        if session is not None:
+            self.sessions.record(session, question, query, answer)
+            result["query"] = query
+        return result
+
+    def _context_fetcher(self, pipeline, query, k, deadline, session=None, filters=()):
+        def search():
+            _check_deadline(deadline)
+            chunks = get_retrieval_batcher(pipeline).process((query, k, filters), timeout=_remaining(deadline))
+            return chunks or "İlgili bilgi bulunamadı."
+
+        def fetch():
+            if session is None:
+                return search()
+            chunks, reused = self.sessions.context(session, query, k, search, pipeline.embed_queries, filters)
+            self.metrics.inc("session_context_total", result="reused" if reused else "searched")
+            return chunks
+        return fetch
+
+    def documents(self):
+        """Korpus dokümanları (tek PDF modunda boş)"""
+        if not self.pdf_dir:
+            return []
+        return [
+            {name: entry.get(name) for name in ("id", "title", "enabled", "pages", "chunks")}
+            for entry in self.pipeline().list_documents()
+        ]
+
+    def health(self):
+        readiness = self.registry.readiness()
+        return {
+            "ready": self.ready,
+            "pipeline": readiness.get("pipeline"),
+            "backends": {name: readiness.get(name) for name in self.backends},
+            "queue": self.admission.stats(),
+            "sessions": self.sessions.stats(),
+            "resources": self.registry.health(),
+        }
+
+
+def _remaining(deadline):
+    return max(0.0, deadline - time.monotonic())
+
+
+def _check_deadline(deadline):
+    if time.monotonic() >= deadline:
+        raise DeadlineExceeded("İstek son süresi doldu")
+
+
+def _cache_namespace(backend, k, filters):
+    """Cevap önbelleği ad alanı: filtreli istekler filtresizlerle karışmaz"""
+    namespace = f"{backend}:k={k}"
+    if filters:
+        namespace += ":" + json.dumps(filters, ensure_ascii=False, separators=(",", ":"))
+    return namespace
+
+
+def _sources(context):
+    if not context or isinstance(context, str):
+        return []
+    return [
+        {"id": chunk.get("id"), "document": chunk.get("document"), "page": chunk.get("page"),
+         "score": chunk.get("score")}
+        for chunk in context if isinstance(chunk, dict)
+    ]
+
+
+class ChatbotApp:
+    """ChatbotService'i saran, çerçevesiz ASGI uygulaması"""
+
+    def __init__(self, service=None):
+        self._service = service
+
+    @property
+    def service(self):
+        if self._service is None:
+            self._service = ChatbotService()
+        return self._service
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+        method, path = scope["method"], scope["path"].rstrip("/") or "/"
+        route = path if path in ROUTES else "other"
+        with self.service.metrics.span("server_request", path=route) as span:
+            try:
+                if method == "GET" and path == "/health":
+                    status = await self._health(send)
+                elif method == "GET" and path == "/documents":
+                    status = await self._documents(send)
+                elif method == "GET" and path == "/metrics":
+                    status = await _send_body(send, 200, self.service.metrics.prometheus_text().encode("utf-8"),
+                                              "text/plain; version=0.0.4; charset=utf-8")
+                elif method == "POST" and path == "/ask":
+                    status = await self._ask(receive, send)
+                elif method == "POST" and path == "/ask/stream":
+                    status = await self._ask_stream(receive, send)
+                else:
+                    status = await _send_json(send, 404, {"error": "Bulunamadı"})
+            except HTTPError as e:
+                status = await _send_json(send, e.status, {"error": e.message})
+            except Overloaded as e:
+                self.service.metrics.inc("server_rejected_total", path=route)
+                status = await _send_json(send, 429, {"error": str(e)}, headers=[(b"retry-after", b"1")])
+            except (DeadlineExceeded, asyncio.TimeoutError, FutureTimeoutError, TimeoutError):
+                status = await _send_json(send, 504, {"error": "İstek son süresi doldu"})
+            except Exception as e:
+                print(f"Sunucu hatası: {e}")
+                status = await _send_json(send, 500, {"error": "Sunucu hatası"})
+            span.set(status_code=status)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                started = self.service.warmup()
+                print(f"⏳ Arka planda yükleniyor: {', '.join(started)}")
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.service.close()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _health(self, send):
+        report = self.service.health()
+        return await _send_json(send, 200 if report["ready"] else 503, report)
+
+    async def _documents(self, send):
+        # Katalog yalnızca korpus açıldıktan sonra okunabilir; açılış sürerken bloklamamak için havuzda
+        future = self.service.submit(self.service.documents)
+        return await _send_json(send, 200, {"documents": await asyncio.wrap_future(future)})
+
+    async def _ask(self, receive, send):
+        question, backend, k, deadline, use_cache, session_id, filters = self.service.parse_request(
+            await _read_json(receive)
+        )
+        started = time.perf_counter()
+        result = self.service.route(question)
+        if result is None:
+            future = self.service.submit(self.service.answer, question, backend, k, deadline, use_cache, session_id,
+                                         filters)
+            result = await asyncio.wait_for(asyncio.wrap_future(future), _remaining(deadline))
+        result.update(backend=backend, seconds=round(time.perf_counter() - started, 3))
+        return await _send_json(send, 200, result)
+
+    async def _ask_stream(self, receive, send):
+        question, backend, k, deadline, use_cache, session_id, filters = self.service.parse_request(
+            await _read_json(receive)
+        )
+        started = time.perf_counter()
+        routed = self.service.route(question)
+        loop = asyncio.get_running_loop()
+        events = asyncio.Queue()
+        cancelled = threading.Event()
+        if routed is None:
+            emit = lambda event: loop.call_soon_threadsafe(events.put_nowait, event)
+
+            def produce():
+                try:
+                    self.service.answer_stream(question, backend, k, deadline, use_cache, emit, cancelled,
+                                               session_id, filters)
+                except Exception as e:
+                    emit(("error", e))
+
+            self.service.submit(produce)
+        else:
+            events.put_nowait(("delta", routed["answer"]))
+            events.put_nowait(("done", routed))
+
+        await send({"type": "http.response.start", "status": 200, "headers": [
+            (b"content-type", b"text/event-stream; charset=utf-8"),
+            (b"cache-control", b"no-cache"),
+        ]})
+        try:
+            while True:
+                try:
+                    kind, payload = await asyncio.wait_for(events.get(), _remaining(deadline))
+                except asyncio.TimeoutError:
+                    await _send_event(send, "error", {"error": "İstek son süresi doldu", "status": 504})
+                    return 504
+                if kind == "delta":
+                    await _send_event(send, "delta", {"text": payload})
+                elif kind == "done":
+                    payload.update(backend=backend, seconds=round(time.perf_counter() - started, 3))
+                    await _send_event(send, "done", payload)
+                    return 200
+                else:
+                    status = 504 if isinstance(payload, (DeadlineExceeded, FutureTimeoutError, TimeoutError)) else 500
+                    print(f"Akış hatası: {payload}")
+                    await _send_event(send, "error", {"error": "Cevap üretilemedi", "status": status})
+                    return status
+        finally:
+            cancelled.set()
+            try:
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+            except Exception:
+                pass  # istemci bağlantıyı kapatmış olabilir
+
+
+async def _read_json(receive):
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if len(body) > MAX_BODY_BYTES:
+            raise HTTPError(413, "İstek gövdesi çok büyük")
+        if not message.get("more_body"):
+            break
+    try:
+        data = json.loads(body or b"{}")
+    except ValueError:
+        raise HTTPError(400, "Geçersiz JSON")
+    if not isinstance(data, dict):
+        raise HTTPError(400, "Gövde bir JSON nesnesi olmalı")
+    return data
+
+
+async def _send_body(send, status, body, content_type, headers=()):
+    await send({"type": "http.response.start", "status": status, "headers": [
+        (b"content-type", content_type.encode("latin-1")),
+        (b"content-length", str(len(body)).encode("latin-1")),
+        *headers,
+    ]})
+    await send({"type": "http.response.body", "body": body})
+    return status
+
+
+async def _send_json(send, status, payload, headers=()):
+    body = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+    return await _send_body(send, status, body, "application/json; charset=utf-8", headers)
+
+
+async def _send_event(send, event, payload):
+    data = json.dumps(payload, ensure_ascii=False, default=str)
+    await send({"type": "http.response.body", "body": f"event: {event}\ndata: {data}\n\n".encode("utf-8"),
+                "more_body": True})
+
+
+app = ChatbotApp()
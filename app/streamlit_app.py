@@ -1,9 +1,20 @@
 import streamlit as st
 import os
 import re
+import threading
+import uuid
+from contextlib import ExitStack
 from dotenv import load_dotenv
 from rag.rag_pipeline import get_rag_pipeline, get_context
-from models import FlanT5RAGModel, GeminiRAGModel
+from rag.metrics import serve_metrics
+from rag.registry import (
+    get_registry, get_corpus, get_generation_batcher, get_retrieval_batcher, get_answer_cache,
+    get_comparison_executor, get_session_store
+)
+from models.backends import get_backend, backend_loader
+from models.prompt_packing import join_chunks
+from models.intent_router import get_intent_router
+from models.answer_cache import cached_generate, cached_generate_stream
 
 def remove_surrogates(text):
     """Surrogate karakterleri temizle"""
@@ -21,6 +32,11 @@ st.set_page_config(
 
 PDF_PATH = os.path.join("data", "ilk-yardim.pdf")
 CHROMA_DIR = "chroma_db"
+# PDF_DIR verilirse dizindeki tüm PDF'ler doküman başına ayrı indekslenip birlikte aranır
+PDF_DIR = os.getenv("PDF_DIR") or None
+FLAN_T5_TIMEOUT = 120
+GEMINI_TIMEOUT = 30
+MODEL_TITLES = {'flan_t5': '🤖 Flan-T5', 'gemini': '🌟 Gemini', 'pipeline': '📚 Vektör veritabanı'}
 
 st.sidebar.title("⚙️ Ayarlar")
 
@@ -28,7 +44,16 @@ use_flan_t5 = st.sidebar.checkbox("Flan-T5 Kullan", value=True)
 use_gemini = st.sidebar.checkbox("Gemini Kullan", value=True)
 
 
-k_context = st.sidebar.slider("Context Parça Sayısı", min_value=1, max_value=10, value=5)
+stream_answers = st.sidebar.checkbox("Cevabı üretildikçe göster", value=True)
+
+k_context = st.sidebar.slider("Context Parça Sayısı", min_value=1, max_value=10, value=3)
+
+
+def load_pipeline():
+    """Tek PDF pipeline'ı veya PDF_DIR verildiyse çok dokümanlı korpus"""
+    if PDF_DIR:
+        return get_corpus(PDF_DIR, CHROMA_DIR)
+    return get_rag_pipeline(PDF_PATH, CHROMA_DIR)
 
 
 gemini_api_key = os.getenv("GEMINI_API_KEY")
@@ -49,6 +74,63 @@ def check_database():
 db_ready, db_status = check_database()
 st.sidebar.info(db_status)
 
+registry = get_registry()
+intent_router = get_intent_router()
+
+
+def leased_stream(model, stream):
+    """Akış tüketildiği sürece modeli registry'de kullanımda tut"""
+    with registry.lease(model):
+        return (yield from stream)
+
+# METRICS_PORT verilmişse Prometheus metrikleri http://<host>:<port>/metrics adresinden sunulur
+metrics_port = os.getenv("METRICS_PORT")
+if metrics_port:
+    serve_metrics(int(metrics_port))
+
+def warmup_resources():
+    """Pipeline ve seçili modelleri arka planda yüklemeye başla (zaten başlatılanlar atlanır)"""
+    specs = []
+    if db_ready:
+        specs.append(("pipeline", load_pipeline))
+    if use_flan_t5:
+        specs.append(("flan_t5", backend_loader("flan_t5")))
+    if use_gemini and gemini_api_key:
+        specs.append(("gemini", backend_loader("gemini")))
+    registry.warmup_async(specs)
+
+# Arayüz modeller yüklenirken de kullanılabilir; hazır olmayan model ilk soruda beklenir
+warmup_resources()
+READINESS_LABELS = {"loading": "⏳ yükleniyor", "ready": "✅ hazır", "error": "❌ hata"}
+for name, state in registry.readiness().items():
+    label = MODEL_TITLES.get(name, name)
+    if state["status"] == "error":
+        st.sidebar.error(f"{label}: yüklenemedi ({state['error']})")
+    else:
+        st.sidebar.caption(f"{label}: {READINESS_LABELS[state['status']]}")
+
+with st.sidebar.expander("🩺 Kaynak Durumu"):
+    for key, info in registry.health().items():
+        st.text(f"{', '.join(info['slots']) or key}: {info['status']} (ref={info['refcount']})")
+    # Pipeline arka planda yüklenirken beklememek için istatistikler yalnızca hazır olunca gösterilir
+    if db_ready and registry.background.is_ready("pipeline"):
+        for cache_name, stats in load_pipeline().cache_stats().items():
+            st.text(f"{cache_name} önbelleği: {stats['hits']} isabet / {stats['misses']} ıska")
+    elif db_ready:
+        st.text("Önbellek istatistikleri: ⏳ pipeline yükleniyor")
+
+# Korpus modunda aranacak dokümanlar seçilebilir; boş seçim tüm açık dokümanlar demektir
+retrieval_filters = ()
+if PDF_DIR and db_ready and registry.background.is_ready("pipeline"):
+    documents = [entry for entry in load_pipeline().list_documents() if entry.get("enabled", True)]
+    titles = {entry["id"]: entry.get("title") or entry["id"] for entry in documents}
+    selected_documents = st.sidebar.multiselect(
+        "📄 Dokümanlar", list(titles), format_func=titles.get, placeholder="Tümü"
+    )
+    if selected_documents:
+        retrieval_filters = (("documents", tuple(sorted(selected_documents))),)
+cache_namespace = f":{retrieval_filters}" if retrieval_filters else ""
+
 st.title("🚑 İlk Yardım Chatbot")
 st.markdown("**Flan-T5** ve **Gemini** modellerini kullanarak ilk yardım sorularınızı yanıtlayın.")
 
@@ -84,77 +166,140 @@ if st.button("🔍 Cevapla", type="primary"):
         st.error("Lütfen bir soru girin!")
     elif use_gemini and not gemini_api_key:
         st.error("Gemini kullanmak için .env dosyasına GEMINI_API_KEY ekleyin!")
+    elif intent := intent_router.route(user_query):
+        # Selamlama, vedalaşma, teşekkür ve ret: retrieval ve modeller hiç çalışmaz
+        st.markdown(f"**💬 Cevap:**\n{intent_router.respond(intent)}")
     else:
         with st.spinner("📚 PDF'den bilgi aranıyor ve modeller çalıştırılıyor..."):
+            # Soru cevaplanırken kullanılan kaynaklar, slotları yeniden bağlansa da kapatılmaz
+            leases = ExitStack()
             try:
                 # RAG pipeline'ı başlat
-                pipeline = get_rag_pipeline(PDF_PATH, CHROMA_DIR)
+                pipeline = leases.enter_context(registry.lease(load_pipeline()))
                 
                 # Vektör veritabanı kontrolü
                 if not db_ready:
                     st.info("🔄 Vektör veritabanı oluşturuluyor... (Bu işlem birkaç dakika sürebilir)")
                 
-                context = pipeline.get_context(user_query, k=k_context)
+                answer_cache = get_answer_cache(pipeline)
                 
-                results = {}
+                # Takip soruları ("peki ya çocuklarda?") önceki soruyla birleştirilir
+                sessions = get_session_store()
+                session = sessions.get(st.session_state.setdefault("session_id", uuid.uuid4().hex))
+                question = user_query
+                user_query = sessions.standalone_query(session, question)
+                if user_query != question:
+                    st.caption(f"🔁 Soru şöyle yorumlandı: {user_query}")
                 
-                # Flan-T5 modeli
-                if use_flan_t5:
-                    with st.spinner("Flan-T5 modeli çalışıyor..."):
-                        try:
-                            flan_model = FlanT5RAGModel()
-                            flan_answer = flan_model.generate_answer(user_query, context)
-                            results['flan_t5'] = {
-                                'answer': flan_answer
-                            }
-                            st.success("✅ Flan-T5 tamamlandı")
-                        except Exception as e:
-                            st.error(f"❌ Flan-T5 hatası: {str(e)}")
-                            results['flan_t5'] = {
-                                'answer': f"Hata: {str(e)}"
-                            }
+                # Context ilk ihtiyaçta bir kez alınır; tüm cevaplar önbellekteyse hiç alınmaz.
+                # Soru önceki soruya çok yakınsa önceki parçalar yeniden kullanılır.
+                retrieved = {}
+                retrieval_lock = threading.Lock()
+                def fetch_context():
+                    with retrieval_lock:
+                        if "context" not in retrieved:
+                            search = lambda: get_retrieval_batcher(pipeline).process(
+                                (user_query, k_context, retrieval_filters)
+                            ) or "İlgili bilgi bulunamadı."
+                            retrieved["context"], _ = sessions.context(
+                                session, user_query, k_context, search, pipeline.embed_queries, retrieval_filters
+                            )
+                        return retrieved["context"]
+                
+                def run_flan_t5():
+                    flan_model = get_backend("flan_t5")
+                    skip_cache = bool(flan_model.is_social_interaction(user_query))
+                    if stream_answers:
+                        return leased_stream(flan_model, cached_generate_stream(
+                            answer_cache, f"flan_t5:k={k_context}{cache_namespace}", user_query, fetch_context,
+                            flan_model.generate_answer_stream, skip_cache=skip_cache
+                        ))
+                    flan_batcher = get_generation_batcher(flan_model, "flan_t5")
+                    with registry.lease(flan_model):
+                        return cached_generate(
+                            answer_cache, f"flan_t5:k={k_context}{cache_namespace}", user_query, fetch_context,
+                            lambda query, ctx: flan_batcher.process((query, ctx)),
+                            skip_cache=skip_cache
+                        )
                 
-                # Gemini modeli
+                def run_gemini():
+                    gemini_model = get_backend("gemini")  # API key otomatik olarak .env'den alınacak
+                    skip_cache = bool(gemini_model.is_social_interaction(user_query))
+                    if stream_answers:
+                        return leased_stream(gemini_model, cached_generate_stream(
+                            answer_cache, f"gemini:k={k_context}{cache_namespace}", user_query, fetch_context,
+                            gemini_model.generate_answer_stream, skip_cache=skip_cache
+                        ))
+                    with registry.lease(gemini_model):
+                        return cached_generate(
+                            answer_cache, f"gemini:k={k_context}{cache_namespace}", user_query, fetch_context,
+                            gemini_model.generate_answer, skip_cache=skip_cache
+                        )
+                
+                tasks = {}
+                if use_flan_t5:
+                    tasks['flan_t5'] = (run_flan_t5, FLAN_T5_TIMEOUT)
                 if use_gemini and gemini_api_key:
-                    with st.spinner("Gemini modeli çalışıyor..."):
-                        try:
-                            gemini_model = GeminiRAGModel()  # API key otomatik olarak .env'den alınacak
-                            gemini_answer = gemini_model.generate_answer(user_query, context)
-                            results['gemini'] = {
-                                'answer': gemini_answer
-                            }
-                            st.success("✅ Gemini tamamlandı")
-                        except ValueError as e:
-                            st.error(f"Gemini API hatası: {e}")
-                            use_gemini = False
-                        except Exception as e:
-                            st.error(f"❌ Gemini hatası: {str(e)}")
-                            results['gemini'] = {
-                                'answer': f"Hata: {str(e)}"
-                            }
+                    tasks['gemini'] = (run_gemini, GEMINI_TIMEOUT)
                 
-                if results:
-                    st.success("✅ Analiz tamamlandı!")
+                if tasks:
+                    # Her model bittiği anda (akışlı modda üretildikçe) kendi sütununa yazılır
+                    cols = st.columns(len(tasks))
+                    placeholders = {}
+                    for col, model_name in zip(cols, tasks):
+                        with col:
+                            st.markdown(f"### {MODEL_TITLES[model_name]}")
+                            placeholders[model_name] = st.empty()
+                            placeholders[model_name].info("⏳ Çalışıyor...")
                     
-                    with st.expander("📖 Kullanılan Bilgi Kaynakları"):
-                        st.text(remove_surrogates(context))
-                    
-                    if len(results) > 1:
-                        cols = st.columns(len(results))
-                        for i, (model_name, result) in enumerate(results.items()):
-                            with cols[i]:
-                                st.markdown(f"### {'🤖 Flan-T5' if model_name == 'flan_t5' else '🌟 Gemini'}")
-                                st.markdown(f"**💬 Cevap:**\n{remove_surrogates(result['answer'])}")
+                    executor = get_comparison_executor()
+                    if stream_answers:
+                        events = executor.stream(tasks)
                     else:
-                        model_name, result = list(results.items())[0]
-                        st.markdown(f"### {'🤖 Flan-T5' if model_name == 'flan_t5' else '🌟 Gemini'} Sonucu")
-                        st.markdown(f"**💬 Cevap:**\n{remove_surrogates(result['answer'])}")
+                        events = (("done", name, outcome) for name, outcome in executor.run(tasks))
+                    
+                    context = None
+                    recorded = False
+                    partial = {name: "" for name in tasks}
+                    for kind, model_name, payload in events:
+                        title = MODEL_TITLES[model_name]
+                        if kind == "delta":
+                            partial[model_name] += payload
+                            placeholders[model_name].markdown(
+                                f"**💬 Cevap:**\n{remove_surrogates(partial[model_name])}▌"
+                            )
+                            continue
+                        with placeholders[model_name].container():
+                            if "error" in payload:
+                                error = payload["error"]
+                                if isinstance(error, ValueError) and model_name == 'gemini':
+                                    st.error(f"Gemini API hatası: {error}")
+                                else:
+                                    st.error(f"❌ {title} hatası: {str(error)}")
+                                if partial[model_name]:
+                                    st.markdown(f"**💬 Cevap (yarım):**\n{remove_surrogates(partial[model_name])}")
+                                continue
+                            answer, model_context, from_cache = payload["result"]
+                            context = context or model_context
+                            if not recorded:
+                                # Oturum geçmişine ilk biten modelin cevabı yazılır
+                                sessions.record(session, question, user_query, answer)
+                                recorded = True
+                            note = " (önbellekten)" if from_cache else ""
+                            st.success(f"✅ {payload['seconds']:.1f} sn{note}")
+                            st.markdown(f"**💬 Cevap:**\n{remove_surrogates(answer)}")
+                    
+                    st.success("✅ Analiz tamamlandı!")
+                    with st.expander("📖 Kullanılan Bilgi Kaynakları"):
+                        st.text(remove_surrogates(join_chunks(context) or "İlgili bilgi bulunamadı."))
                 else:
                     st.warning("⚠️ Hiçbir model çalıştırılamadı!")
                     
             except Exception as e:
                 st.error(f"❌ Hata oluştu: {str(e)}")
                 st.info("💡 Hata detayları için console'u kontrol edin.")
+            finally:
+                leases.close()
 
 st.markdown("---")
 st.markdown("""
@@ -0,0 +1 @@
+# Benchmark ve ölçüm araçları
@@ -0,0 +1,189 @@
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from models.base_model import BaseRAGModel
+from models.intent_router import get_intent_router
+from models.streaming import StreamingCleaner
+
+
+class FakeGeminiRAGModel(BaseRAGModel):
+    """Ağ bağlantısı olmadan GeminiRAGModel'i taklit eden model.
+
+    Aynı arayüzü ve token bütçesini kullanır; cevap süresi `latency` (sn)
+    ve akışta parça başına `chunk_latency` ile ayarlanır. Cevap, prompt'taki
+    context'in ilk cümlelerinden üretilir.
+    """
+
+    max_input_tokens = 8000
+    metrics_label = "fake_gemini"
+
+    def __init__(self, model_name="fake-gemini", latency=0.8, chunk_latency=0.05, chunk_words=8):
+        self.latency = latency
+        self.chunk_latency = chunk_latency
+        self.chunk_words = chunk_words
+        super().__init__(model_name)
+        self.intent_router = get_intent_router()
+        self.calls = 0
+
+    def _initialize_model(self):
+        """Taklit model için hazırlık gerekmez"""
+        pass
+
+    def is_social_interaction(self, query):
+        return self.intent_router.route(query)
+
+    def get_social_response(self, intent):
+        return self.intent_router.respond(intent)
+
+    def _fake_answer(self, query, context):
+        words = context.split()[:60]
+        if not words:
+            return "Üzgünüm, bu konuda yeterli bilgi bulamadım."
+        return f"{query} sorusu için bilgi: " + " ".join(words)
+
+    def generate_answer(self, query, context):
+        social_intent = self.is_social_interaction(query)
+        if social_intent:
+            return self.get_social_response(social_intent)
+        context = self._truncate_context(context, query)
+        self.calls += 1
+        with self.metrics.span("model_generate", backend=self.metrics_label, mode="single"):
+            time.sleep(self.latency)
+            answer = self._fake_answer(query, context)
+        self._record_generation(self._create_qa_prompt(query, context), answer)
+        return answer[:1000] + "..." if len(answer) > 1000 else answer
+
+    def generate_answer_stream(self, query, context, stop_event=None):
+        social_intent = self.is_social_interaction(query)
+        if social_intent:
+            yield self.get_social_response(social_intent)
+            return
+        context = self._truncate_context(context, query)
+        self.calls += 1
+        cleaner = StreamingCleaner(min_chars=1, holdback_words=0)
+        words = self._fake_answer(query, context).split(" ")
+        time.sleep(max(0.0, self.latency - self.chunk_latency * (len(words) / self.chunk_words)))
+        for start in range(0, len(words), self.chunk_words):
+            if stop_event is not None and stop_event.is_set():
+                return
+            time.sleep(self.chunk_latency)
+            delta = cleaner.feed(" ".join(words[start:start + self.chunk_words]) + " ")
+            if delta:
+                yield delta
+        delta = cleaner.finish()
+        if delta:
+            yield delta
+
+
+class FakeGeminiServer:
+    """Gemini REST API'sinin (generateContent / streamGenerateContent) yerel taklidi.
+
+    `failures` listesindeki HTTP kodları sıradaki isteklere sırayla döndürülür
+    (ör. [429, 429, 503]); liste bitince istekler `latency` saniye sonra
+    prompt'taki bilginin ilk kelimeleriyle cevaplanır. GeminiClient'ı
+    GEMINI_BASE_URL ile bu sunucuya yönlendirerek ağsız test edilebilir.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.2, chunk_words=8, failures=(), retry_after=None):
+        self.latency = latency
+        self.chunk_words = chunk_words
+        self.failures = list(failures)
+        self.retry_after = retry_after
+        self.calls = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-gemini", daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _next_failure(self):
+        with self._lock:
+            self.calls += 1
+            return self.failures.pop(0) if self.failures else None
+
+    def _answer(self, prompt):
+        match = re.search(r"Bilgi:\s*(.*?)\n\s*\nSoru:", prompt, re.S)
+        words = (match.group(1) if match else prompt).split()[:60]
+        return " ".join(words) if words else "Bilgi bulunamadı."
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}")
+                prompt = "".join(part.get("text", "") for part in body["contents"][0]["parts"])
+                failure = server._next_failure()
+                if failure:
+                    payload = json.dumps({"error": {"code": failure, "message": "fake failure"}}).encode("utf-8")
+                    self.send_response(failure)
+                    if failure == 429 and server.retry_after is not None:
+                        self.send_header("Retry-After", str(server.retry_after))
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                    return
+                time.sleep(server.latency)
+                answer = server._answer(prompt)
+                if ":streamGenerateContent" in self.path:
+                    self._stream(answer)
+                else:
+                    self._send_json(_candidate(answer, prompt))
+
+            def _send_json(self, data):
+                payload = json.dumps(data, ensure_ascii=False).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _stream(self, answer):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.end_headers()
+                words = answer.split(" ")
+                for start in range(0, len(words), server.chunk_words):
+                    piece = " ".join(words[start:start + server.chunk_words]) + " "
+                    self.wfile.write(f"data: {json.dumps(_candidate(piece), ensure_ascii=False)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def _candidate(text, prompt=None):
+    data = {"candidates": [{"content": {"parts": [{"text": text}], "role": "model"}}]}
+    if prompt is not None:
+        data["usageMetadata"] = {"promptTokenCount": len(prompt.split()), "candidatesTokenCount": len(text.split())}
+    return data
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Yerel sahte Gemini REST sunucusu")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.2)
+    args = parser.parse_args()
+    fake = FakeGeminiServer(port=args.port, latency=args.latency)
+    print(f"Sahte Gemini: {fake.base_url} (GEMINI_BASE_URL={fake.base_url} GEMINI_API_KEY=fake)")
+    fake._server.serve_forever()
@@ -0,0 +1,130 @@
+"""Flan-T5 çıkarım motorlarının karşılaştırması: gecikme, bellek ve cevap benzerliği.
+
+Her motor (torch, int8, onnx) ayrı bir süreçte yüklenir; böylece yükleme
+süresi ve en yüksek bellek (RSS) motor başına ölçülür. Aynı sorular ve
+context'ler her motora verilir; cevaplar ilk motorun (referans) cevaplarıyla
+ROUGE-L ve birebir eşleşme oranıyla karşılaştırılır. Karşılaştırma için
+varsayılan olarak greedy (deterministik) üretim kullanılır.
+
+Kullanım:
+    python -m benchmarks.flan_engines --engines torch int8 onnx --threads 4
+    python -m benchmarks.flan_engines --engines torch int8 --sample --output engines.json
+"""
+import argparse
+import json
+import os
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmarks.run_benchmarks import DEFAULT_QUESTIONS, percentile
+
+
+def load_contexts(questions, pdf_path, chroma_dir, k):
+    """Soruların context'lerini mevcut veritabanından getir"""
+    from rag.rag_pipeline import RAGPipeline
+    pipeline = RAGPipeline(pdf_path, chroma_dir)
+    try:
+        return [pipeline.get_context_chunks(question, k) for question in questions]
+    finally:
+        pipeline.close()
+
+
+def run_engine(engine, model_name, num_threads, greedy, questions, contexts, repeat):
+    """Ayrı süreçte: motoru yükle, soruları cevapla, süre ve belleği ölç"""
+    from models.flan_t5_rag_model import FlanT5RAGModel
+
+    started = time.perf_counter()
+    model = FlanT5RAGModel(model_name, engine=engine, num_threads=num_threads, greedy=greedy)
+    load_seconds = time.perf_counter() - started
+    model.generate_answer(questions[0], contexts[0])  # ilk çağrı maliyetini ölçüme katma
+
+    latencies = []
+    answers = []
+    output_tokens = 0
+    for _ in range(repeat):
+        answers = []
+        for question, context in zip(questions, contexts):
+            call_started = time.perf_counter()
+            answer = model.generate_answer(question, context)
+            latencies.append(time.perf_counter() - call_started)
+            answers.append(answer)
+            output_tokens += model.count_tokens(answer)
+    total = sum(latencies)
+    return {
+        "engine": engine,
+        "load_seconds": round(load_seconds, 3),
+        # Linux'ta ru_maxrss KB cinsindendir
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "mean_ms": round(total / len(latencies) * 1000, 1),
+        "output_tokens_per_s": round(output_tokens / total, 2) if total else None,
+        "answers": answers,
+    }
+
+
+def compare_answers(reference, answers):
+    """Referans motorun cevaplarına göre ROUGE-L ve birebir eşleşme oranı"""
+    from benchmarks.sweep import rouge_scores
+    scores = [rouge_scores(answer, ref)["rougeL"] for ref, answer in zip(reference, answers)]
+    exact = sum(1 for ref, answer in zip(reference, answers) if ref.strip() == answer.strip())
+    return {
+        "rougeL_vs_reference": round(sum(scores) / len(scores), 4) if scores else None,
+        "exact_match_vs_reference": round(exact / len(answers), 4) if answers else None,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Flan-T5 çıkarım motorlarını karşılaştır")
+    parser.add_argument("--engines", nargs="+", default=["torch", "int8", "onnx"])
+    parser.add_argument("--model", default="google/flan-t5-base")
+    parser.add_argument("--threads", type=int, default=None, help="Intra-op thread sayısı")
+    parser.add_argument("--sample", action="store_true", help="Greedy yerine örneklemeli üretim")
+    parser.add_argument("--pdf", default=os.path.join("data", "ilk-yardim.pdf"))
+    parser.add_argument("--chroma-dir", default="chroma_db")
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--output", default="flan_engines.json")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    questions = list(DEFAULT_QUESTIONS)
+    contexts = load_contexts(questions, args.pdf, args.chroma_dir, args.k)
+
+    results = []
+    for engine in args.engines:
+        print(f"⏳ {engine} motoru ölçülüyor...")
+        # Her motor temiz bir süreçte: bellek ölçümü diğer motorlardan etkilenmesin
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(run_engine, engine, args.model, args.threads, not args.sample,
+                                     questions, contexts, args.repeat)
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"❌ {engine}: {e}")
+                continue
+        if results:
+            result.update(compare_answers(results[0]["answers"], result["answers"]))
+        results.append(result)
+        print(f"  {engine:<6} yükleme={result['load_seconds']} sn  p50={result['p50_ms']} ms  "
+              f"p95={result['p95_ms']} ms  bellek={result['peak_rss_mb']} MB  "
+              f"benzerlik={result.get('rougeL_vs_reference', '-')}")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({
+            "model": args.model,
+            "threads": args.threads,
+            "greedy": not args.sample,
+            "questions": questions,
+            "results": results,
+        }, f, ensure_ascii=False, indent=2)
+    print(f"📊 Sonuçlar yazıldı: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,250 @@
+"""İstek yolunu aşama aşama ölçen benchmark.
+
+PDF ayrıştırma, parçalama, veritabanına yazma, get_context, _truncate_context,
+Flan-T5 üretimi ve (yerel taklit) Gemini çağrısını bir soru seti üzerinde,
+farklı eşzamanlılık seviyelerinde çalıştırır; aşama başına p50/p95/p99 ve
+throughput raporlar. Sonuçlar JSON olarak yazılır ve bir baseline ile
+karşılaştırılabilir. Ağ bağlantısı gerektirmez (Flan-T5 ve embedding
+modellerinin yerel önbellekte olması gerekir).
+
+Kullanım:
+    python -m benchmarks.run_benchmarks --output bench.json
+    python -m benchmarks.run_benchmarks --baseline bench.json --concurrency 1 4 8
+    python -m benchmarks.run_benchmarks --skip-flan --gemini-latency 0.5
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_QUESTIONS = [
+    "Yanık durumunda ne yapmalıyım?",
+    "Kalp krizi belirtileri nelerdir?",
+    "Kanama durumunda nasıl müdahale edilir?",
+    "Bayılma durumunda ne yapılmalı?",
+    "Zehirlenme durumunda ilk yardım nasıl yapılır?"
+]
+
+
+def percentile(values, q):
+    """Sıralı değerlerde en yakın sıra yöntemiyle yüzdelik"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(q / 100.0 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(latencies, wall_seconds):
+    """Gecikme listesinden özet istatistik"""
+    return {
+        "count": len(latencies),
+        "p50_ms": _ms(percentile(latencies, 50)),
+        "p95_ms": _ms(percentile(latencies, 95)),
+        "p99_ms": _ms(percentile(latencies, 99)),
+        "mean_ms": _ms(sum(latencies) / len(latencies)) if latencies else None,
+        "throughput_per_s": (len(latencies) / wall_seconds) if wall_seconds > 0 else None,
+    }
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000.0, 3)
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - started
+
+
+def run_concurrent(fn, items, concurrency, repeat=1):
+    """fn'i öğeler üzerinde verilen eşzamanlılıkla çalıştır; (gecikmeler, toplam süre)"""
+    work = list(items) * repeat
+    started = time.perf_counter()
+    if concurrency <= 1:
+        latencies = [timed(fn, item) for item in work]
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            latencies = list(executor.map(lambda item: timed(fn, item), work))
+    return latencies, time.perf_counter() - started
+
+
+def load_questions(path=None):
+    """Soru seti: dosya (satır başına bir soru) ya da varsayılan + veri setindeki FirstAidInfo satırları"""
+    if path:
+        with open(path, "r", encoding="utf-8") as f:
+            return [line.strip() for line in f if line.strip()]
+    from models.intent_router import load_intent_examples
+    questions = list(DEFAULT_QUESTIONS)
+    for intent, sentence in load_intent_examples():
+        if intent == "FirstAidInfo" and sentence not in questions:
+            questions.append(sentence)
+    return questions
+
+
+def bench_offline_stages(pdf_path, chroma_dir, repeat):
+    """Tek seferlik (eşzamanlılıktan bağımsız) aşamalar: ayrıştırma, parçalama, yazma"""
+    from rag.chunking import make_chunker
+    from rag.ingestion import fingerprint_pages, iter_page_texts
+    from rag.rag_pipeline import RAGPipeline
+
+    results = {}
+    chunker = make_chunker()
+
+    parse_latencies = []
+    page_texts = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        pages = list(fingerprint_pages(pdf_path))
+        page_texts = list(iter_page_texts(pdf_path, pages, workers=1))
+        parse_latencies.append(time.perf_counter() - started)
+    results["pdf_parse"] = summarize(parse_latencies, sum(parse_latencies))
+
+    chunk_latencies = []
+    for _, text in page_texts:
+        chunk_latencies.append(timed(chunker.split, text))
+    results["chunking_per_page"] = summarize(chunk_latencies, sum(chunk_latencies))
+
+    pipeline = RAGPipeline(pdf_path, chroma_dir, chunker=chunker, load=False)
+    started = time.perf_counter()
+    summary = pipeline.ingest(force=True, progress=lambda *args: None)
+    ingest_seconds = time.perf_counter() - started
+    results["ingestion"] = dict(summarize([ingest_seconds], ingest_seconds), chunks=summary["chunks"])
+    return results, pipeline
+
+
+def bench_request_stages(pipeline, questions, concurrency_levels, repeat, flan_model, gemini_model, k):
+    """Soru başına aşamalar: her eşzamanlılık seviyesi için ayrı özet"""
+    contexts = {question: pipeline.get_context_chunks(question, k) for question in questions}
+
+    def get_context(question):
+        # Soğuk ölçüm: hem retrieval sonucu hem sorgu embedding'i yeniden hesaplanır
+        pipeline.retrieval_cache.clear()
+        pipeline.query_embedding_cache.clear()
+        pipeline.get_context_chunks(question, k)
+
+    stages = {"get_context": get_context, "get_context_cached": lambda q: pipeline.get_context_chunks(q, k)}
+    if flan_model is not None:
+        stages["truncate_context"] = lambda q: flan_model._truncate_context(contexts[q], q)
+        stages["flan_t5_generation"] = lambda q: flan_model.generate_answer(q, contexts[q])
+    if gemini_model is not None:
+        stages["gemini_fake"] = lambda q: gemini_model.generate_answer(q, contexts[q])
+
+    results = {}
+    for concurrency in concurrency_levels:
+        level = {}
+        for name, fn in stages.items():
+            latencies, wall = run_concurrent(fn, questions, concurrency, repeat)
+            level[name] = summarize(latencies, wall)
+            print(f"  c={concurrency:<3} {name:<22} p50={level[name]['p50_ms']} ms  "
+                  f"p95={level[name]['p95_ms']} ms  {level[name]['throughput_per_s']:.2f}/sn")
+        results[str(concurrency)] = level
+    return results
+
+
+def compare(current, baseline, tolerance):
+    """p95 değeri baseline'dan tolerance oranından fazla artan aşamaları listele"""
+    regressions = []
+
+    def walk(cur, base, path):
+        if not isinstance(cur, dict) or not isinstance(base, dict):
+            return
+        if "p95_ms" in cur and "p95_ms" in base:
+            if cur["p95_ms"] is not None and base["p95_ms"] and cur["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+                regressions.append({
+                    "stage": "/".join(path),
+                    "baseline_p95_ms": base["p95_ms"],
+                    "current_p95_ms": cur["p95_ms"],
+                    "change": round(cur["p95_ms"] / base["p95_ms"] - 1, 3),
+                })
+            return
+        for key in cur:
+            if key in base:
+                walk(cur[key], base[key], path + [key])
+
+    walk(current.get("stages", {}), baseline.get("stages", {}), [])
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="İstek yolunun aşama bazlı gecikme benchmark'ı")
+    parser.add_argument("--pdf", default=os.path.join("data", "ilk-yardim.pdf"))
+    parser.add_argument("--questions", default=None, help="Satır başına bir soru içeren dosya")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--repeat", type=int, default=1, help="Soru seti tekrar sayısı")
+    parser.add_argument("--k", type=int, default=3, help="Getirilen parça sayısı")
+    parser.add_argument("--skip-flan", action="store_true", help="Flan-T5 aşamalarını atla")
+    parser.add_argument("--gemini-latency", type=float, default=0.8, help="Taklit Gemini gecikmesi (sn)")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--baseline", default=None, help="Karşılaştırılacak önceki sonuç dosyası")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="İzin verilen p95 artışı (0.2 = %%20)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+
+    from benchmarks.fake_gemini import FakeGeminiRAGModel
+
+    questions = load_questions(args.questions)
+    chroma_dir = tempfile.mkdtemp(prefix="bench_chroma_")
+    try:
+        print("📄 Offline aşamalar ölçülüyor...")
+        stages, pipeline = bench_offline_stages(args.pdf, chroma_dir, args.repeat)
+
+        flan_model = None
+        if not args.skip_flan:
+            from models.flan_t5_rag_model import FlanT5RAGModel
+            started = time.perf_counter()
+            flan_model = FlanT5RAGModel()
+            stages["flan_t5_load"] = summarize([time.perf_counter() - started], time.perf_counter() - started)
+        gemini_model = FakeGeminiRAGModel(latency=args.gemini_latency)
+
+        print(f"❓ {len(questions)} soru ile istek aşamaları ölçülüyor...")
+        stages["requests"] = bench_request_stages(
+            pipeline, questions, args.concurrency, args.repeat, flan_model, gemini_model, args.k
+        )
+        pipeline.close()
+    finally:
+        shutil.rmtree(chroma_dir, ignore_errors=True)
+
+    result = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "questions": len(questions),
+        "config": {"k": args.k, "repeat": args.repeat, "concurrency": args.concurrency,
+                   "gemini_latency": args.gemini_latency},
+        "stages": stages,
+    }
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        result["regressions"] = compare(result, baseline, args.tolerance)
+        for regression in result["regressions"]:
+            print(f"⚠️ Gerileme: {regression['stage']} p95 {regression['baseline_p95_ms']} -> "
+                  f"{regression['current_p95_ms']} ms (+{regression['change'] * 100:.0f}%)")
+        if result["regressions"]:
+            exit_code = 1
+        else:
+            print("✅ Baseline'a göre gerileme yok.")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"📊 Sonuçlar yazıldı: {args.output}")
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,263 @@
+"""Retrieval parametre taraması: parça boyutu / örtüşme / k ızgarasında kalite ve maliyet.
+
+Her (parça boyutu, örtüşme) için geçici bir veritabanı oluşturulur ve soru seti
+her k için çalıştırılır. Ayarlar süreç havuzunda paralel değerlendirilir.
+Raporlanan değerler: sayfa bazlı recall@k ve hit@k, context token sayısı,
+sorgu başına retrieval gecikmesi (p50/p95), --generate ile Flan-T5 prompt
+token sayısı ve --rouge ile referans cevaplara göre ROUGE puanları.
+
+ROUGE için referans cevap gerekir: veri setinde cevap sütunu olmadığından
+--rouge yalnızca reference sütunu dolu bir etiket dosyasıyla çalışır.
+
+Soru seti varsayılan olarak veri setindeki FirstAidInfo satırlarıdır. İlgili
+sayfalar etiket dosyasında yoksa, sayfa metinleri üzerinde BM25 ile en iyi
+eşleşen sayfalar (ayarlardan bağımsız) gümüş etiket olarak kullanılır.
+
+Etiket dosyası (CSV, başlık satırıyla): question,pages,reference
+    pages: ";" ile ayrılmış sayfa numaraları, reference: referans cevap (opsiyonel)
+
+Kullanım:
+    python -m benchmarks.sweep --chunk-sizes 120 200 300 --overlaps 0 20 --k 3 5
+    python -m benchmarks.sweep --labels labels.csv --rouge --output sweep.json
+"""
+import argparse
+import csv
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import product
+
+from benchmarks.run_benchmarks import percentile
+
+_WORD = re.compile(r"\w+")
+
+
+def load_labels(path=None, pdf_path=None, silver_pages=2):
+    """[{question, pages, reference}] listesi; sayfası olmayan sorulara gümüş etiket ekle"""
+    if path:
+        with open(path, "r", encoding="utf-8-sig", newline="") as f:
+            labels = [
+                {
+                    "question": row["question"].strip(),
+                    "pages": [int(p) for p in (row.get("pages") or "").split(";") if p.strip()],
+                    "reference": (row.get("reference") or "").strip() or None,
+                }
+                for row in csv.DictReader(f) if row.get("question", "").strip()
+            ]
+    else:
+        from models.intent_router import load_intent_examples
+        labels = [
+            {"question": sentence, "pages": [], "reference": None}
+            for intent, sentence in load_intent_examples() if intent == "FirstAidInfo"
+        ]
+
+    if any(not label["pages"] for label in labels):
+        page_index = _page_index(pdf_path)
+        for label in labels:
+            if not label["pages"]:
+                label["pages"] = [page for page, _ in page_index.search(label["question"], silver_pages)]
+                label["silver"] = True
+    return labels
+
+
+def _page_index(pdf_path):
+    """Sayfa metinleri üzerinde BM25 indeksi (gümüş etiketler için)"""
+    from rag.bm25 import BM25Index
+    from rag.ingestion import fingerprint_pages, iter_page_texts
+    pages = list(fingerprint_pages(pdf_path))
+    return BM25Index.build(iter_page_texts(pdf_path, pages))
+
+
+class _Tokenizer:
+    """rouge-score için Türkçe harfleri koruyan tokenizer (varsayılanı ASCII dışını siler)"""
+
+    def tokenize(self, text):
+        from rag.retrieval_cache import turkish_lower
+        return _WORD.findall(turkish_lower(text or ""))
+
+
+def rouge_scores(answer, reference):
+    from rouge_score import rouge_scorer
+    scorer = rouge_scorer.RougeScorer(["rouge1", "rougeL"], tokenizer=_Tokenizer())
+    scores = scorer.score(reference, answer)
+    return {name: score.fmeasure for name, score in scores.items()}
+
+
+def evaluate_config(pdf_path, chunker_kind, chunk_size, overlap, k_values, labels, hybrid, generate, rouge=False):
+    """Bir (parça boyutu, örtüşme) ayarı için geçici indeks kur ve tüm k değerlerini ölç"""
+    from rag.chunking import make_chunker
+    from rag.rag_pipeline import RAGPipeline
+
+    chroma_dir = tempfile.mkdtemp(prefix=f"sweep_{chunk_size}_{overlap}_")
+    model = None
+    pipeline = None
+    try:
+        started = time.perf_counter()
+        chunker = make_chunker(chunker_kind, chunk_size, overlap)
+        pipeline = RAGPipeline(
+            pdf_path, chroma_dir,
+            chunker=chunker,
+            workers=1, load=False, hybrid=hybrid
+        )
+        summary = pipeline.ingest(force=True, progress=lambda *args: None)
+        ingest_seconds = time.perf_counter() - started
+        pipeline.get_context_chunks(labels[0]["question"], max(k_values))  # embedding modelini ısıt
+
+        if generate or rouge:
+            from models.flan_t5_rag_model import FlanT5RAGModel
+            model = FlanT5RAGModel()
+
+        results = []
+        for k in k_values:
+            rows = []
+            for label in labels:
+                pipeline.retrieval_cache.clear()
+                pipeline.query_embedding_cache.clear()
+                query_started = time.perf_counter()
+                chunks = pipeline.get_context_chunks(label["question"], k)
+                latency = time.perf_counter() - query_started
+
+                retrieved_pages = {chunk["page"] for chunk in chunks}
+                relevant = set(label["pages"])
+                row = {
+                    "latency": latency,
+                    "recall": len(relevant & retrieved_pages) / len(relevant) if relevant else None,
+                    "hit": bool(relevant & retrieved_pages) if relevant else None,
+                    # Token sayısı saklanmamış parçalar (kelime parçalayıcı) aynı tokenizer ile sayılır
+                    "context_tokens": sum(
+                        chunk["token_count"] if chunk["token_count"] is not None else chunker.count_tokens(chunk["text"])
+                        for chunk in chunks
+                    ),
+                }
+                if model is not None:
+                    context = model._truncate_context(chunks, label["question"])
+                    row["prompt_tokens"] = model.count_tokens(model._create_qa_prompt(label["question"], context))
+                    if rouge and label["reference"]:
+                        answer = model.generate_answer(label["question"], chunks)
+                        row.update(rouge_scores(answer, label["reference"]))
+                rows.append(row)
+            results.append(_summarize(chunker_kind, chunk_size, overlap, k, rows, summary["chunks"], ingest_seconds))
+        return results
+    finally:
+        # Hata olsa da executor'lar ve depo tanıtıcıları dizin silinmeden önce kapatılır
+        if pipeline is not None:
+            pipeline.close()
+        shutil.rmtree(chroma_dir, ignore_errors=True)
+
+
+def _mean(values):
+    values = [value for value in values if value is not None]
+    return sum(values) / len(values) if values else None
+
+
+def _summarize(chunker_kind, chunk_size, overlap, k, rows, chunks, ingest_seconds):
+    latencies = [row["latency"] for row in rows]
+    return {
+        "chunker": chunker_kind,
+        "chunk_size": chunk_size,
+        "overlap": overlap,
+        "k": k,
+        "chunks": chunks,
+        "ingest_seconds": round(ingest_seconds, 3),
+        "recall_at_k": _mean(row["recall"] for row in rows),
+        "hit_at_k": _mean(row["hit"] for row in rows),
+        "context_tokens": _mean(row["context_tokens"] for row in rows),
+        "prompt_tokens": _mean(row.get("prompt_tokens") for row in rows),
+        "rouge1": _mean(row.get("rouge1") for row in rows),
+        "rougeL": _mean(row.get("rougeL") for row in rows),
+        "latency_p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "latency_p95_ms": round(percentile(latencies, 95) * 1000, 3),
+    }
+
+
+def _format(value, digits=3):
+    return "-" if value is None else f"{value:.{digits}f}"
+
+
+def recommend(results, tolerance):
+    """En iyi recall'dan en fazla tolerance kadar düşük olanlar içinde en az context token'lı ayar"""
+    scored = [result for result in results if result["recall_at_k"] is not None]
+    if not scored:
+        return None
+    best_recall = max(result["recall_at_k"] for result in scored)
+    eligible = [result for result in scored if result["recall_at_k"] >= best_recall - tolerance]
+    return min(eligible, key=lambda result: (result["context_tokens"], result["latency_p50_ms"]))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Retrieval parametre taraması (recall / maliyet / gecikme)")
+    parser.add_argument("--pdf", default=os.path.join("data", "ilk-yardim.pdf"))
+    parser.add_argument("--labels", default=None, help="question,pages,reference sütunlu CSV")
+    parser.add_argument("--chunker", choices=["token", "word"], default="token")
+    parser.add_argument("--chunk-sizes", type=int, nargs="+", default=[120, 200, 300])
+    parser.add_argument("--overlaps", type=int, nargs="+", default=[0, 20, 40])
+    parser.add_argument("--k", type=int, nargs="+", default=[2, 3, 5])
+    parser.add_argument("--silver-pages", type=int, default=2, help="Gümüş etikette ilgili sayılan sayfa sayısı")
+    parser.add_argument("--vector-only", action="store_true", help="BM25 füzyonu olmadan sadece vektör araması")
+    parser.add_argument("--generate", action="store_true",
+                        help="Flan-T5 prompt token sayısını ölç")
+    parser.add_argument("--rouge", action="store_true",
+                        help="Flan-T5 ile cevap üretip referans cevaplara göre ROUGE ölç (yavaş, --labels gerekir)")
+    parser.add_argument("--workers", type=int, default=None, help="Paralel değerlendirilecek ayar sayısı")
+    parser.add_argument("--tolerance", type=float, default=0.02, help="Öneride kabul edilen recall kaybı")
+    parser.add_argument("--output", default="sweep_results.json")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not os.path.exists(args.pdf):
+        print(f"PDF dosyası bulunamadı: {args.pdf}")
+        return 1
+
+    labels = load_labels(args.labels, args.pdf, args.silver_pages)
+    if not labels:
+        print("Soru seti boş.")
+        return 1
+    if args.rouge and not any(label["reference"] for label in labels):
+        print("--rouge için referans cevap gerekli: reference sütunu dolu bir --labels dosyası verin.")
+        return 1
+    silver = sum(1 for label in labels if label.get("silver"))
+    print(f"❓ {len(labels)} soru ({silver} gümüş etiketli)")
+
+    grid = [(size, overlap) for size, overlap in product(args.chunk_sizes, args.overlaps) if overlap < size]
+    workers = args.workers or min(len(grid), os.cpu_count() or 1)
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(evaluate_config, args.pdf, args.chunker, size, overlap, sorted(args.k),
+                            labels, not args.vector_only, args.generate, args.rouge): (size, overlap)
+            for size, overlap in grid
+        }
+        for future in as_completed(futures):
+            size, overlap = futures[future]
+            try:
+                config_results = future.result()
+            except Exception as e:
+                print(f"❌ chunk_size={size} overlap={overlap}: {e}")
+                continue
+            results.extend(config_results)
+            for result in config_results:
+                print(f"  size={size:<4} overlap={overlap:<3} k={result['k']:<2} "
+                      f"recall={_format(result['recall_at_k'])} tokens={_format(result['context_tokens'], 0)} "
+                      f"p50={result['latency_p50_ms']} ms")
+
+    results.sort(key=lambda result: (result["chunk_size"], result["overlap"], result["k"]))
+    best = recommend(results, args.tolerance)
+    if best:
+        print(f"✅ Önerilen: chunk_size={best['chunk_size']} overlap={best['overlap']} k={best['k']} "
+              f"(recall@k={best['recall_at_k']:.3f}, ~{best['context_tokens']:.0f} context token)")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"labels": labels, "results": results, "recommended": best}, f, ensure_ascii=False, indent=2)
+    print(f"📊 Sonuçlar yazıldı: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
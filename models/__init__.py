@@ -1,5 +1,18 @@
 from .base_model import BaseRAGModel
-from .flan_t5_rag_model import FlanT5RAGModel
-from .gemini_rag_model import GeminiRAGModel
 
-__all__ = ['BaseRAGModel', 'FlanT5RAGModel', 'GeminiRAGModel'] 
\ No newline at end of file
+# Ağır backend'ler (transformers/torch, google.generativeai) ilk erişimde import edilir
+_LAZY = {
+    'FlanT5RAGModel': '.flan_t5_rag_model',
+    'GeminiRAGModel': '.gemini_rag_model',
+}
+
+__all__ = ['BaseRAGModel', 'FlanT5RAGModel', 'GeminiRAGModel']
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        from importlib import import_module
+        value = getattr(import_module(_LAZY[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
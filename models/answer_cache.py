@@ -0,0 +1,316 @@
+import atexit
+import json
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+import numpy as np
+from rag.metrics import get_metrics
+from rag.retrieval_cache import normalize_query as _normalize
+
+# Bekleyen yazımı olan önbellekler süreç kapanırken diske yazılır
+_open_caches = weakref.WeakSet()
+
+
+class _CacheEntry:
+    __slots__ = ("query", "vector", "answer", "context", "created_at")
+
+    def __init__(self, query, vector, answer, context, created_at):
+        self.query = query
+        self.vector = vector
+        self.answer = answer
+        self.context = context
+        self.created_at = created_at
+
+
+class SemanticAnswerCache:
+    """Sorgu embedding'ine göre anahtarlanan, benzer sorulara kayıtlı cevabı döndüren önbellek.
+
+    Cevaplar model adına göre ayrı isim alanlarında tutulur. Aynı (normalize)
+    soru embedding hesaplanmadan bulunur; değilse kosinüs benzerliği
+    `threshold` üzerindeki en yakın kayıt döndürülür. Kayıtlar `ttl_seconds`
+    sonra geçersiz olur, `max_entries` aşılınca en az yakın zamanda kullanılan
+    silinir. Koleksiyon parmak izi değişince tüm önbellek temizlenir.
+
+    `persist_path` verilirse kayıtlar JSON'a, vektörleri yanındaki `.npy`
+    dosyasına yazılır. Yazım isteğin yolunda yapılmaz: değişiklikten
+    `flush_interval` sn sonra arka planda tek seferde yazılır (close() ve
+    süreç kapanışında da).
+    """
+
+    def __init__(self, embed_fn, threshold=0.92, ttl_seconds=24 * 3600, max_entries=512,
+                 persist_path=None, fingerprint=None, flush_interval=2.0):
+        self.embed_fn = embed_fn
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.persist_path = persist_path
+        self.vectors_path = os.path.splitext(persist_path)[0] + ".vectors.npy" if persist_path else None
+        self.fingerprint = fingerprint
+        self.flush_interval = flush_interval
+        self._entries = OrderedDict()
+        # Son sorguların vektörleri: lookup ve store aynı soruyu iki kez embed etmesin
+        self._vectors = OrderedDict()
+        self._lock = threading.RLock()
+        # Diske yazımlar sırayla yapılır; önbellek kilidi yazım sırasında tutulmaz
+        self._write_lock = threading.Lock()
+        self._dirty = False
+        self._flush_timer = None
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        if persist_path:
+            self._load()
+            _open_caches.add(self)
+
+    def set_fingerprint(self, fingerprint):
+        """Koleksiyon değiştiyse önbelleği geçersiz kıl"""
+        with self._lock:
+            if fingerprint != self.fingerprint:
+                self._entries.clear()
+                self.fingerprint = fingerprint
+                self._schedule_flush()
+
+    def embed(self, query):
+        """Normalize edilmiş (birim uzunlukta) sorgu vektörü"""
+        key = _normalize(query)
+        with self._lock:
+            vector = self._vectors.get(key)
+            if vector is not None:
+                self._vectors.move_to_end(key)
+                return vector
+        vector = np.asarray(self.embed_fn([query])[0], dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        vector = vector / norm if norm else vector
+        with self._lock:
+            self._vectors[key] = vector
+            while len(self._vectors) > 256:
+                self._vectors.popitem(last=False)
+        return vector
+
+    def lookup(self, namespace, query, vector=None):
+        """Kayıtlı cevabı (cevap, context) olarak döndür; yoksa None"""
+        key = (namespace, _normalize(query))
+        with self._lock:
+            self._expire()
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.answer, entry.context
+            candidates = [(k, e) for k, e in self._entries.items() if k[0] == namespace]
+        if not candidates:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        if vector is None:
+            vector = self.embed(query)
+        matrix = np.stack([e.vector for _, e in candidates])
+        scores = matrix @ vector
+        best = int(np.argmax(scores))
+        with self._lock:
+            if scores[best] >= self.threshold and candidates[best][0] in self._entries:
+                best_key, entry = candidates[best]
+                self._entries.move_to_end(best_key)
+                self.hits += 1
+                self.semantic_hits += 1
+                return entry.answer, entry.context
+            self.misses += 1
+        return None
+
+    def store(self, namespace, query, answer, context=None, vector=None):
+        """Cevabı önbelleğe ekle"""
+        if vector is None:
+            vector = self.embed(query)
+        key = (namespace, _normalize(query))
+        with self._lock:
+            self._entries[key] = _CacheEntry(query, vector, answer, context, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._schedule_flush()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._schedule_flush()
+
+    def flush(self):
+        """Bekleyen değişiklikleri hemen diske yaz"""
+        with self._write_lock:
+            with self._lock:
+                if self._flush_timer is not None:
+                    self._flush_timer.cancel()
+                    self._flush_timer = None
+                if not self._dirty:
+                    return
+                self._dirty = False
+                snapshot = self._snapshot()
+            self._write(*snapshot)
+
+    def close(self):
+        self.flush()
+        _open_caches.discard(self)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+            }
+
+    def _expire(self):
+        if not self.ttl_seconds:
+            return
+        cutoff = time.time() - self.ttl_seconds
+        expired = [key for key, entry in self._entries.items() if entry.created_at < cutoff]
+        for key in expired:
+            del self._entries[key]
+
+    def _schedule_flush(self):
+        """Değişikliği işaretle; yazımı (kilit tutulurken çağrılır) arka plana ertele"""
+        if not self.persist_path:
+            return
+        self._dirty = True
+        if self._flush_timer is None:
+            self._flush_timer = threading.Timer(self.flush_interval, self.flush)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+
+    def _snapshot(self):
+        """(metadata, vektör matrisi): kilit altında alınan, diske yazılacak kopya"""
+        entries = list(self._entries.items())
+        data = {
+            "fingerprint": self.fingerprint,
+            "rows": len(entries),
+            "entries": [
+                {
+                    "namespace": key[0],
+                    "query": entry.query,
+                    "answer": entry.answer,
+                    "context": entry.context,
+                    "created_at": entry.created_at,
+                }
+                for key, entry in entries
+            ],
+        }
+        vectors = np.stack([entry.vector for _, entry in entries]) if entries else np.zeros((0, 0), np.float32)
+        return data, vectors
+
+    def _write(self, data, vectors):
+        """Vektörleri .npy'ye, kayıtları JSON'a atomik olarak yaz (satır sayısı JSON'da doğrulanır)"""
+        try:
+            os.makedirs(os.path.dirname(self.persist_path) or ".", exist_ok=True)
+            tmp_vectors = self.vectors_path + ".tmp"
+            with open(tmp_vectors, "wb") as f:
+                np.save(f, vectors.astype(np.float32, copy=False))
+            tmp_path = self.persist_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_vectors, self.vectors_path)
+            os.replace(tmp_path, self.persist_path)
+        except OSError as e:
+            print(f"Cevap önbelleği kaydedilemedi: {e}")
+
+    def _load(self):
+        try:
+            with open(self.persist_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            print(f"Cevap önbelleği okunamadı: {e}")
+            return
+        if self.fingerprint is not None and data.get("fingerprint") != self.fingerprint:
+            return
+        items = data.get("entries", [])
+        if items and "vector" in items[0]:
+            # Eski biçim: vektörler JSON içinde
+            vectors = [np.asarray(item["vector"], dtype=np.float32) for item in items]
+        else:
+            try:
+                vectors = np.load(self.vectors_path) if items else []
+            except (OSError, ValueError) as e:
+                print(f"Cevap önbelleği vektörleri okunamadı: {e}")
+                return
+            if len(vectors) != len(items) or data.get("rows", len(items)) != len(items):
+                print("Cevap önbelleği kayıtları ve vektörleri uyuşmuyor, önbellek boş başlıyor")
+                return
+        self.fingerprint = data.get("fingerprint")
+        for item, vector in zip(items, vectors):
+            key = (item["namespace"], _normalize(item["query"]))
+            self._entries[key] = _CacheEntry(
+                item["query"],
+                vector,
+                item["answer"],
+                item.get("context"),
+                item["created_at"],
+            )
+        self._expire()
+
+
+@atexit.register
+def _flush_open_caches():
+    for cache in list(_open_caches):
+        cache.flush()
+
+
+def cached_generate(cache, namespace, query, context_fn, generate_fn, skip_cache=False):
+    """Önbellekte varsa cevabı döndür; yoksa context_fn() ile context alıp generate_fn ile üret ve kaydet.
+
+    Önbellek isabetinde retrieval da atlanır. (cevap, context, önbellekten_mi) döndürür.
+    """
+    if cache is None or skip_cache:
+        context = context_fn()
+        return generate_fn(query, context), context, False
+    cached = cache.lookup(namespace, query)
+    get_metrics().inc("answer_cache_total", backend=_backend(namespace), result="miss" if cached is None else "hit")
+    if cached is not None:
+        answer, context = cached
+        return answer, context, True
+    context = context_fn()
+    answer = generate_fn(query, context)
+    if answer and not answer.startswith("Üzgünüm"):
+        cache.store(namespace, query, answer, context=_context_text(context))
+    return answer, context, False
+
+
+def cached_generate_stream(cache, namespace, query, context_fn, stream_fn, skip_cache=False):
+    """cached_generate'in akışlı hali: cevap parçalarını üretir, sonunda (cevap, context, önbellekten_mi) döndürür"""
+    if cache is not None and not skip_cache:
+        cached = cache.lookup(namespace, query)
+        get_metrics().inc("answer_cache_total", backend=_backend(namespace),
+                          result="miss" if cached is None else "hit")
+        if cached is not None:
+            answer, context = cached
+            yield answer
+            return answer, context, True
+    context = context_fn()
+    parts = []
+    stream = stream_fn(query, context)
+    try:
+        for delta in stream:
+            parts.append(delta)
+            yield delta
+    finally:
+        # Akış yarıda bırakılırsa model üretimi de hemen kapatılsın
+        stream.close()
+    answer = "".join(parts)
+    if cache is not None and not skip_cache and answer and not answer.startswith("Üzgünüm"):
+        cache.store(namespace, query, answer, context=_context_text(context))
+    return answer, context, False
+
+
+def _backend(namespace):
+    """Ad alanından ("flan_t5:k=3:...") metrik etiketi olarak yalnızca backend adı"""
+    return namespace.split(":", 1)[0]
+
+
+def _context_text(context):
+    if context is None or isinstance(context, str):
+        return context
+    return " ".join(chunk["text"] if isinstance(chunk, dict) else chunk for chunk in context)
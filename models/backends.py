@@ -0,0 +1,58 @@
+import importlib
+import threading
+
+# Backend adı -> "modül:Sınıf"; sınıf (ve ağır bağımlılıkları) ilk kullanımda import edilir
+BACKENDS = {
+    "flan_t5": "models.flan_t5_rag_model:FlanT5RAGModel",
+    "gemini": "models.gemini_rag_model:GeminiRAGModel",
+}
+
+_classes = {}
+_classes_lock = threading.Lock()
+
+
+def register_backend(name, target):
+    """Yeni backend ekle; target "modül:Sınıf" veya sınıfın kendisi"""
+    with _classes_lock:
+        if isinstance(target, str):
+            BACKENDS[name] = target
+            _classes.pop(name, None)
+        else:
+            BACKENDS[name] = f"{target.__module__}:{target.__name__}"
+            _classes[name] = target
+
+
+def resolve_backend(name):
+    """Backend sınıfını döndür (modülünü gerekirse import ederek)"""
+    with _classes_lock:
+        cls = _classes.get(name)
+        if cls is not None:
+            return cls
+        if name not in BACKENDS:
+            raise ValueError(f"Bilinmeyen backend: {name} (seçenekler: {', '.join(BACKENDS)})")
+        module_name, _, class_name = BACKENDS[name].partition(":")
+        cls = getattr(importlib.import_module(module_name), class_name)
+        _classes[name] = cls
+        return cls
+
+
+def get_backend(name, model_name=None):
+    """Backend'in paylaşılan örneği (registry'de `name` slotunda)"""
+    from rag.registry import get_model
+    return get_model(resolve_backend(name), model_name=model_name, slot=name)
+
+
+def backend_loader(name, model_name=None):
+    """Modeli yükleyip ısıtan (ilk üretimi yapan) yükleyici"""
+    def load():
+        model = get_backend(name, model_name)
+        model.warmup()
+        return model
+    return load
+
+
+def warmup_backends(names, registry=None):
+    """Backend'leri arka planda yüklemeye başla; hazır olma durumu registry.readiness() ile izlenir"""
+    from rag.registry import get_registry
+    registry = registry or get_registry()
+    return registry.warmup_async([(name, backend_loader(name)) for name in names])
@@ -1,10 +1,19 @@
 from abc import ABC, abstractmethod
+from rag.metrics import get_metrics
+from .prompt_packing import PromptPacker, estimate_tokens, truncate_estimated
 
 class BaseRAGModel(ABC):
     """RAG modelleri için temel sınıf"""
     
+    # Prompt'un (şablon + soru + context) aşmaması gereken token sayısı; None ise sınırsız
+    max_input_tokens = None
+    # Metriklerde backend etiketi
+    metrics_label = "base"
+    
     def __init__(self, model_name=None):
         self.model_name = model_name
+        self._prompt_packer = None
+        self.metrics = get_metrics()
         self._initialize_model()
     
     @abstractmethod
@@ -17,6 +26,78 @@ class BaseRAGModel(ABC):
         """Soru ve context'e göre cevap üret"""
         pass
     
+    def generate_answer_stream(self, query, context, stop_event=None):
+        """Cevabı üretildikçe parça parça döndür; akış desteklemeyen modeller tek parça verir.
+
+        stop_event: set edildiğinde üretimi erken durdurmak için (destekleyen modellerde).
+        """
+        yield self.generate_answer(query, context)
+    
+    def warmup(self):
+        """Yüklemeden sonra ilk isteği hızlandırmak için modeli ısıt; uzak modellerde bir şey yapmaz"""
+        pass
+    
+    def generate_answers(self, queries, contexts):
+        """Birden fazla soru için cevap üret; batch destekleyen modeller override eder"""
+        return [self.generate_answer(query, context) for query, context in zip(queries, contexts)]
+    
     def _create_qa_prompt(self, query, context):
         """Cevap üretimi için standart prompt oluştur"""
-        return f"Soru: {query}\nCevap (sadece aşağıdaki bilgilere dayanarak):\n{context}\nCevap:" 
\ No newline at end of file
+        return f"Soru: {query}\nCevap (sadece aşağıdaki bilgilere dayanarak):\n{context}\nCevap:"
+    
+    @property
+    def tokenizer_name(self):
+        """Token sayımında kullanılan tokenizer (önbellekli token sayıları bununla eşleşmeli)"""
+        return None
+    
+    def count_tokens(self, text):
+        """Metnin token sayısı; varsayılan olarak kaba tahmin"""
+        return estimate_tokens(text)
+    
+    def truncate_tokens(self, text, max_tokens):
+        """Metni en fazla max_tokens token olacak şekilde kes"""
+        return truncate_estimated(text, max_tokens)
+    
+    @property
+    def prompt_packer(self):
+        if self._prompt_packer is None:
+            self._prompt_packer = PromptPacker(
+                self.max_input_tokens,
+                self.count_tokens,
+                self.truncate_tokens,
+                tokenizer_name=self.tokenizer_name
+            )
+        return self._prompt_packer
+    
+    def _truncate_context(self, context, query, max_input_tokens=None):
+        """Context'i (str veya parça listesi) prompt token bütçesine tek geçişte yerleştir"""
+        packer = self.prompt_packer
+        if max_input_tokens is not None and max_input_tokens != packer.max_input_tokens:
+            packer = PromptPacker(max_input_tokens, self.count_tokens, self.truncate_tokens,
+                                  tokenizer_name=self.tokenizer_name)
+        with self.metrics.span("prompt_pack", backend=self.metrics_label) as span:
+            overhead = self.count_tokens(self._create_qa_prompt(query, ""))
+            packed, stats = packer.pack_with_stats(overhead, context)
+            if self.metrics.enabled:
+                span.set(overhead_tokens=overhead, **stats)
+                self.metrics.observe("prompt_context_tokens", stats["context_tokens"], backend=self.metrics_label)
+                self.metrics.observe("prompt_context_chars", len(packed), backend=self.metrics_label)
+                if stats["truncated"]:
+                    self.metrics.inc("prompt_truncated_total", backend=self.metrics_label)
+        return packed
+    
+    def _record_generation(self, prompt, answer, prompt_tokens=None, answer_tokens=None):
+        """Üretim çağrısının giriş/çıkış token sayılarını kaydet (ölçüm kapalıyken hiçbir şey yapmaz)"""
+        if not self.metrics.enabled:
+            return
+        if prompt_tokens is None and prompt is not None:
+            prompt_tokens = self.count_tokens(prompt)
+        if answer_tokens is None and answer:
+            answer_tokens = self.count_tokens(answer)
+        self.metrics.observe("model_input_tokens", prompt_tokens, backend=self.metrics_label)
+        self.metrics.observe("model_output_tokens", answer_tokens, backend=self.metrics_label)
+    
+    def _fallback(self, message, reason):
+        """Yedek ("Üzgünüm...") cevabı say ve döndür"""
+        self.metrics.inc("answer_fallback_total", backend=self.metrics_label, reason=reason)
+        return message
@@ -0,0 +1,91 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class MicroBatcher:
+    """Eşzamanlı istekleri kısa bir süre biriktirip tek batch olarak işleyen kuyruk.
+
+    İlk istek geldikten sonra en fazla `max_wait_ms` milisaniye ya da
+    `max_batch_size` istek dolana kadar beklenir, ardından `handler`
+    biriken isteklerin listesiyle bir kez çağrılır. `handler` aynı sırada
+    ve aynı uzunlukta bir sonuç listesi döndürmelidir.
+    """
+
+    _STOP = object()
+
+    def __init__(self, handler, max_batch_size=8, max_wait_ms=20, name="micro-batcher"):
+        self.handler = handler
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._closed = False
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, item):
+        """İsteği kuyruğa ekle, sonucu taşıyacak Future'ı döndür"""
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("MicroBatcher kapatıldı")
+            self._queue.put((item, future))
+        return future
+
+    def process(self, item, timeout=None):
+        """İsteği kuyruğa ekle ve sonucunu bekle"""
+        return self.submit(item).result(timeout=timeout)
+
+    def close(self):
+        """Yeni istek kabulünü durdur; kuyruktakiler işlendikten sonra iş parçacığı biter"""
+        with self._lock:
+            if not self._closed:
+                self._closed = True
+                self._queue.put(self._STOP)
+
+    def _collect(self, first):
+        """İlk istekten sonra süre veya boyut sınırına kadar istek topla"""
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        stop = False
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                entry = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if entry is self._STOP:
+                stop = True
+                break
+            batch.append(entry)
+        return batch, stop
+
+    def _run(self):
+        while True:
+            entry = self._queue.get()
+            if entry is self._STOP:
+                return
+            batch, stop = self._collect(entry)
+            self._dispatch(batch)
+            if stop:
+                return
+
+    def _dispatch(self, batch):
+        items = [item for item, _ in batch]
+        futures = [future for _, future in batch]
+        try:
+            results = self.handler(items)
+            if len(results) != len(items):
+                raise RuntimeError(f"Batch sonucu {len(results)} öğe, beklenen {len(items)}")
+        except Exception as e:
+            for future in futures:
+                if future.set_running_or_notify_cancel():
+                    future.set_exception(e)
+            return
+        for future, result in zip(futures, results):
+            if future.set_running_or_notify_cancel():
+                future.set_result(result)
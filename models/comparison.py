@@ -0,0 +1,167 @@
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+
+
+class ComparisonExecutor:
+    """Birden fazla modeli paralel çalıştırıp sonuçları bitiş sırasıyla veren yürütücü.
+
+    Her backend kendi zaman aşımına sahiptir; süresi dolan backend için
+    hata sonucu üretilir ve diğerleri beklenmeye devam eder. Toplam süre
+    backend sürelerinin toplamı değil, en uzununa yakındır.
+
+    Aynı anda en fazla `max_workers` görev çalışır. Çalışan bir thread
+    durdurulamadığından süresi dolan görev "bırakılır": yeri hemen yeni
+    görevlere açılır, kendisi arka planda biter (akışlar bir sonraki parçada
+    kapatılır). Bırakılıp hâlâ süren görev sayısı `max_abandoned` ile
+    sınırlıdır; sınıra gelinince süresi dolan görev yerini bitene kadar tutar.
+    """
+
+    def __init__(self, max_workers=4, max_abandoned=None):
+        self.max_workers = max_workers
+        self.max_abandoned = max_workers if max_abandoned is None else max_abandoned
+        self._slots = threading.Semaphore(max_workers)
+        self._lock = threading.Lock()
+        self.abandoned = 0
+
+    def run(self, tasks, timeout=60.0):
+        """tasks: {isim: çağrılabilir} veya {isim: (çağrılabilir, zaman_aşımı)}.
+
+        Her backend bittikçe (isim, {'result' veya 'error': istisna, 'seconds'}) üretir.
+        """
+        started = time.perf_counter()
+        futures = {}
+        deadlines = {}
+        for name, task in tasks.items():
+            fn, task_timeout = task if isinstance(task, tuple) else (task, timeout)
+            future = self._submit(fn)
+            futures[future] = name
+            deadlines[future] = started + task_timeout if task_timeout else None
+
+        pending = set(futures)
+        while pending:
+            active_deadlines = [deadlines[f] for f in pending if deadlines[f] is not None]
+            wait_for = max(0.0, min(active_deadlines) - time.perf_counter()) if active_deadlines else None
+            done, pending = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+            now = time.perf_counter()
+            for future in done:
+                yield futures[future], self._outcome(future, now - started)
+            for future in [f for f in pending if deadlines[f] is not None and deadlines[f] <= now]:
+                pending.discard(future)
+                # Sırada bekliyorsa hiç başlamaz; çalışıyorsa yeri serbest bırakılır
+                future.cancel()
+                self._abandon(future)
+                yield futures[future], {
+                    "error": TimeoutError(f"Zaman aşımı ({deadlines[future] - started:.1f} sn)"),
+                    "seconds": now - started,
+                }
+
+    def stream(self, tasks, timeout=60.0):
+        """Akış üreten backend'leri paralel çalıştır.
+
+        tasks değerleri generator döndüren çağrılabilirlerdir (veya (çağrılabilir, zaman_aşımı)).
+        Olaylar geliş sırasıyla üretilir: ("delta", isim, metin) ve her backend için bir kez
+        ("done", isim, {'result' veya 'error', 'seconds'}). 'result' generator'ın return değeridir.
+        """
+        started = time.perf_counter()
+        events = queue.Queue()
+        deadlines = {}
+        cancelled = {}
+        futures = {}
+        for name, task in tasks.items():
+            fn, task_timeout = task if isinstance(task, tuple) else (task, timeout)
+            deadlines[name] = started + task_timeout if task_timeout else None
+            cancelled[name] = threading.Event()
+            futures[name] = self._submit(self._drain, name, fn, events, cancelled[name], started)
+
+        pending = set(tasks)
+        while pending:
+            active_deadlines = [deadlines[name] for name in pending if deadlines[name] is not None]
+            wait_for = max(0.0, min(active_deadlines) - time.perf_counter()) if active_deadlines else None
+            try:
+                kind, name, payload = events.get(timeout=wait_for)
+                if name in pending:
+                    if kind == "done":
+                        pending.discard(name)
+                    yield kind, name, payload
+            except queue.Empty:
+                pass
+            now = time.perf_counter()
+            for name in [n for n in pending if deadlines[n] is not None and deadlines[n] <= now]:
+                pending.discard(name)
+                cancelled[name].set()
+                futures[name].cancel()
+                self._abandon(futures[name])
+                yield "done", name, {
+                    "error": TimeoutError(f"Zaman aşımı ({deadlines[name] - started:.1f} sn)"),
+                    "seconds": now - started,
+                }
+
+    def _drain(self, name, fn, events, cancelled, started):
+        """Generator'ı tüket, parçaları ve sonucu olay kuyruğuna yaz"""
+        generator = None
+        try:
+            generator = fn()
+            while not cancelled.is_set():
+                try:
+                    delta = next(generator)
+                except StopIteration as stop:
+                    events.put(("done", name, {"result": stop.value, "seconds": time.perf_counter() - started}))
+                    return
+                events.put(("delta", name, delta))
+        except Exception as e:
+            events.put(("done", name, {"error": e, "seconds": time.perf_counter() - started}))
+        finally:
+            if generator is not None and cancelled.is_set():
+                generator.close()
+
+    def _submit(self, fn, *args):
+        """fn'i aktif yer açılınca kendi thread'inde çalıştır; Future döndür"""
+        future = Future()
+        future.slot = {"held": False, "abandoned": False}
+
+        def run():
+            self._slots.acquire()
+            with self._lock:
+                future.slot["held"] = True
+            try:
+                if future.set_running_or_notify_cancel():
+                    try:
+                        future.set_result(fn(*args))
+                    except BaseException as e:
+                        future.set_exception(e)
+            finally:
+                with self._lock:
+                    slot = future.slot
+                    slot["held"] = False
+                    if slot["abandoned"]:
+                        self.abandoned -= 1
+                    else:
+                        self._slots.release()
+
+        threading.Thread(target=run, name="compare", daemon=True).start()
+        return future
+
+    def _abandon(self, future):
+        """Süresi dolan görevin yerini (bırakılan görev sınırı dolmadıysa) yeni görevlere aç"""
+        with self._lock:
+            slot = future.slot
+            if slot["held"] and not slot["abandoned"] and self.abandoned < self.max_abandoned:
+                slot["abandoned"] = True
+                self.abandoned += 1
+                self._slots.release()
+
+    def _outcome(self, future, seconds):
+        try:
+            return {"result": future.result(), "seconds": seconds}
+        except Exception as e:
+            return {"error": e, "seconds": seconds}
+
+    def stats(self):
+        with self._lock:
+            return {"max_workers": self.max_workers, "abandoned": self.abandoned}
+
+    def close(self):
+        """Thread'ler görev başına açılır ve daemon'dır; kapatılacak havuz yok"""
+        pass
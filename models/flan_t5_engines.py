@@ -0,0 +1,93 @@
+import os
+
+ENGINES = ("torch", "int8", "onnx")
+ONNX_CACHE_DIR = os.path.join("models_cache", "onnx")
+
+
+def resolve_engine(engine=None):
+    """Motor adını (argüman > FLAN_T5_ENGINE > torch) doğrula"""
+    engine = (engine or os.getenv("FLAN_T5_ENGINE") or "torch").lower()
+    if engine not in ENGINES:
+        raise ValueError(f"Bilinmeyen Flan-T5 motoru: {engine} (seçenekler: {', '.join(ENGINES)})")
+    return engine
+
+
+def _env_threads():
+    """FLAN_T5_THREADS; pozitif tam sayı değilse uyarı verip varsayılana (None) dön"""
+    value = os.getenv("FLAN_T5_THREADS")
+    if not value:
+        return None
+    try:
+        threads = int(value)
+    except ValueError:
+        threads = 0
+    if threads < 1:
+        print(f"Geçersiz FLAN_T5_THREADS değeri ({value!r}), varsayılan thread sayısı kullanılıyor")
+        return None
+    return threads
+
+
+def set_num_threads(num_threads=None):
+    """PyTorch intra-op thread sayısını ayarla (argüman > FLAN_T5_THREADS); ayarlanan değeri döndür"""
+    num_threads = num_threads or _env_threads()
+    if num_threads:
+        import torch
+        torch.set_num_threads(num_threads)
+    return num_threads
+
+
+def load_seq2seq(model_name, engine="torch", num_threads=None, onnx_dir=None):
+    """Seçilen motorla (model, tokenizer) yükle.
+
+    torch: varsayılan fp32 PyTorch modeli.
+    int8:  Linear katmanları dinamik int8 kuantize edilmiş PyTorch modeli.
+    onnx:  optimum ile ONNX'e aktarılmış encoder/decoder (KV cache'li) ONNX Runtime modeli;
+           aktarılan model `onnx_dir` altında saklanır ve sonraki açılışlarda yeniden kullanılır.
+    """
+    from transformers import AutoTokenizer
+
+    engine = resolve_engine(engine)
+    num_threads = set_num_threads(num_threads)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+
+    if engine == "onnx":
+        return _load_onnx(model_name, num_threads, onnx_dir), tokenizer
+
+    from transformers import AutoModelForSeq2SeqLM
+    model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
+    model.eval()
+    if engine == "int8":
+        import torch
+        try:
+            from torch.ao.quantization import quantize_dynamic
+        except ImportError:
+            from torch.quantization import quantize_dynamic
+        model = quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return model, tokenizer
+
+
+def _load_onnx(model_name, num_threads, onnx_dir):
+    try:
+        import onnxruntime
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM
+    except ImportError:
+        raise ImportError("ONNX motoru için: pip install optimum[onnxruntime]")
+
+    session_options = onnxruntime.SessionOptions()
+    if num_threads:
+        session_options.intra_op_num_threads = num_threads
+    session_options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+    onnx_dir = onnx_dir or os.path.join(ONNX_CACHE_DIR, model_name.replace("/", "--"))
+    if os.path.isdir(onnx_dir) and os.listdir(onnx_dir):
+        return ORTModelForSeq2SeqLM.from_pretrained(onnx_dir, use_cache=True, session_options=session_options)
+
+    print(f"⏳ {model_name} ONNX'e aktarılıyor ({onnx_dir})...")
+    model = ORTModelForSeq2SeqLM.from_pretrained(
+        model_name, export=True, use_cache=True, session_options=session_options
+    )
+    try:
+        model.save_pretrained(onnx_dir)
+    except OSError as e:
+        print(f"ONNX modeli kaydedilemedi: {e}")
+    return model
@@ -1,90 +1,64 @@
+import os
+import queue
+import threading
 from transformers.pipelines import pipeline
 from .base_model import BaseRAGModel
+from .flan_t5_engines import load_seq2seq, resolve_engine
+from .intent_router import get_intent_router
 import re
-from transformers import AutoTokenizer
+from transformers import StoppingCriteria, StoppingCriteriaList, TextIteratorStreamer
+from .streaming import StreamingCleaner
+
+# Akışta bir sonraki parça için en fazla beklenecek süre (sn); üretim thread'i takılırsa tüketici serbest kalır
+STREAM_TOKEN_TIMEOUT = float(os.getenv("FLAN_T5_STREAM_TOKEN_TIMEOUT", "30"))
+
+
+class _StopOnEvent(StoppingCriteria):
+    """Event set edilince generate() döngüsünü bir sonraki token'da durdurur"""
+
+    def __init__(self, event):
+        self.event = event
+
+    def __call__(self, input_ids, scores, **kwargs):
+        return self.event.is_set()
+
 
 class FlanT5RAGModel(BaseRAGModel):
-    def __init__(self, model_name="google/flan-t5-base"):
+    max_input_tokens = 510
+    metrics_label = "flan_t5"
+    
+    def __init__(self, model_name="google/flan-t5-base", engine=None, num_threads=None, greedy=None):
+        # engine: torch | int8 | onnx (varsayılan FLAN_T5_ENGINE); greedy: örneklemesiz, deterministik üretim
+        self.engine = resolve_engine(engine)
+        self.num_threads = num_threads
+        self.greedy = greedy if greedy is not None else os.getenv("FLAN_T5_GREEDY", "0") == "1"
         super().__init__(model_name)
-        self._setup_social_responses()
-        self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+        self.intent_router = get_intent_router()
     
     def _initialize_model(self):
-        """Flan-T5 model'ini başlat"""
-        self.qa_pipe = pipeline(
-            "text2text-generation", 
-            model=self.model_name, 
-            max_length=384, 
-            do_sample=True,
-            temperature=0.7,
-            top_p=0.9,
-            repetition_penalty=1.5
-        )
-    
-    def _setup_social_responses(self):
-        """Sosyal etkileşim cevaplarını ayarla"""
-        self.social_responses = {
-            'Greeting': [
-                "Merhaba! Ben ilk yardım asistanınızım. Size nasıl yardımcı olabilirim?",
-                "Günaydın! Sağlık konularında destek vermek için buradayım.",
-                "Merhaba! Acil durumlar ve ilk yardım hakkında sorularınızı yanıtlayabilirim.",
-                "Selamlar! Sağlığınızla ilgili endişeleriniz varsa yardımcı olmaya hazırım.",
-                "İyi günler! İlk yardım konusunda sorularınızı yanıtlamaya hazırım."
-            ],
-            'Goodbye': [
-                "İyi günler! Sağlığınıza dikkat edin ve gerekirse tekrar sorun.",
-                "Hoşça kalın! Acil durumlarda yardım almaktan çekinmeyin.",
-                "Görüşmek üzere! Sağlıklı günler dilerim.",
-                "İyi günler! Sağlığınızla ilgili endişeleriniz olursa tekrar danışabilirsiniz.",
-                "Hoşça kalın! Acil durumlarda tekrar sorabilirsiniz."
-            ],
-            'Thanks': [
-                "Rica ederim! Sağlığınız için her zaman buradayım.",
-                "Ne demek! Sağlık konularında yardımcı olmak benim görevim.",
-                "Rica ederim! Acil durumlarda tekrar danışabilirsiniz.",
-                "Çok rica ederim! Sağlığınızla ilgili endişeleriniz olursa yardımcı olmaya hazırım.",
-                "Rica ederim! Başka sorularınız varsa yardımcı olmaya hazırım."
-            ]
-        }
-        
-        self.social_patterns = {
-            'Greeting': [
-                r'\b(merhaba|selam|selamlar)\b',
-                r'\b(günaydın|iyi günler|iyi akşamlar|iyi geceler)\b',
-                r'\b(hey|hi|hello|good morning|good afternoon|good evening)\b',
-                r'\b(nasılsın|nasılsınız|naber|ne haber|ne var ne yok)\b',
-                r'\b(hoş geldin|hoş geldiniz|welcome)\b'
-            ],
-            'Goodbye': [
-                r'\b(hoşça kal|hoşça kalın|görüşürüz|görüşmek üzere)\b',
-                r'\b(bye|goodbye|see you|take care)\b',
-                r'\b(tamam|tamamdır|anladım|peki)\b'
-            ],
-            'Thanks': [
-                r'\b(teşekkürler|teşekkür ederim|teşekkürler)\b',
-                r'\b(thanks|thank you|thx)\b',
-                r'\b(sağol|sağolun|sağolun var olun)\b',
-                r'\b(çok teşekkürler|çok teşekkür ederim|çok sağolun)\b'
-            ]
-        }
+        """Flan-T5 model'ini seçilen motorla başlat"""
+        model, self.tokenizer = load_seq2seq(self.model_name, self.engine, self.num_threads)
+        self.qa_pipe = pipeline("text2text-generation", model=model, tokenizer=self.tokenizer)
+    
+    def warmup(self):
+        """Kısa bir greedy üretimle tembel yüklenen kernel'leri ve bellek ayırmalarını tetikle"""
+        prompt = self._create_qa_prompt("Yanık durumunda ne yapmalıyım?", "Yanık bölgesini soğuk suyla soğutun.")
+        self.qa_pipe(prompt, max_length=16, do_sample=False, num_beams=1)
+    
+    @property
+    def generation_kwargs(self):
+        """Tüm üretim yollarında (tekil, batch, akış) kullanılan ayarlar"""
+        if self.greedy:
+            return dict(max_length=384, do_sample=False, num_beams=1, repetition_penalty=1.5)
+        return dict(max_length=384, do_sample=True, temperature=0.7, top_p=0.9, repetition_penalty=1.5)
     
     def is_social_interaction(self, query):
-        """Sorgunun sosyal etkileşim olup olmadığını kontrol et"""
-        query_lower = query.lower().strip()
-        
-        for intent, patterns in self.social_patterns.items():
-            for pattern in patterns:
-                if re.search(pattern, query_lower):
-                    return intent
-        
-        return None
+        """Sorgunun sosyal etkileşim (veya reddedilecek konu) olup olmadığını kontrol et"""
+        return self.intent_router.route(query)
     
     def get_social_response(self, intent):
         """Sosyal etkileşim için cevap döndür"""
-        import random
-        if intent in self.social_responses:
-            return random.choice(self.social_responses[intent])
-        return ""
+        return self.intent_router.respond(intent)
     
     def _create_qa_prompt(self, query, context):
         """Cevap üretimi için daha açıklayıcı ve detaylı cevap isteyen prompt oluştur"""
@@ -104,39 +78,158 @@ Cevap:"""
         """Art arda tekrar eden cümle veya kelime gruplarını temizle"""
         return re.sub(r'(\b\w+(?:\s+\w+){0,5}\b)(?:\s*\1\b)+', r'\1', text)
     
-    def _truncate_context(self, context, query, max_input_tokens=510):
-        """Prompt+context toplam token sayısını 510'u aşmayacak şekilde context'i kademeli olarak kısalt"""
-        base_prompt = f"Aşağıdaki bilgilere dayanarak soruyu Türkçe olarak detaylı ve açıklayıcı şekilde yanıtla. Gerekiyorsa adım adım açıkla:\n\nBilgi: "
-        suffix = f"\n\nSoru: {query}\n\nCevap:"
-        context_words = context.split()
-        while True:
-            joined_context = ' '.join(context_words)
-            prompt = base_prompt + joined_context + suffix
-            tokens = self.tokenizer.encode(prompt)
-            if len(tokens) <= max_input_tokens or len(context_words) <= 10:
-                return joined_context
-            context_words = context_words[:-max(1, int(len(context_words)*0.05))]
+    @property
+    def tokenizer_name(self):
+        return self.model_name
+    
+    def count_tokens(self, text):
+        """Flan-T5 tokenizer'ı ile token sayısı (özel tokenlar hariç)"""
+        return len(self.tokenizer.encode(text, add_special_tokens=False))
+    
+    def truncate_tokens(self, text, max_tokens):
+        """Metni tam olarak max_tokens'ıncı token'ın bittiği karakterden kes"""
+        if max_tokens <= 0:
+            return ""
+        try:
+            encoding = self.tokenizer(text, add_special_tokens=False, return_offsets_mapping=True)
+            offsets = encoding["offset_mapping"]
+            if len(offsets) <= max_tokens:
+                return text
+            return text[:offsets[max_tokens - 1][1]]
+        except (NotImplementedError, KeyError, TypeError):
+            # Yavaş (Python) tokenizer'larda offset bilgisi yok
+            ids = self.tokenizer.encode(text, add_special_tokens=False)
+            if len(ids) <= max_tokens:
+                return text
+            return self.tokenizer.decode(ids[:max_tokens], skip_special_tokens=True)
     
     def generate_answer(self, query, context):
         """Soru ve context'e göre cevap üret"""
         social_intent = self.is_social_interaction(query)
         if social_intent:
             return self.get_social_response(social_intent)
-        context = self._truncate_context(context, query, max_input_tokens=510)
+        context = self._truncate_context(context, query)
         try:
             prompt = self._create_qa_prompt(query, context)
-            result = self.qa_pipe(prompt, max_length=384, do_sample=True, temperature=0.7)
-            answer = result[0]['generated_text'].strip()
-            answer = self._remove_surrogates(answer)
-            answer = self._remove_repetitions(answer)
-            if answer and len(answer) < 10:
-                return "Üzgünüm, bu konuda yeterli bilgi bulamadım."
-            if answer and len(answer) > 1000:
-                answer = answer[:1000] + "..."
-            return answer
+            with self.metrics.span("model_generate", backend=self.metrics_label, mode="single"):
+                result = self.qa_pipe(prompt, **self.generation_kwargs)
+            answer = result[0]['generated_text']
+            self._record_generation(prompt, answer)
+            return self._postprocess_answer(answer)
         except Exception as e:
             print(f"Model hatası: {e}")
-            return "Üzgünüm, şu anda cevap üretemiyorum."
+            return self._fallback("Üzgünüm, şu anda cevap üretemiyorum.", "error")
+    
+    def generate_answer_stream(self, query, context, stop_event=None):
+        """Cevabı token streamer ile üretildikçe, temizlenmiş parçalar halinde döndür.
+
+        Üretim ayrı bir thread'de sürer; tüketici akışı bıraktığında (break, close)
+        veya `stop_event` set edildiğinde üretim bir sonraki token'da durur ve akış
+        thread bitene kadar kapanmaz. Cevabın bir kısmı gönderildikten sonra
+        oluşan hata, yarım cevap tam sanılmasın diye çağırana iletilir.
+        """
+        social_intent = self.is_social_interaction(query)
+        if social_intent:
+            yield self.get_social_response(social_intent)
+            return
+        context = self._truncate_context(context, query)
+        cleaner = StreamingCleaner(cleanups=[self._remove_surrogates, self._remove_repetitions])
+        stop_event = stop_event or threading.Event()
+        generation = None
+        try:
+            prompt = self._create_qa_prompt(query, context)
+            inputs = self.tokenizer(prompt, return_tensors="pt")
+            streamer = TextIteratorStreamer(self.tokenizer, skip_prompt=True, skip_special_tokens=True,
+                                            timeout=STREAM_TOKEN_TIMEOUT)
+            errors = []
+            generation = threading.Thread(
+                target=self._generate_into,
+                args=(streamer, errors, dict(
+                    **inputs, streamer=streamer, stopping_criteria=StoppingCriteriaList([_StopOnEvent(stop_event)]),
+                    **self.generation_kwargs
+                )),
+                name="flan-t5-stream",
+                daemon=True
+            )
+            with self.metrics.span("model_generate", backend=self.metrics_label, mode="stream"):
+                generation.start()
+                try:
+                    for piece in streamer:
+                        delta = cleaner.feed(piece)
+                        if delta:
+                            yield delta
+                        if cleaner.done:
+                            break
+                except queue.Empty:
+                    raise TimeoutError(f"Flan-T5 {STREAM_TOKEN_TIMEOUT:.0f} sn içinde yeni token üretmedi")
+                if errors:
+                    raise errors[0]
+                delta = cleaner.finish()
+                if delta:
+                    yield delta
+            if cleaner.fell_back:
+                self._fallback(cleaner.text, "short")
+            self._record_generation(None, cleaner.text, prompt_tokens=inputs["input_ids"].shape[-1])
+        except Exception as e:
+            print(f"Model hatası: {e}")
+            if cleaner.text:
+                raise
+            yield self._fallback("Üzgünüm, şu anda cevap üretemiyorum.", "error")
+        finally:
+            stop_event.set()
+            if generation is not None and generation.is_alive():
+                generation.join(STREAM_TOKEN_TIMEOUT)
+    
+    def _generate_into(self, streamer, errors, kwargs):
+        """Akış thread'i: hatayı tüketiciye iletmek için sakla ve bekleyen tüketiciyi uyandır"""
+        try:
+            self.qa_pipe.model.generate(**kwargs)
+        except Exception as e:
+            errors.append(e)
+            streamer.end()
+    
+    def generate_answers(self, queries, contexts, batch_size=8):
+        """Soruları uzunluğa göre gruplayıp text2text pipeline'ında batch halinde cevapla"""
+        answers = [None] * len(queries)
+        pending = []
+        for i, (query, context) in enumerate(zip(queries, contexts)):
+            social_intent = self.is_social_interaction(query)
+            if social_intent:
+                answers[i] = self.get_social_response(social_intent)
+                continue
+            prompt = self._create_qa_prompt(query, self._truncate_context(context, query))
+            pending.append((self.count_tokens(prompt), i, prompt))
+        
+        # Benzer uzunluktaki prompt'lar aynı batch'e düşsün ki padding az olsun
+        pending.sort(key=lambda item: item[0])
+        for start in range(0, len(pending), batch_size):
+            bucket = pending[start:start + batch_size]
+            prompts = [prompt for _, _, prompt in bucket]
+            try:
+                with self.metrics.span("model_generate", backend=self.metrics_label, mode="batch") as span:
+                    span.set(batch_size=len(prompts))
+                    results = self.qa_pipe(prompts, batch_size=len(prompts), **self.generation_kwargs)
+                for (prompt_tokens, i, _), result in zip(bucket, results):
+                    if isinstance(result, list):
+                        result = result[0]
+                    self._record_generation(None, result['generated_text'], prompt_tokens=prompt_tokens)
+                    answers[i] = self._postprocess_answer(result['generated_text'])
+            except Exception as e:
+                print(f"Model hatası: {e}")
+                for _, i, _ in bucket:
+                    answers[i] = self._fallback("Üzgünüm, şu anda cevap üretemiyorum.", "error")
+        return answers
+    
+    def _postprocess_answer(self, answer):
+        """Üretilen cevabı temizle ve uzunluğunu sınırla"""
+        answer = answer.strip()
+        answer = self._remove_surrogates(answer)
+        answer = self._remove_repetitions(answer)
+        if answer and len(answer) < 10:
+            return self._fallback("Üzgünüm, bu konuda yeterli bilgi bulamadım.", "short")
+        if answer and len(answer) > 1000:
+            answer = answer[:1000] + "..."
+        return answer
 
 def test_model():
     """Model'i test et"""
@@ -0,0 +1,345 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from rag.metrics import get_metrics
+
+
+class GeminiError(Exception):
+    """Gemini çağrısı başarısız oldu"""
+
+
+class RateLimited(GeminiError):
+    """Hız sınırı (429); retry_after saniye sonra tekrar denenebilir"""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TransientError(GeminiError):
+    """Geçici sunucu hatası (5xx, zaman aşımı); tekrar denenebilir"""
+
+
+class CircuitOpen(GeminiError):
+    """Devre açık: Gemini bir süre çağrılmıyor"""
+
+
+class GeminiReply:
+    __slots__ = ("text", "prompt_tokens", "answer_tokens")
+
+    def __init__(self, text, prompt_tokens=None, answer_tokens=None):
+        self.text = text
+        self.prompt_tokens = prompt_tokens
+        self.answer_tokens = answer_tokens
+
+
+def _classify(error):
+    """SDK / HTTP hatasını GeminiError türüne çevir"""
+    if isinstance(error, GeminiError):
+        return error
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError)):
+        return TransientError(f"Zaman aşımı: {error}")
+    code = getattr(error, "code", None)
+    name = type(error).__name__
+    if code == 429 or name in ("ResourceExhausted", "TooManyRequests"):
+        return RateLimited(str(error))
+    if code in (500, 502, 503, 504) or name in (
+        "ServiceUnavailable", "InternalServerError", "DeadlineExceeded", "GatewayTimeout", "RetryError"
+    ):
+        return TransientError(str(error))
+    return GeminiError(str(error))
+
+
+class SDKTransport:
+    """google-generativeai SDK'sı üzerinden çağrı"""
+
+    _configured = set()
+    _configure_lock = threading.Lock()
+
+    def __init__(self, model_name, api_key):
+        from google.generativeai.client import configure
+        from google.generativeai.generative_models import GenerativeModel
+
+        with self._configure_lock:
+            if api_key not in self._configured:
+                configure(api_key=api_key)
+                self._configured.add(api_key)
+        self.model_name = model_name
+        self.model = GenerativeModel(model_name)
+
+    async def generate(self, prompt, timeout):
+        response = await self.model.generate_content_async(prompt, request_options={"timeout": timeout})
+        usage = getattr(response, "usage_metadata", None)
+        return GeminiReply(
+            _response_text(response),
+            getattr(usage, "prompt_token_count", None) if usage else None,
+            getattr(usage, "candidates_token_count", None) if usage else None,
+        )
+
+    def stream(self, prompt, timeout):
+        for chunk in self.model.generate_content(prompt, stream=True, request_options={"timeout": timeout}):
+            yield _response_text(chunk)
+
+
+def _response_text(response):
+    try:
+        return response.text or ""
+    except ValueError:
+        # Güvenlik filtresi vb. nedeniyle aday yoksa .text hata verir
+        return ""
+
+
+class RESTTransport:
+    """Gemini REST API'si (veya aynı arayüzü sunan yerel sahte sunucu) üzerinden çağrı"""
+
+    def __init__(self, model_name, api_key, base_url="https://generativelanguage.googleapis.com"):
+        self.model_name = model_name
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+
+    def _request(self, method, prompt, timeout, query=""):
+        url = f"{self.base_url}/v1beta/models/{self.model_name}:{method}?key={self.api_key}{query}"
+        body = json.dumps({"contents": [{"parts": [{"text": prompt}]}]}).encode("utf-8")
+        request = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"})
+        try:
+            return urllib.request.urlopen(request, timeout=timeout)
+        except urllib.error.HTTPError as e:
+            detail = e.read().decode("utf-8", "replace")[:200]
+            if e.code == 429:
+                retry_after = e.headers.get("Retry-After")
+                raise RateLimited(f"429: {detail}", float(retry_after) if retry_after else None)
+            if e.code >= 500:
+                raise TransientError(f"{e.code}: {detail}")
+            raise GeminiError(f"{e.code}: {detail}")
+        except (urllib.error.URLError, OSError) as e:
+            raise TransientError(str(e))
+
+    async def generate(self, prompt, timeout):
+        return await asyncio.get_running_loop().run_in_executor(None, self._generate, prompt, timeout)
+
+    def _generate(self, prompt, timeout):
+        with self._request("generateContent", prompt, timeout) as response:
+            data = json.loads(response.read().decode("utf-8"))
+        usage = data.get("usageMetadata", {})
+        return GeminiReply(_payload_text(data), usage.get("promptTokenCount"), usage.get("candidatesTokenCount"))
+
+    def stream(self, prompt, timeout):
+        with self._request("streamGenerateContent", prompt, timeout, query="&alt=sse") as response:
+            for line in response:
+                line = line.decode("utf-8").strip()
+                if line.startswith("data:"):
+                    yield _payload_text(json.loads(line[5:]))
+
+
+def _payload_text(data):
+    candidates = data.get("candidates") or []
+    if not candidates:
+        return ""
+    parts = (candidates[0].get("content") or {}).get("parts") or []
+    return "".join(part.get("text", "") for part in parts)
+
+
+class CircuitBreaker:
+    """Art arda `failure_threshold` hatadan sonra `reset_timeout` saniye çağrıları kesen devre.
+
+    Süre dolunca tek bir deneme çağrısına izin verilir (yarı açık); başarılı
+    olursa devre kapanır, başarısız olursa yeniden açılır.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                return "half_open"
+            return "open"
+
+    def before_call(self):
+        """Devre açıksa CircuitOpen fırlat"""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            remaining = self.reset_timeout - (time.monotonic() - self._opened_at)
+            if remaining > 0 or self._probing:
+                raise CircuitOpen(f"Gemini devresi açık ({max(0.0, remaining):.0f} sn)")
+            self._probing = True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+
+class GeminiClient:
+    """Paylaşılan, dayanıklı Gemini istemcisi.
+
+    Çağrılar kendi event loop'unu çalıştıran bir arka plan thread'inde yürür;
+    böylece farklı thread'lerden gelen aynı prompt'lu eşzamanlı istekler tek
+    upstream çağrısını paylaşır (singleflight). Eşzamanlı çağrı sayısı
+    `max_concurrency` ile sınırlıdır; her deneme `timeout` saniyeyle kesilir,
+    hız sınırı ve geçici hatalarda jitter'lı üstel bekleme ile en fazla
+    `max_retries` kez tekrar denenir. Art arda hatalarda devre açılır ve
+    çağrılar hemen CircuitOpen ile reddedilir.
+    """
+
+    def __init__(self, transport, max_concurrency=4, timeout=30.0, max_retries=3,
+                 backoff_base=0.5, backoff_max=8.0, breaker=None):
+        self.transport = transport
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker()
+        self.metrics = get_metrics()
+        self.coalesced = 0
+        self._inflight = {}
+        self._loop = asyncio.new_event_loop()
+        self._limiter = None
+        self._thread = threading.Thread(target=self._loop.run_forever, name="gemini-client", daemon=True)
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._create_limiter(), self._loop).result()
+
+    async def _create_limiter(self):
+        self._limiter = asyncio.Semaphore(self.max_concurrency)
+
+    def generate(self, prompt, timeout=None):
+        """Bloklayan çağrı (herhangi bir thread'den); GeminiReply döndürür"""
+        future = asyncio.run_coroutine_threadsafe(self._generate(prompt), self._loop)
+        return future.result(timeout)
+
+    async def generate_async(self, prompt):
+        """Başka bir event loop'tan beklenebilir çağrı"""
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(self._generate(prompt), self._loop))
+
+    async def _generate(self, prompt):
+        key = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        task = self._inflight.get(key)
+        if task is None:
+            task = self._loop.create_task(self._call(prompt))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+            self.metrics.inc("gemini_coalesced_total")
+        return await asyncio.shield(task)
+
+    async def _call(self, prompt):
+        for attempt in range(self.max_retries + 1):
+            self.breaker.before_call()
+            try:
+                async with self._limiter:
+                    reply = await asyncio.wait_for(self.transport.generate(prompt, self.timeout), self.timeout)
+            except Exception as e:
+                error = _classify(e)
+                if not isinstance(error, (RateLimited, TransientError)):
+                    # İstek hatası (400 vb.) servisin sağlığını göstermez
+                    self.breaker.record_success()
+                    raise error from e
+                self.breaker.record_failure()
+                self.metrics.inc("gemini_errors_total", kind=type(error).__name__)
+                if attempt == self.max_retries:
+                    raise error from e
+                await asyncio.sleep(self._backoff(attempt, error))
+                continue
+            self.breaker.record_success()
+            return reply
+
+    def _backoff(self, attempt, error):
+        """Üstel bekleme, tam jitter; sunucu Retry-After verdiyse ona uyulur"""
+        retry_after = getattr(error, "retry_after", None)
+        if retry_after:
+            return retry_after + random.uniform(0, self.backoff_base)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def stream(self, prompt, timeout=None):
+        """Parça parça metin üreten bloklayan generator; ilk parçadan önceki hatalar tekrar denenir"""
+        timeout = timeout or self.timeout
+        asyncio.run_coroutine_threadsafe(self._limiter.acquire(), self._loop).result()
+        try:
+            for attempt in range(self.max_retries + 1):
+                self.breaker.before_call()
+                started = False
+                try:
+                    for piece in self.transport.stream(prompt, timeout):
+                        started = True
+                        yield piece
+                except Exception as e:
+                    error = _classify(e)
+                    if not isinstance(error, (RateLimited, TransientError)):
+                        self.breaker.record_success()
+                        raise error from e
+                    self.breaker.record_failure()
+                    self.metrics.inc("gemini_errors_total", kind=type(error).__name__)
+                    if started or attempt == self.max_retries:
+                        raise error from e
+                    time.sleep(self._backoff(attempt, error))
+                    continue
+                self.breaker.record_success()
+                return
+        finally:
+            self._loop.call_soon_threadsafe(self._limiter.release)
+
+    def stats(self):
+        return {
+            "circuit": self.breaker.state,
+            "inflight": len(self._inflight),
+            "coalesced": self.coalesced,
+        }
+
+    def close(self):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_gemini_client(model_name="gemini-1.5-flash", api_key=None, base_url=None):
+    """Model (ve adres) başına paylaşılan istemci.
+
+    GEMINI_BASE_URL verilmişse REST API'si bu adrese yapılır (ör. yerel sahte sunucu);
+    değilse resmi SDK kullanılır.
+    """
+    api_key = api_key or os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        raise ValueError("GEMINI_API_KEY environment variable is required")
+    base_url = base_url or os.getenv("GEMINI_BASE_URL")
+    key = (model_name, base_url, hashlib.sha256(api_key.encode("utf-8")).hexdigest())
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            if base_url:
+                transport = RESTTransport(model_name, api_key, base_url)
+            else:
+                transport = SDKTransport(model_name, api_key)
+            client = GeminiClient(
+                transport,
+                max_concurrency=int(os.getenv("GEMINI_MAX_CONCURRENCY", "4")),
+                timeout=float(os.getenv("GEMINI_TIMEOUT", "30")),
+            )
+            _clients[key] = client
+        return client
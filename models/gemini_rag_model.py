@@ -1,93 +1,47 @@
 import os
-from google.generativeai.client import configure
-from google.generativeai.generative_models import GenerativeModel
 from .base_model import BaseRAGModel
-import re
+from .gemini_client import GeminiError, get_gemini_client
+from .intent_router import get_intent_router
+from .streaming import StreamingCleaner
 
 class GeminiRAGModel(BaseRAGModel):
-    def __init__(self, model_name: str = "gemini-1.5-flash"):
-        api_key = os.getenv("GEMINI_API_KEY")
-        if not api_key:
+    max_input_tokens = 8000
+    metrics_label = "gemini"
+    
+    def __init__(self, model_name: str = "gemini-1.5-flash", client=None, local_fallback: bool = True):
+        if client is None and not os.getenv("GEMINI_API_KEY"):
             raise ValueError("GEMINI_API_KEY environment variable is required")
         
-        configure(api_key=api_key)
+        self.client = client
+        # Gemini'ye ulaşılamazsa (devre açık, hız sınırı, zaman aşımı) cevap yerel modelden alınır
+        self.local_fallback = local_fallback
         super().__init__(model_name)
-        self._setup_social_responses()
+        self.intent_router = get_intent_router()
     
     def _initialize_model(self):
-        """Gemini model'ini başlat"""
-        try:
-            model_name = self.model_name or "gemini-1.5-flash"
-            self.model = GenerativeModel(model_name)
-        except Exception as e:
-            print(f"Model {self.model_name} bulunamadı, varsayılan model deneniyor...")
-            try:
-                self.model = GenerativeModel("gemini-1.5-flash")
-            except:
-                self.model = GenerativeModel("gemini-pro")
+        """Paylaşılan Gemini istemcisini al"""
+        if self.client is None:
+            self.client = get_gemini_client(self.model_name or "gemini-1.5-flash")
     
-    def _setup_social_responses(self):
-        """Sosyal etkileşim cevaplarını ayarla"""
-        self.social_responses = {
-            'Greeting': [
-                "Merhaba! Ben ilk yardım asistanınızım. Size nasıl yardımcı olabilirim?",
-                "Günaydın! Sağlık konularında destek vermek için buradayım.",
-                "Merhaba! Acil durumlar ve ilk yardım hakkında sorularınızı yanıtlayabilirim.",
-                "Selamlar! Sağlığınızla ilgili endişeleriniz varsa yardımcı olmaya hazırım.",
-                "İyi günler! İlk yardım konusunda sorularınızı yanıtlamaya hazırım."
-            ],
-            'Goodbye': [
-                "İyi günler! Sağlığınıza dikkat edin ve gerekirse tekrar sorun.",
-                "Hoşça kalın! Acil durumlarda yardım almaktan çekinmeyin.",
-                "Görüşmek üzere! Sağlıklı günler dilerim.",
-                "İyi günler! Sağlığınızla ilgili endişeleriniz olursa tekrar danışabilirsiniz.",
-                "Hoşça kalın! Acil durumlarda tekrar sorabilirsiniz."
-            ],
-            'Thanks': [
-                "Rica ederim! Sağlığınız için her zaman buradayım.",
-                "Ne demek! Sağlık konularında yardımcı olmak benim görevim.",
-                "Rica ederim! Acil durumlarda tekrar danışabilirsiniz.",
-                "Çok rica ederim! Sağlığınızla ilgili endişeleriniz olursa yardımcı olmaya hazırım.",
-                "Rica ederim! Başka sorularınız varsa yardımcı olmaya hazırım."
-            ]
-        }
-        
-        self.social_patterns = {
-            'Greeting': [
-                r'\b(merhaba|selam|selamlar)\b',
-                r'\b(günaydın|iyi günler|iyi akşamlar|iyi geceler)\b',
-                r'\b(hey|hi|hello|good morning|good afternoon|good evening)\b',
-                r'\b(nasılsın|nasılsınız|naber|ne haber|ne var ne yok)\b',
-                r'\b(hoş geldin|hoş geldiniz|welcome)\b'
-            ],
-            'Goodbye': [
-                r'\b(hoşça kal|hoşça kalın|görüşürüz|görüşmek üzere)\b',
-                r'\b(bye|goodbye|see you|take care)\b',
-                r'\b(tamam|tamamdır|anladım|peki)\b'
-            ],
-            'Thanks': [
-                r'\b(teşekkürler|teşekkür ederim|teşekkürler)\b',
-                r'\b(thanks|thank you|thx)\b',
-                r'\b(sağol|sağolun|sağolun var olun)\b',
-                r'\b(çok teşekkürler|çok teşekkür ederim|çok sağolun)\b'
-            ]
-        }
+    def _local_model(self):
+        """Yüklenmiş yerel Flan-T5 modeli; hazır değilse arka planda yüklemeyi başlatıp None döndür.
+
+        İstek yolunda model kurulmaz: ilk Gemini hatasında Flan-T5'i senkron yüklemek
+        isteği dakikalarca bekletir.
+        """
+        from rag.registry import get_registry
+        from .backends import backend_loader
+        registry = get_registry()
+        model = registry.peek("flan_t5")
+        if model is None:
+            registry.background.start([("flan_t5", backend_loader("flan_t5"))])
+        return model
     
     def is_social_interaction(self, query: str) -> str | None:
-        query_lower = query.lower().strip()
-        
-        for intent, patterns in self.social_patterns.items():
-            for pattern in patterns:
-                if re.search(pattern, query_lower):
-                    return intent
-        
-        return None
+        return self.intent_router.route(query)
     
     def get_social_response(self, intent: str) -> str:
-        import random
-        if intent in self.social_responses:
-            return random.choice(self.social_responses[intent])
-        return ""
+        return self.intent_router.respond(intent)
     
     def _create_qa_prompt(self, query: str, context: str) -> str:
         return f"""Aşağıdaki bilgilere dayanarak soruyu detaylı ve açıklayıcı şekilde yanıtla. Gerekiyorsa adım adım açıkla:
@@ -104,21 +58,83 @@ Cevap:"""
         if social_intent:
             return self.get_social_response(social_intent)
         
+        packed = self._truncate_context(context, query)
         try:
-            prompt = self._create_qa_prompt(query, context)
-            response = self.model.generate_content(prompt)
+            prompt = self._create_qa_prompt(query, packed)
+            with self.metrics.span("model_generate", backend=self.metrics_label, mode="single"):
+                reply = self.client.generate(prompt)
+            self._record_generation(prompt, reply.text, prompt_tokens=reply.prompt_tokens,
+                                    answer_tokens=reply.answer_tokens)
             
-            if response.text:
-                answer = response.text.strip()
+            if reply.text:
+                answer = reply.text.strip()
                 if len(answer) > 1000:
                     answer = answer[:1000] + "..."
                 return answer
             else:
-                return "Üzgünüm, bu konuda yeterli bilgi bulamadım."
+                return self._fallback("Üzgünüm, bu konuda yeterli bilgi bulamadım.", "empty")
                 
+        except GeminiError as e:
+            print(f"Gemini model hatası: {e}")
+            local_model = self._local_model() if self.local_fallback else None
+            if local_model is not None:
+                try:
+                    answer = local_model.generate_answer(query, context)
+                    self.metrics.inc("gemini_local_fallback_total", reason=type(e).__name__)
+                    return answer
+                except Exception as local_error:
+                    print(f"Yerel model hatası: {local_error}")
+            return self._fallback("Üzgünüm, şu anda cevap üretemiyorum.", "error")
+        except Exception as e:
+            print(f"Gemini model hatası: {e}")
+            return self._fallback("Üzgünüm, şu anda cevap üretemiyorum.", "error")
+
+    def generate_answer_stream(self, query: str, context, stop_event=None):
+        """Cevabı Gemini'den akış halinde alıp parça parça döndür; stop_event set edilince akışı bırak"""
+        social_intent = self.is_social_interaction(query)
+        if social_intent:
+            yield self.get_social_response(social_intent)
+            return
+        
+        packed = self._truncate_context(context, query)
+        cleaner = StreamingCleaner(min_chars=1, holdback_words=0)
+        try:
+            prompt = self._create_qa_prompt(query, packed)
+            with self.metrics.span("model_generate", backend=self.metrics_label, mode="stream"):
+                for piece in self.client.stream(prompt):
+                    if stop_event is not None and stop_event.is_set():
+                        return
+                    delta = cleaner.feed(piece)
+                    if delta:
+                        yield delta
+                    if cleaner.done:
+                        break
+                delta = cleaner.finish()
+                if delta:
+                    yield delta
+            if cleaner.fell_back:
+                self._fallback(cleaner.text, "empty")
+            self._record_generation(prompt, cleaner.text)
+        except GeminiError as e:
+            print(f"Gemini model hatası: {e}")
+            if cleaner.text:
+                # Yarım kalan cevap tam sanılıp önbelleğe yazılmasın: hata çağırana iletilir
+                raise
+            local_model = self._local_model() if self.local_fallback else None
+            if local_model is not None:
+                try:
+                    local_stream = local_model.generate_answer_stream(query, context, stop_event)
+                    self.metrics.inc("gemini_local_fallback_total", reason=type(e).__name__)
+                    yield from local_stream
+                    return
+                except Exception as local_error:
+                    print(f"Yerel model hatası: {local_error}")
+            yield self._fallback("Üzgünüm, şu anda cevap üretemiyorum.", "error")
         except Exception as e:
             print(f"Gemini model hatası: {e}")
-            return "Üzgünüm, şu anda cevap üretemiyorum."
+            if cleaner.text:
+                raise
+            yield self._fallback("Üzgünüm, şu anda cevap üretemiyorum.", "error")
 
 def test_model():
     """Model'i test et"""
@@ -0,0 +1,196 @@
+import os
+import random
+import re
+import threading
+import zipfile
+from rag.retrieval_cache import normalize_query
+
+DATASET_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "chatbot_dataset.xlsx")
+
+SOCIAL_RESPONSES = {
+    'Greeting': [
+        "Merhaba! Ben ilk yardım asistanınızım. Size nasıl yardımcı olabilirim?",
+        "Günaydın! Sağlık konularında destek vermek için buradayım.",
+        "Merhaba! Acil durumlar ve ilk yardım hakkında sorularınızı yanıtlayabilirim.",
+        "Selamlar! Sağlığınızla ilgili endişeleriniz varsa yardımcı olmaya hazırım.",
+        "İyi günler! İlk yardım konusunda sorularınızı yanıtlamaya hazırım."
+    ],
+    'Goodbye': [
+        "İyi günler! Sağlığınıza dikkat edin ve gerekirse tekrar sorun.",
+        "Hoşça kalın! Acil durumlarda yardım almaktan çekinmeyin.",
+        "Görüşmek üzere! Sağlıklı günler dilerim.",
+        "İyi günler! Sağlığınızla ilgili endişeleriniz olursa tekrar danışabilirsiniz.",
+        "Hoşça kalın! Acil durumlarda tekrar sorabilirsiniz."
+    ],
+    'Thanks': [
+        "Rica ederim! Sağlığınız için her zaman buradayım.",
+        "Ne demek! Sağlık konularında yardımcı olmak benim görevim.",
+        "Rica ederim! Acil durumlarda tekrar danışabilirsiniz.",
+        "Çok rica ederim! Sağlığınızla ilgili endişeleriniz olursa yardımcı olmaya hazırım.",
+        "Rica ederim! Başka sorularınız varsa yardımcı olmaya hazırım."
+    ],
+    'Reject': [
+        "Üzgünüm, yalnızca ilk yardım konularında yardımcı olabilirim."
+    ]
+}
+
+SOCIAL_PATTERNS = {
+    'Greeting': [
+        r'\b(merhaba|selam|selamlar)\b',
+        r'\b(günaydın|iyi günler|iyi akşamlar|iyi geceler)\b',
+        r'\b(hey|hi|hello|good morning|good afternoon|good evening)\b',
+        r'\b(nasılsın|nasılsınız|naber|ne haber|ne var ne yok)\b',
+        r'\b(hoş geldin|hoş geldiniz|welcome)\b'
+    ],
+    'Goodbye': [
+        r'\b(hoşça kal|hoşça kalın|görüşürüz|görüşmek üzere)\b',
+        r'\b(bye|goodbye|see you|take care)\b',
+        # Onay kelimeleri yalnızca sorgunun tamamıysa veda sayılır ("peki ya çocuklarda?" takip sorusudur)
+        r'^(tamam|tamamdır|anladım|peki)( (tamam|tamamdır|anladım|peki))*$'
+    ],
+    'Thanks': [
+        r'\b(teşekkürler|teşekkür ederim|teşekkürler)\b',
+        r'\b(thanks|thank you|thx)\b',
+        r'\b(sağol|sağolun|sağolun var olun)\b',
+        r'\b(çok teşekkürler|çok teşekkür ederim|çok sağolun)\b'
+    ],
+    'Reject': [
+        r'\b(hava durumu|maç|futbol|borsa|kripto|bitcoin|döviz|siyaset|seçim)\b',
+        # "-ken" zarf-fiilleri istek değil durum anlatır ("kod yazarken elimi kestim")
+        r'\b(şiir|şarkı|fıkra|hikaye) (yaz|söyle|anlat)(?!\w*ken\b)\w*',
+        r'\b(kod|program|ödev) (yaz|yap)(?!\w*ken\b)\w*',
+        r'\b(weather|football|stock|bitcoin|write a poem|write code)\b'
+    ]
+}
+
+# Sosyal kalıbın yanında soru varsa sorgu retrieval'a gider ("Merhaba, yanıkta ne yapmalı?")
+_QUESTION_MARKERS = re.compile(
+    r'\b(ne|neler|nedir|nasıl|neden|niçin|niye|hangi|kaç|mı|mi|mu|mü|mıdır|midir|mudur|müdür)\b'
+)
+_MAX_RESIDUAL_WORDS = 3
+# Bunlardan biri geçen sorgu her zaman retrieval'a gider ("Maç sırasında oyuncu bayıldı", "Merhaba, elimi kestim").
+# Kısa kökler yalnızca gerçek ilk yardım çekimleriyle eşleşir ("selam kanka", "kesinlikle", "çıkış" eşleşmez)
+_FIRST_AID_TERMS = re.compile(
+    r'\b(ilk yardım\w*|acil\w*|kaza(?!n)\w*|yara|yara(lar|sı|yı|da|m|mı)|yaral\w*|'
+    r'kan|kan(a|ı|da|ama\w*|amak|ıyor\w*|adı\w*)|kesi|kesik\w*|kest(i|im|in)\w*|kesil\w*|'
+    r'yanık\w*|yan(dı|dım|dın|mış)\w*|bayıl\w*|burkul\w*|kır(ık|ıl|dı)\w*|çıkık\w*|'
+    r'düş(tü|me|ük)\w*|zehir\w*|ağrı\w*|sok(tu|ma|ul)\w*|ısır\w*|boğul\w*|nefes\w*|kalp\w*|kalb\w*|'
+    r'kriz\w*|ateş\w*|şok|şok(ta|a|u)|çarp(tı|ıl|ma|ış)\w*|nöbet\w*|havale\w*)\b'
+)
+
+
+def load_intent_examples(path=DATASET_PATH):
+    """Veri setindeki (Intent, Örnek Cümle) satırlarını oku.
+
+    Dosya uzantısı .xlsx olsa da içerik düz CSV olabilir; cümlelerde tırnaksız
+    virgül bulunduğundan satır yalnızca ilk virgülden bölünür.
+    """
+    if not os.path.exists(path):
+        return []
+    if zipfile.is_zipfile(path):
+        import pandas as pd
+        frame = pd.read_excel(path)
+        return [(str(row.iloc[0]).strip(), str(row.iloc[1]).strip()) for _, row in frame.iterrows()]
+    examples = []
+    with open(path, "r", encoding="utf-8-sig") as f:
+        lines = f.read().splitlines()
+    for line in lines[1:]:
+        intent, _, sentence = line.partition(",")
+        if intent.strip() and sentence.strip():
+            examples.append((intent.strip(), sentence.strip()))
+    return examples
+
+
+class IntentRouter:
+    """Sorguyu retrieval'dan önce sosyal/ret niyetlerine yönlendiren yönlendirici.
+
+    Tüm kalıplar tek bir alternation'a derlenir ve normalize sorguda bir kez
+    aranır (en soldaki eşleşme kazanır). Veri setindeki örnek cümleler, sorgunun
+    tamamıyla eşleşen ayrı bir alternation olarak önce denenir. Sosyal kalıbın
+    dışında soru ifadesi ya da fazla kelime kalan sosyal sorgular ve ilk yardım
+    terimi geçen tüm sorgular (ret niyeti dahil) yönlendirilmez.
+    """
+
+    def __init__(self, patterns=None, responses=None, examples=(), skip_intents=("FirstAidInfo",)):
+        patterns = patterns or SOCIAL_PATTERNS
+        self.responses = {intent: list(items) for intent, items in (responses or SOCIAL_RESPONSES).items()}
+        self._group_intents = {}
+        alternatives = []
+        for intent, intent_patterns in patterns.items():
+            for pattern in intent_patterns:
+                group = f"p{len(self._group_intents)}"
+                self._group_intents[group] = intent
+                alternatives.append(f"(?P<{group}>{pattern})")
+        self._pattern = re.compile("|".join(alternatives)) if alternatives else None
+
+        self._example_intents = {}
+        for intent, sentence in examples:
+            if intent in skip_intents:
+                continue
+            # Veri setindeki ret satırları kullanıcı sorusu değil, ret cevabıdır
+            if intent == 'Reject':
+                if sentence not in self.responses.setdefault(intent, []):
+                    self.responses[intent].append(sentence)
+                continue
+            key = normalize_query(sentence)
+            if key:
+                self._example_intents.setdefault(key, intent)
+        self._examples = re.compile(
+            "^(?:" + "|".join(re.escape(key) for key in sorted(self._example_intents, key=len, reverse=True)) + ")$"
+        ) if self._example_intents else None
+
+    @classmethod
+    def from_dataset(cls, path=DATASET_PATH, **kwargs):
+        try:
+            examples = load_intent_examples(path)
+        except Exception as e:
+            print(f"Niyet veri seti okunamadı: {e}")
+            examples = []
+        return cls(examples=examples, **kwargs)
+
+    def route(self, query):
+        """Sorgunun niyetini (Greeting, Goodbye, Thanks, Reject) döndür; ilk yardım sorusuysa None"""
+        text = normalize_query(query or "")
+        if not text:
+            return None
+        if self._examples is not None:
+            match = self._examples.match(text)
+            if match:
+                return self._example_intents[match.group()]
+        if self._pattern is None:
+            return None
+        match = self._pattern.search(text)
+        if not match:
+            return None
+        if _FIRST_AID_TERMS.search(text):
+            return None
+        intent = self._group_intents[match.lastgroup]
+        if intent == 'Reject':
+            return intent
+        residual = self._pattern.sub(" ", text)
+        residual_words = residual.split()
+        if residual_words and "?" in query:
+            return None
+        if _QUESTION_MARKERS.search(residual) or len(residual_words) > _MAX_RESIDUAL_WORDS:
+            return None
+        return intent
+
+    def respond(self, intent):
+        """Niyet için cevap döndür"""
+        if intent in self.responses and self.responses[intent]:
+            return random.choice(self.responses[intent])
+        return ""
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_intent_router():
+    """Veri setinden bir kez kurulan paylaşılan yönlendirici"""
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = IntentRouter.from_dataset()
+    return _router
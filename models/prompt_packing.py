@@ -0,0 +1,96 @@
+import math
+
+
+def estimate_tokens(text):
+    """Tokenizer'ı olmayan modeller için kaba token tahmini (~3 karakter/token)"""
+    return math.ceil(len(text) / 3)
+
+
+def truncate_estimated(text, max_tokens):
+    """estimate_tokens ile tutarlı olarak metni kelime sınırından kes"""
+    limit = max_tokens * 3
+    if len(text) <= limit:
+        return text
+    cut = text.rfind(" ", 0, limit + 1)
+    return text[:cut if cut > 0 else limit]
+
+
+def normalize_chunks(context):
+    """Context'i (str veya parça listesi) [{'text', 'token_count', 'tokenizer'}, ...] listesine çevir"""
+    if context is None:
+        return []
+    if isinstance(context, str):
+        return [{"text": context}] if context.strip() else []
+    chunks = []
+    for chunk in context:
+        if isinstance(chunk, str):
+            chunk = {"text": chunk}
+        if chunk.get("text", "").strip():
+            chunks.append(chunk)
+    return chunks
+
+
+def join_chunks(context):
+    """Parça listesini tek context metnine çevir (str zaten metindir)"""
+    if context is None or isinstance(context, str):
+        return context or ""
+    return " ".join(chunk["text"] for chunk in normalize_chunks(context))
+
+
+class PromptPacker:
+    """Getirilen parçaları token bütçesine tek geçişte yerleştiren paketleyici.
+
+    Prompt şablonu soru başına bir kez, her parça en fazla bir kez token'lanır
+    (parçada önbelleğe alınmış `token_count` varsa hiç token'lanmaz). Parçalar
+    getirilme sırasına göre bütün olarak eklenir; sığmayan ilk parça tam token
+    sınırından kesilir ve paketleme biter.
+    """
+
+    def __init__(self, max_input_tokens, count_tokens, truncate_tokens, tokenizer_name=None, min_tail_tokens=16):
+        self.max_input_tokens = max_input_tokens
+        self.count_tokens = count_tokens
+        self.truncate_tokens = truncate_tokens
+        self.tokenizer_name = tokenizer_name
+        self.min_tail_tokens = min_tail_tokens
+
+    def chunk_tokens(self, chunk):
+        """Parçanın token sayısı; aynı tokenizer ile sayılmışsa önbellekten"""
+        cached = chunk.get("token_count")
+        if cached is not None and self.tokenizer_name and chunk.get("tokenizer") == self.tokenizer_name:
+            return cached
+        return self.count_tokens(chunk["text"])
+
+    def pack(self, prompt_overhead_tokens, context):
+        """Şablon dışında kalan bütçeye sığan context metnini döndür"""
+        return self.pack_with_stats(prompt_overhead_tokens, context)[0]
+
+    def pack_with_stats(self, prompt_overhead_tokens, context):
+        """pack ile aynı; ek olarak {'chunks', 'packed_chunks', 'context_tokens', 'truncated'} döndür.
+
+        Bütçe yoksa parçalar token'lanmaz ve context_tokens None olur.
+        """
+        chunks = normalize_chunks(context)
+        if self.max_input_tokens is None:
+            stats = {"chunks": len(chunks), "packed_chunks": len(chunks), "context_tokens": None, "truncated": False}
+            return " ".join(chunk["text"] for chunk in chunks), stats
+
+        budget = self.max_input_tokens - prompt_overhead_tokens
+        selected = []
+        used = 0
+        truncated = False
+        for chunk in chunks:
+            tokens = self.chunk_tokens(chunk)
+            if used + tokens <= budget:
+                selected.append(chunk["text"])
+                used += tokens
+                continue
+            truncated = True
+            remaining = budget - used
+            if remaining >= self.min_tail_tokens or not selected:
+                tail = self.truncate_tokens(chunk["text"], max(0, remaining))
+                if tail.strip():
+                    selected.append(tail)
+                    used += max(0, remaining)
+            break
+        stats = {"chunks": len(chunks), "packed_chunks": len(selected), "context_tokens": used, "truncated": truncated}
+        return " ".join(selected), stats
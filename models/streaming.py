@@ -0,0 +1,85 @@
+import re
+
+_WORD_BOUNDARY = re.compile(r'\s+')
+
+
+class StreamingCleaner:
+    """Akan model çıktısına temizlik ve uzunluk sınırını artımlı olarak uygulayan yardımcı.
+
+    Temizlik fonksiyonları her seferinde birikmiş metnin tamamına uygulanır;
+    tekrar temizliği son kelimeleri değiştirebileceği için son `holdback_words`
+    kelime, yeni metin gelene kadar bekletilir. Yalnızca daha önce gönderilen
+    kısmı değiştirmeyen yeni metin gönderilir.
+    """
+
+    def __init__(self, cleanups=(), max_chars=1000, min_chars=10, holdback_words=12,
+                 fallback="Üzgünüm, bu konuda yeterli bilgi bulamadım."):
+        self.cleanups = list(cleanups)
+        self.max_chars = max_chars
+        self.min_chars = min_chars
+        self.holdback_words = holdback_words
+        self.fallback = fallback
+        self._raw = ""
+        self._emitted = ""
+        self._truncated = False
+        self._fell_back = False
+
+    @property
+    def text(self):
+        """Şu ana kadar gönderilen metin"""
+        return self._emitted
+
+    @property
+    def done(self):
+        return self._truncated
+
+    @property
+    def fell_back(self):
+        """Akış yetersiz kaldığı için yedek cevap gönderildi mi"""
+        return self._fell_back
+
+    def _clean(self, text):
+        for cleanup in self.cleanups:
+            text = cleanup(text)
+        return text
+
+    def _stable_prefix(self, cleaned):
+        """Son holdback_words kelime hariç metin"""
+        if self.holdback_words <= 0:
+            return cleaned
+        boundaries = [m.start() for m in _WORD_BOUNDARY.finditer(cleaned)]
+        if len(boundaries) < self.holdback_words:
+            return ""
+        return cleaned[:boundaries[-self.holdback_words]]
+
+    def _emit(self, candidate):
+        """candidate daha önce gönderileni koruyorsa farkı (uzunluk sınırıyla) döndür"""
+        if self._truncated or not candidate.startswith(self._emitted):
+            return ""
+        if len(candidate) > self.max_chars:
+            candidate = candidate[:self.max_chars] + "..."
+            self._truncated = True
+        delta = candidate[len(self._emitted):]
+        self._emitted = candidate
+        return delta
+
+    def feed(self, piece):
+        """Yeni üretilen parçayı ekle; gönderilebilecek metni döndür"""
+        if self._truncated:
+            return ""
+        self._raw += piece
+        cleaned = self._clean(self._raw.lstrip())
+        stable = self._stable_prefix(cleaned)
+        if len(stable) < self.min_chars:
+            return ""
+        return self._emit(stable)
+
+    def finish(self):
+        """Akış bittiğinde kalan metni döndür"""
+        if self._truncated:
+            return ""
+        cleaned = self._clean(self._raw.strip())
+        if not self._emitted and len(cleaned) < self.min_chars:
+            self._fell_back = True
+            return self._emit(self.fallback)
+        return self._emit(cleaned)
@@ -0,0 +1,169 @@
+import json
+import math
+import os
+import re
+from array import array
+from .retrieval_cache import turkish_lower
+
+BM25_FILENAME = "bm25_index.json"
+
+_TOKEN = re.compile(r"\w+")
+
+_STOPWORDS = frozenset("""
+acaba ama ancak bazı belki bir biri birkaç biz bu bunu bunun çok çünkü da daha de defa diye
+en gibi hem hep hepsi her hiç için ile ise kadar ki kim mi mu mü mı nasıl ne neden nerede
+niye o olan olarak onu onun şey şu tüm ve veya ya yani yine dolayı sonra önce
+""".split())
+
+# Uzundan kısaya: önce en uzun ek denenir
+_SUFFIXES = sorted("""
+lar ler ları leri ların lerin lara lere larda lerde lardan lerden
+ın in un ün nın nin nun nün ı i u ü yı yi yu yü
+a e ya ye na ne da de ta te dan den tan ten ndan nden
+la le yla yle
+dır dir dur dür tır tir tur tür
+sı si su sü ları leri
+mak mek ması mesi
+""".split(), key=len, reverse=True)
+
+
+def stem(token, min_stem=4):
+    """Basit Türkçe ek atma: stem en az min_stem harf kalacak şekilde ekleri tekrar tekrar sil"""
+    changed = True
+    while changed:
+        changed = False
+        for suffix in _SUFFIXES:
+            if token.endswith(suffix) and len(token) - len(suffix) >= min_stem:
+                token = token[:-len(suffix)]
+                changed = True
+                break
+    return token
+
+
+def analyze(text):
+    """Metni Türkçe küçük harfe çevirip token'la, durak kelimeleri at ve kökleri döndür"""
+    return [stem(token) for token in _TOKEN.findall(turkish_lower(text))
+            if token not in _STOPWORDS and not token.isdigit()]
+
+
+class BM25Index:
+    """Parçalar üzerinde süreç içi BM25 ters indeksi.
+
+    Her terim için posting listesi iki `array` olarak tutulur: belge
+    numaraları ('I') ve terim frekansları ('H'). İndeks `chroma_dir`
+    içine, koleksiyon parmak iziyle birlikte kaydedilir.
+    """
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.fingerprint = None
+        self.doc_ids = []
+        self.doc_lengths = array("I")
+        self.postings = {}
+        self.avg_length = 0.0
+
+    @classmethod
+    def build(cls, documents, fingerprint=None, **params):
+        """documents: (parça id, metin) çiftleri"""
+        index = cls(**params)
+        index.fingerprint = fingerprint
+        for doc_id, text in documents:
+            index._add(doc_id, analyze(text))
+        index._finalize()
+        return index
+
+    def _add(self, doc_id, terms):
+        number = len(self.doc_ids)
+        self.doc_ids.append(doc_id)
+        self.doc_lengths.append(len(terms))
+        counts = {}
+        for term in terms:
+            counts[term] = counts.get(term, 0) + 1
+        for term, count in counts.items():
+            docs, freqs = self.postings.setdefault(term, (array("I"), array("H")))
+            docs.append(number)
+            freqs.append(min(count, 65535))
+
+    def _finalize(self):
+        self.avg_length = (sum(self.doc_lengths) / len(self.doc_lengths)) if self.doc_lengths else 0.0
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    def search(self, query, k=10, allow=None):
+        """Sorgu için en yüksek BM25 puanlı (parça id, puan) listesi; allow(parça id) False olanlar atlanır"""
+        if not self.doc_ids:
+            return []
+        total = len(self.doc_ids)
+        scores = {}
+        for term in set(analyze(query)):
+            posting = self.postings.get(term)
+            if posting is None:
+                continue
+            docs, freqs = posting
+            idf = math.log(1 + (total - len(docs) + 0.5) / (len(docs) + 0.5))
+            for number, freq in zip(docs, freqs):
+                if allow is not None and not allow(self.doc_ids[number]):
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[number] / self.avg_length)
+                scores[number] = scores.get(number, 0.0) + idf * freq * (self.k1 + 1) / (freq + norm)
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [(self.doc_ids[number], score) for number, score in ranked]
+
+    def save(self, path):
+        data = {
+            "fingerprint": self.fingerprint,
+            "k1": self.k1,
+            "b": self.b,
+            "doc_ids": self.doc_ids,
+            "doc_lengths": self.doc_lengths.tolist(),
+            "postings": {term: [docs.tolist(), freqs.tolist()] for term, (docs, freqs) in self.postings.items()},
+        }
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        index = cls(k1=data["k1"], b=data["b"])
+        index.fingerprint = data.get("fingerprint")
+        index.doc_ids = data["doc_ids"]
+        index.doc_lengths = array("I", data["doc_lengths"])
+        index.postings = {
+            term: (array("I", docs), array("H", freqs)) for term, (docs, freqs) in data["postings"].items()
+        }
+        index._finalize()
+        return index
+
+    @classmethod
+    def load_or_build(cls, chroma_dir, fingerprint, documents_fn):
+        """Kayıtlı indeks güncelse yükle; değilse documents_fn() ile oluşturup kaydet"""
+        path = os.path.join(chroma_dir, BM25_FILENAME)
+        try:
+            index = cls.load(path)
+            if index.fingerprint == fingerprint:
+                return index
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError) as e:
+            print(f"BM25 indeksi okunamadı, yeniden oluşturulacak: {e}")
+        index = cls.build(documents_fn(), fingerprint=fingerprint)
+        try:
+            os.makedirs(chroma_dir, exist_ok=True)
+            index.save(path)
+        except OSError as e:
+            print(f"BM25 indeksi kaydedilemedi: {e}")
+        return index
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """Birden fazla sıralı id listesini RRF ile birleştir; (id, puan) listesi döndür"""
+    scores = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
@@ -0,0 +1,197 @@
+import re
+from abc import ABC, abstractmethod
+
+DEFAULT_TOKENIZER = "google/flan-t5-base"
+
+_SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?…:;])\s+|\n\s*\n')
+_WORD = re.compile(r'\S+')
+
+
+def _spans(text, pattern):
+    """Ayraç desenine göre (başlangıç, bitiş) aralıklarını boşluklar kırpılmış olarak üret"""
+    start = 0
+    for match in pattern.finditer(text):
+        yield from _trimmed(text, start, match.start())
+        start = match.end()
+    yield from _trimmed(text, start, len(text))
+
+
+def _trimmed(text, start, end):
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    if start < end:
+        yield start, end
+
+
+class BaseChunker(ABC):
+    """Sayfa metnini parçalara bölen aşama için temel sınıf.
+
+    `split` her parça için metin, sayfa içi karakter aralığı ve (biliniyorsa)
+    token sayısını içeren sözlükler döndürür.
+    """
+
+    @abstractmethod
+    def split(self, text):
+        """Metni [{'text', 'char_start', 'char_end', 'token_count'}, ...] listesine böl"""
+        pass
+
+    @abstractmethod
+    def config(self):
+        """Parçalamayı etkileyen ayarlar (manifest'e yazılır)"""
+        pass
+
+    def _chunk(self, text, start, end, token_count=None):
+        return {
+            "text": text[start:end],
+            "char_start": start,
+            "char_end": end,
+            "token_count": token_count,
+        }
+
+
+class TokenizerMixin:
+    """Tokenizer'ı ilk ihtiyaçta yükleyip token sayan yardımcı"""
+
+    def _init_tokenizer(self, tokenizer, tokenizer_name):
+        self._tokenizer = tokenizer
+        self.tokenizer_name = tokenizer_name or getattr(tokenizer, "name_or_path", None) or DEFAULT_TOKENIZER
+
+    @property
+    def tokenizer(self):
+        if self._tokenizer is None:
+            from transformers import AutoTokenizer
+            self._tokenizer = AutoTokenizer.from_pretrained(self.tokenizer_name)
+        return self._tokenizer
+
+    def count_tokens(self, text):
+        return len(self.tokenizer.encode(text, add_special_tokens=False))
+
+
+class WordChunker(BaseChunker, TokenizerMixin):
+    """Eski davranış: sabit kelime sayılı, örtüşmeli pencereler"""
+
+    def __init__(self, chunk_size=500, overlap=50, tokenizer=None, tokenizer_name=None, count_tokens=False):
+        if overlap >= chunk_size:
+            raise ValueError("overlap chunk_size'dan küçük olmalı")
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self.with_token_counts = count_tokens or tokenizer is not None
+        self._init_tokenizer(tokenizer, tokenizer_name)
+
+    def split(self, text):
+        words = [(m.start(), m.end()) for m in _WORD.finditer(text)]
+        chunks = []
+        for i in range(0, len(words), self.chunk_size - self.overlap):
+            window = words[i:i + self.chunk_size]
+            if not window:
+                break
+            start, end = window[0][0], window[-1][1]
+            token_count = self.count_tokens(text[start:end]) if self.with_token_counts else None
+            chunks.append(self._chunk(text, start, end, token_count))
+        return chunks
+
+    def config(self):
+        return {"chunker": "word", "chunk_size": self.chunk_size, "overlap": self.overlap}
+
+
+class TokenChunker(BaseChunker, TokenizerMixin):
+    """Cümle sınırlarına saygılı, tokenizer token sayısına göre boyutlanan parçalayıcı.
+
+    Cümleler `max_tokens` dolana kadar aynı parçaya eklenir; bir sonraki parça
+    önceki parçanın son cümlelerinden en fazla `overlap_tokens` kadarını tekrar içerir.
+    Tek başına sınırı aşan cümleler kelime sınırlarından bölünür.
+    """
+
+    def __init__(self, max_tokens=200, overlap_tokens=20, tokenizer=None, tokenizer_name=None):
+        if overlap_tokens >= max_tokens:
+            raise ValueError("overlap_tokens max_tokens'dan küçük olmalı")
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self._init_tokenizer(tokenizer, tokenizer_name)
+
+    def split(self, text):
+        units = []
+        for start, end in _spans(text, _SENTENCE_BOUNDARY):
+            count = self.count_tokens(text[start:end])
+            if count <= self.max_tokens:
+                units.append((start, end, count))
+            else:
+                units.extend(self._split_long(text, start, end))
+
+        chunks = []
+        current = []
+        current_tokens = 0
+        for unit in units:
+            if current and current_tokens + unit[2] > self.max_tokens:
+                chunks.append(self._emit(text, current))
+                current, current_tokens = self._overlap_tail(current, unit[2])
+            current.append(unit)
+            current_tokens += unit[2]
+        if current:
+            chunks.append(self._emit(text, current))
+        return chunks
+
+    def _split_long(self, text, start, end):
+        """Sınırı aşan cümleyi kelime sınırlarından token bütçesine göre böl"""
+        pieces = []
+        piece_start = None
+        piece_end = None
+        piece_tokens = 0
+        for match in _WORD.finditer(text, start, end):
+            count = self.count_tokens(match.group())
+            if piece_start is not None and piece_tokens + count > self.max_tokens:
+                pieces.append((piece_start, piece_end, piece_tokens))
+                piece_start = None
+                piece_tokens = 0
+            if piece_start is None:
+                piece_start = match.start()
+            piece_end = match.end()
+            piece_tokens += count
+        if piece_start is not None:
+            pieces.append((piece_start, piece_end, piece_tokens))
+        return pieces
+
+    def _overlap_tail(self, units, next_tokens):
+        """Bir sonraki parçaya taşınacak son cümleler"""
+        tail = []
+        tail_tokens = 0
+        for unit in reversed(units):
+            if tail_tokens + unit[2] > self.overlap_tokens \
+                    or tail_tokens + unit[2] + next_tokens > self.max_tokens:
+                break
+            tail.insert(0, unit)
+            tail_tokens += unit[2]
+        return tail, tail_tokens
+
+    def _emit(self, text, units):
+        start, end = units[0][0], units[-1][1]
+        return self._chunk(text, start, end, self.count_tokens(text[start:end]))
+
+    def config(self):
+        return {
+            "chunker": "token",
+            "max_tokens": self.max_tokens,
+            "overlap_tokens": self.overlap_tokens,
+            "tokenizer": self.tokenizer_name,
+        }
+
+
+def make_chunker(kind="token", chunk_size=None, overlap=None, tokenizer=None, tokenizer_name=None):
+    """İsme göre parçalayıcı oluştur ("token" veya "word")"""
+    if kind == "token":
+        return TokenChunker(
+            max_tokens=chunk_size or 200,
+            overlap_tokens=20 if overlap is None else overlap,
+            tokenizer=tokenizer,
+            tokenizer_name=tokenizer_name
+        )
+    if kind == "word":
+        return WordChunker(
+            chunk_size=chunk_size or 500,
+            overlap=50 if overlap is None else overlap,
+            tokenizer=tokenizer,
+            tokenizer_name=tokenizer_name
+        )
+    raise ValueError(f"Bilinmeyen parçalayıcı: {kind}")
@@ -0,0 +1,138 @@
+import re
+import zlib
+import numpy as np
+from .chunking import _SENTENCE_BOUNDARY, _spans
+from .retrieval_cache import turkish_lower
+
+_WORD = re.compile(r"\w+")
+_PRIME = (1 << 31) - 1
+
+
+def shingles(text, size=3):
+    """Metnin kelime n-gram'larının (crc32) kümesi; kısa metinler tek shingle olur"""
+    words = _WORD.findall(turkish_lower(text))
+    if len(words) < size:
+        return {zlib.crc32(" ".join(words).encode("utf-8"))} if words else set()
+    return {zlib.crc32(" ".join(words[i:i + size]).encode("utf-8")) for i in range(len(words) - size + 1)}
+
+
+class MinHasher:
+    """Shingle kümeleri için MinHash imzası; imzaların eşit konum oranı Jaccard tahminidir"""
+
+    def __init__(self, num_perm=64, seed=1):
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _PRIME, num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _PRIME, num_perm, dtype=np.uint64)
+
+    def signature(self, shingle_set):
+        if not shingle_set:
+            return None
+        values = np.fromiter(shingle_set, dtype=np.uint64, count=len(shingle_set)) % _PRIME
+        return ((np.outer(values, self._a) + self._b) % _PRIME).min(axis=0)
+
+    @staticmethod
+    def similarity(first, second):
+        if first is None or second is None:
+            return 0.0
+        return float(np.mean(first == second))
+
+
+class ContextSelector:
+    """Getirilen adayları prompt'a girmeden önce sadeleştiren aşama.
+
+    1. Neredeyse aynı parçalar (MinHash ile tahmini Jaccard >= `dedup_threshold`)
+       ilgililik sırasına göre ilki kalacak şekilde atılır.
+    2. Kalanlardan k parça, parça embedding'leri üzerinden MMR (maximal marginal
+       relevance) ile seçilir: ilgililik ile seçilmişlere benzerlik arasında
+       `mmr_lambda` ile denge kurulur.
+    3. `trim_overlaps`, seçilen parçalarda önceki parçaların zaten içerdiği
+       cümleleri (örtüşme veya PDF'teki tekrarlar) çıkarır.
+
+    İlgililik, hibrit aramada RRF puanı (en yüksek puana göre normalize), sadece
+    vektör aramada sorgu ile kosinüs benzerliğidir.
+    """
+
+    def __init__(self, embed_documents, fetch_factor=3, mmr_lambda=0.7,
+                 dedup_threshold=0.8, span_containment=0.8, shingle_size=3):
+        self.embed_documents = embed_documents
+        self.fetch_factor = fetch_factor
+        self.mmr_lambda = mmr_lambda
+        self.dedup_threshold = dedup_threshold
+        self.span_containment = span_containment
+        self.shingle_size = shingle_size
+        self.minhasher = MinHasher()
+
+    def fetch_k(self, k):
+        """MMR için getirilecek aday sayısı"""
+        return max(k, k * self.fetch_factor)
+
+    def select(self, query_vector, candidates, k):
+        """Adaylardan (seçilen parçalar, {'candidates', 'duplicates'}) döndür"""
+        stats = {"candidates": len(candidates), "duplicates": 0}
+        if not candidates:
+            return [], stats
+        unique = self._drop_duplicates(candidates)
+        stats["duplicates"] = len(candidates) - len(unique)
+
+        vectors = np.asarray(self.embed_documents([chunk["text"] for chunk in unique]), dtype=np.float32)
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        query = np.asarray(query_vector, dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        cosine = vectors @ query
+        relevance = self._relevance(unique, cosine)
+
+        similarity = vectors @ vectors.T
+        selected = [int(np.argmax(relevance))]
+        closest = similarity[selected[0]].copy()
+        while len(selected) < min(k, len(unique)):
+            scores = self.mmr_lambda * relevance - (1 - self.mmr_lambda) * closest
+            scores[selected] = -np.inf
+            best = int(np.argmax(scores))
+            selected.append(best)
+            closest = np.maximum(closest, similarity[best])
+        # Sadece vektör aramasından gelen parçalara puan olarak kosinüs benzerliği
+        return [
+            unique[i] if unique[i].get("score") is not None else dict(unique[i], score=float(cosine[i]))
+            for i in selected
+        ], stats
+
+    def _relevance(self, chunks, cosine):
+        scores = [chunk.get("score") for chunk in chunks]
+        if all(score is not None for score in scores):
+            scores = np.asarray(scores, dtype=np.float32)
+            top = float(scores.max())
+            return scores / top if top > 0 else scores
+        return cosine
+
+    def _drop_duplicates(self, candidates):
+        kept = []
+        signatures = []
+        for chunk in candidates:
+            signature = self.minhasher.signature(shingles(chunk["text"], self.shingle_size))
+            if any(MinHasher.similarity(signature, other) >= self.dedup_threshold for other in signatures):
+                continue
+            kept.append(chunk)
+            signatures.append(signature)
+        return kept
+
+    def trim_overlaps(self, chunks):
+        """Önceki parçalarda zaten geçen cümleleri çıkar; (yeni parça listesi, atılan cümle sayısı)"""
+        seen = set()
+        trimmed = []
+        removed = 0
+        for chunk in chunks:
+            sentences = [chunk["text"][start:end] for start, end in _spans(chunk["text"], _SENTENCE_BOUNDARY)]
+            kept = []
+            for sentence in sentences:
+                sentence_shingles = shingles(sentence, self.shingle_size)
+                if sentence_shingles and len(sentence_shingles & seen) >= self.span_containment * len(sentence_shingles):
+                    removed += 1
+                    continue
+                kept.append(sentence)
+                seen |= sentence_shingles
+            if len(kept) == len(sentences):
+                trimmed.append(chunk)
+            elif kept:
+                # Token sayısı artık metne ait değil; paketleyici yeniden sayar
+                trimmed.append(dict(chunk, text=" ".join(kept), token_count=None))
+        return trimmed, removed
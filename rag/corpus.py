@@ -0,0 +1,301 @@
+import json
+import os
+import re
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from .chunking import make_chunker
+from .context_selection import ContextSelector
+from .embeddings import make_embedder
+from .manifest import IngestManifest, hash_text
+from .metrics import get_metrics
+from .rag_pipeline import RAGPipeline
+from .retrieval_cache import QueryEmbeddingCache, turkish_lower
+from .retrievers import page_range
+
+CORPUS_FILENAME = "corpus.json"
+SHARDS_DIRNAME = "shards"
+
+
+def document_id(path):
+    """PDF dosya adından kararlı doküman kimliği ("İlk Yardım 2024.pdf" -> "ilk-yardım-2024")"""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return re.sub(r"[^\w]+", "-", turkish_lower(stem)).strip("-") or "doc"
+
+
+def _pdf_title(path):
+    try:
+        from PyPDF2 import PdfReader
+        title = (PdfReader(path).metadata or {}).get("/Title")
+        return str(title).strip() if title else None
+    except Exception:
+        return None
+
+
+class CorpusManager:
+    """Bir dizindeki PDF'leri doküman başına ayrı parçalarda (shard) tutan çok dokümanlı korpus.
+
+    Her doküman `chroma_dir/shards/<id>/` altında kendi RAGPipeline'ına, dolayısıyla
+    kendi manifest'ine, parmak izine ve BM25 indeksine sahiptir; bir dokümanın
+    değişmesi diğerlerini yeniden indekslemez. Embedding modeli, parça embedding
+    önbelleği ve sorgu vektörleri tüm parçalarda ortaktır. Dokümanların başlığı,
+    yolu ve açık/kapalı durumu `chroma_dir/corpus.json` katalogunda tutulur;
+    kapatılan doküman indeksi silinmeden aramalardan çıkar.
+
+    Sorgular seçili dokümanların parçalarına paralel gönderilir (scatter-gather);
+    her parçanın sonuçları birleştirilip tekrarlar atılır ve k parça, sorguyla
+    kosinüs benzerliğine göre MMR ile seçilir. RAGPipeline ile aynı retrieval
+    arayüzünü (get_contexts_chunks, embed_queries, fingerprint, chroma_dir) sunar.
+    """
+
+    def __init__(self, pdf_dir, chroma_dir="chroma_db", chunker=None, embedder=None, retriever=None,
+                 index_dtype=None, batch_size=64, workers=None, hybrid=True, max_workers=8, load=True):
+        self.pdf_dir = pdf_dir
+        self.chroma_dir = chroma_dir
+        self.chunker = chunker or make_chunker()
+        self.embedder = embedder or make_embedder(chroma_dir)
+        self.retriever = retriever
+        self.index_dtype = index_dtype
+        self.batch_size = batch_size
+        self.workers = workers
+        self.hybrid = hybrid
+        self.metrics = get_metrics()
+        self.query_embedding_cache = QueryEmbeddingCache(self.embedder.embed_queries)
+        self.selector = ContextSelector(self.embedder.embed_documents)
+        self._catalog_path = os.path.join(chroma_dir, CORPUS_FILENAME)
+        self._catalog_stamp = None
+        self.documents = {}
+        self._shards = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="corpus-shard")
+        self._refresh_catalog()
+        if load:
+            self.sync()
+
+    # --- Katalog ---
+
+    def _refresh_catalog(self):
+        """corpus.json değiştiyse (ör. başka süreçte doküman kapatıldıysa) yeniden oku"""
+        try:
+            stat = os.stat(self._catalog_path)
+        except FileNotFoundError:
+            return
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if stamp == self._catalog_stamp:
+            return
+        try:
+            with open(self._catalog_path, "r", encoding="utf-8") as f:
+                documents = json.load(f)["documents"]
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Korpus kataloğu okunamadı: {e}")
+            return
+        with self._lock:
+            self.documents = documents
+            self._catalog_stamp = stamp
+
+    def _save_catalog(self):
+        os.makedirs(self.chroma_dir, exist_ok=True)
+        tmp_path = self._catalog_path + ".tmp"
+        with self._lock:
+            data = {"pdf_dir": os.path.abspath(self.pdf_dir), "documents": self.documents}
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self._catalog_path)
+            stat = os.stat(self._catalog_path)
+            self._catalog_stamp = (stat.st_mtime_ns, stat.st_size)
+
+    def discover(self):
+        """pdf_dir'deki PDF'ler: doküman id -> yol"""
+        if not os.path.isdir(self.pdf_dir):
+            print(f"PDF dizini bulunamadı: {self.pdf_dir}")
+            return {}
+        found = {}
+        for name in sorted(os.listdir(self.pdf_dir)):
+            if name.lower().endswith(".pdf"):
+                path = os.path.join(self.pdf_dir, name)
+                doc_id = document_id(name)
+                if doc_id in found:
+                    print(f"Aynı kimlikli iki PDF ({doc_id}), atlanıyor: {path}")
+                    continue
+                found[doc_id] = path
+        return found
+
+    def sync(self, force=False, progress=None):
+        """Dizindeki PDF'leri parçalarına artımlı yükle, silinen PDF'lerin parçalarını kaldır"""
+        self._refresh_catalog()
+        found = self.discover()
+        summaries = {}
+        for doc_id, path in found.items():
+            with self._lock:
+                entry = self.documents.setdefault(doc_id, {"enabled": True})
+                entry["path"] = path
+            shard = self.shard(doc_id)
+            with self.metrics.span("corpus_ingest", document=doc_id) as span:
+                summary = shard.ingest(force=force, progress=progress)
+                span.set(**summary)
+            if self.hybrid:
+                shard.lexical_index  # BM25 indeksini ilk sorgudan önce yükle veya oluştur
+            manifest = IngestManifest.load(shard.chroma_dir)
+            with self._lock:
+                entry.update(
+                    title=entry.get("title") or _pdf_title(path) or os.path.splitext(os.path.basename(path))[0],
+                    fingerprint=shard.fingerprint,
+                    pages=len(manifest.pages),
+                    chunks=shard.collection.count(),
+                )
+            summaries[doc_id] = summary
+        for doc_id in [doc_id for doc_id in self.documents if doc_id not in found]:
+            self.remove(doc_id, save=False)
+            summaries[doc_id] = {"status": "removed"}
+        self._save_catalog()
+        return summaries
+
+    def remove(self, doc_id, save=True):
+        """Dokümanın parçasını ve kataloğdaki kaydını sil"""
+        with self._lock:
+            shard = self._shards.pop(doc_id, None)
+            self.documents.pop(doc_id, None)
+        if shard is not None:
+            shard.close()
+        shutil.rmtree(self._shard_dir(doc_id), ignore_errors=True)
+        if save:
+            self._save_catalog()
+
+    def set_enabled(self, doc_id, enabled):
+        """Dokümanı aramalara dahil et veya çıkar (yeniden indeksleme yok)"""
+        self._refresh_catalog()
+        with self._lock:
+            if doc_id not in self.documents:
+                raise KeyError(f"Bilinmeyen doküman: {doc_id}")
+            self.documents[doc_id]["enabled"] = bool(enabled)
+        self._save_catalog()
+
+    def list_documents(self):
+        self._refresh_catalog()
+        with self._lock:
+            return [dict(entry, id=doc_id) for doc_id, entry in sorted(self.documents.items())]
+
+    # --- Parçalar ---
+
+    def _shard_dir(self, doc_id):
+        return os.path.join(self.chroma_dir, SHARDS_DIRNAME, doc_id)
+
+    def shard(self, doc_id):
+        """Dokümanın pipeline'ı (ilk ihtiyaçta açılır)"""
+        with self._lock:
+            shard = self._shards.get(doc_id)
+            if shard is not None:
+                return shard
+            path = self.documents[doc_id]["path"]
+        shard = RAGPipeline(
+            path, self._shard_dir(doc_id), chunker=self.chunker, batch_size=self.batch_size,
+            workers=self.workers, load=False, hybrid=self.hybrid, embedder=self.embedder,
+            retriever=self.retriever, index_dtype=self.index_dtype,
+            query_embedding_cache=self.query_embedding_cache
+        )
+        with self._lock:
+            # Başka bir thread aynı anda açtıysa onunkini kullan
+            existing = self._shards.setdefault(doc_id, shard)
+        if existing is not shard:
+            shard.close()
+        return existing
+
+    def _selected(self, documents=None):
+        """Aranacak açık doküman kimlikleri; documents verilmişse yalnızca onlar"""
+        self._refresh_catalog()
+        with self._lock:
+            if documents is None:
+                return [doc_id for doc_id, entry in sorted(self.documents.items()) if entry.get("enabled", True)]
+            unknown = [doc_id for doc_id in documents if doc_id not in self.documents]
+            if unknown:
+                raise ValueError(f"Bilinmeyen doküman: {', '.join(unknown)}")
+            return [doc_id for doc_id in documents if self.documents[doc_id].get("enabled", True)]
+
+    @property
+    def fingerprint(self):
+        """Açık dokümanların parmak izlerinin özeti; doküman açılıp kapanınca da değişir"""
+        self._refresh_catalog()
+        with self._lock:
+            parts = sorted((doc_id, entry.get("fingerprint")) for doc_id, entry in self.documents.items()
+                           if entry.get("enabled", True))
+        return hash_text(json.dumps(parts))
+
+    # --- Arama ---
+
+    def embed_queries(self, queries):
+        return self.query_embedding_cache.embed(list(queries))
+
+    def get_context_chunks(self, query, k=5, documents=None, pages=None):
+        return self.get_contexts_chunks([query], k, documents, pages)[0]
+
+    def get_contexts_chunks(self, queries, k=5, documents=None, pages=None):
+        """Seçili dokümanların parçalarında paralel ara ve sonuçları birleştir.
+
+        Dönen parçalarda 'document' alanı ve doküman önekli 'id' ('<doküman>:<parça id>') bulunur.
+        """
+        queries = list(queries)
+        pages = page_range(pages)
+        doc_ids = self._selected(documents)
+        if not doc_ids:
+            return [[] for _ in queries]
+        with self.metrics.span("corpus_get_context", shards=len(doc_ids), k=k) as span:
+            vectors = self.embed_queries(queries)  # parçalar ortak önbellekten okur
+            futures = {
+                doc_id: self._executor.submit(self._shard_search, doc_id, queries, k, pages)
+                for doc_id in doc_ids
+            }
+            per_shard = {}
+            for doc_id, future in futures.items():
+                try:
+                    per_shard[doc_id] = future.result()
+                except Exception as e:
+                    print(f"{doc_id} dokümanında arama hatası: {e}")
+            results = []
+            duplicates = 0
+            for i, vector in enumerate(vectors):
+                candidates = _interleave([
+                    [_tag(chunk, doc_id) for chunk in shard_results[i]] for doc_id, shard_results in per_shard.items()
+                ])
+                selected, stats = self.selector.select(vector, candidates, k)
+                selected, _ = self.selector.trim_overlaps(selected)
+                results.append(selected)
+                duplicates += stats["duplicates"]
+            span.set(failed_shards=len(doc_ids) - len(per_shard), duplicates=duplicates)
+        return results
+
+    def _shard_search(self, doc_id, queries, k, pages):
+        # Kırpma birleştirmeden sonra yapılır: embedding önbelleği tam parça metinleriyle eşleşsin
+        return self.shard(doc_id).get_contexts_chunks(queries, k, pages, trim=False)
+
+    def cache_stats(self):
+        with self._lock:
+            shards = dict(self._shards)
+        stats = {"query_embedding": self.query_embedding_cache.stats()}
+        if self.embedder.cache is not None:
+            stats["chunk_embedding"] = self.embedder.cache.stats()
+        for doc_id, shard in shards.items():
+            stats[f"retrieval:{doc_id}"] = shard.retrieval_cache.stats()
+        return stats
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        with self._lock:
+            shards = list(self._shards.values())
+            self._shards.clear()
+        for shard in shards:
+            shard.close()
+
+
+def _tag(chunk, doc_id):
+    """Parçaya doküman bilgisini ekle; puan birleştirmede sorguyla kosinüs benzerliğinden yeniden hesaplanır"""
+    tagged = {name: value for name, value in chunk.items() if name != "score"}
+    tagged.update(id=f"{doc_id}:{chunk['id']}", document=doc_id)
+    return tagged
+
+
+def _interleave(lists):
+    """Listeleri sıra sıra birleştir (her dokümanın 1. sonucu, sonra 2. sonucu, ...)"""
+    merged = []
+    for i in range(max((len(items) for items in lists), default=0)):
+        merged.extend(items[i] for items in lists if i < len(items))
+    return merged
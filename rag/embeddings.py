@@ -0,0 +1,189 @@
+import json
+import os
+import re
+import threading
+import numpy as np
+from .manifest import hash_text
+
+DEFAULT_EMBEDDING_MODEL = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+EMBEDDING_CACHE_DIRNAME = "embedding_cache"
+
+
+class EmbeddingCache:
+    """Parça içeriği özeti -> vektör eşlemesini diskte tutan, içerik adresli önbellek.
+
+    Her model kendi dizinini kullanır. Vektörler `vectors.f32` dosyasına satır
+    satır eklenir ve bellek eşlemeli (memmap) okunur; `index.json` içerik
+    özetini satır numarasına eşler. İndeks vektörler diske yazıldıktan sonra
+    kaydedilir, bu yüzden yarım kalan bir yazımın fazladan satırları bir
+    sonraki açılışta kesilir.
+    """
+
+    def __init__(self, cache_dir, model_name):
+        self.model_name = model_name
+        self.path = os.path.join(cache_dir, re.sub(r"[^\w.-]+", "--", model_name))
+        self._vectors_path = os.path.join(self.path, "vectors.f32")
+        self._index_path = os.path.join(self.path, "index.json")
+        self._lock = threading.Lock()
+        self._keys = {}
+        self.dim = None
+        self._vectors = None
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self._index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            # İlk indeks kaydından önce kesilen yazımın artıkları
+            self._reset()
+            return
+        except (OSError, ValueError) as e:
+            print(f"Embedding önbelleği okunamadı, sıfırdan başlanacak: {e}")
+            self._reset()
+            return
+        if data.get("model") != self.model_name or not data.get("dim"):
+            self._reset()
+            return
+        expected = len(data["keys"]) * data["dim"] * 4
+        size = os.path.getsize(self._vectors_path) if os.path.exists(self._vectors_path) else 0
+        if size < expected:
+            print("Embedding önbelleği eksik, sıfırdan başlanacak.")
+            self._reset()
+            return
+        if size > expected:
+            with open(self._vectors_path, "r+b") as f:
+                f.truncate(expected)
+        self.dim = data["dim"]
+        self._keys = data["keys"]
+        self._remap()
+
+    def _reset(self):
+        """Satır numaraları kaymasın diye indekssiz vektör dosyasını sil"""
+        for path in (self._index_path, self._vectors_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _remap(self):
+        rows = len(self._keys)
+        self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(rows, self.dim)) \
+            if rows else None
+
+    def __len__(self):
+        return len(self._keys)
+
+    def get_many(self, keys):
+        """Bulunan anahtarlar için {anahtar: vektör}"""
+        with self._lock:
+            found = {key: self._keys[key] for key in keys if key in self._keys}
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+            if not found:
+                return {}
+            rows = np.asarray(list(found.values()))
+            vectors = np.asarray(self._vectors[rows])
+        return dict(zip(found, vectors))
+
+    def put_many(self, keys, vectors):
+        """Yeni vektörleri dosyanın sonuna ekle ve indeksi güncelle"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._lock:
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+            new = {}
+            for key, vector in zip(keys, vectors):
+                if key not in self._keys and key not in new:
+                    new[key] = vector
+            if not new:
+                return
+            os.makedirs(self.path, exist_ok=True)
+            with open(self._vectors_path, "ab") as f:
+                f.write(np.stack(list(new.values())).astype(np.float32).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            start = len(self._keys)
+            for offset, key in enumerate(new):
+                self._keys[key] = start + offset
+            self._save_index()
+            self._remap()
+
+    def _save_index(self):
+        tmp_path = self._index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"model": self.model_name, "dim": self.dim, "keys": self._keys}, f, separators=(",", ":"))
+        os.replace(tmp_path, self._index_path)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._keys), "hits": self.hits, "misses": self.misses}
+
+
+class SentenceTransformerEmbedder:
+    """Çok dilli sentence-transformers modeliyle batch halinde embedding üreten fonksiyon.
+
+    Chroma'nın embedding fonksiyonu arayüzüne uyar. Doküman embedding'leri
+    önbellek varsa önce orada aranır; yalnızca hiç görülmemiş (ve batch içinde
+    tekrarsız) metinler modele gönderilir. Sorgular önbelleğe yazılmaz.
+    """
+
+    def __init__(self, model_name=None, batch_size=64, cache_dir=None, device=None):
+        self.model_name = model_name or os.getenv("EMBEDDING_MODEL") or DEFAULT_EMBEDDING_MODEL
+        self.batch_size = batch_size
+        self.device = device
+        self.cache = EmbeddingCache(cache_dir, self.model_name) if cache_dir else None
+        self._model = None
+        self._model_lock = threading.Lock()
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    from sentence_transformers import SentenceTransformer
+                    self._model = SentenceTransformer(self.model_name, device=self.device)
+        return self._model
+
+    def name(self):
+        return self.model_name
+
+    def _encode(self, texts):
+        return self.model.encode(
+            list(texts),
+            batch_size=self.batch_size,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+            show_progress_bar=False
+        )
+
+    def __call__(self, input):
+        return [vector.tolist() for vector in self.embed_documents(input)]
+
+    def embed_documents(self, texts):
+        """Doküman vektörleri (numpy); önbellekte olmayanlar tek encode çağrısında hesaplanır"""
+        texts = list(texts)
+        if self.cache is None:
+            return list(self._encode(texts)) if texts else []
+        keys = [hash_text(text) for text in texts]
+        found = self.cache.get_many(keys)
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        if missing:
+            computed = self._encode(missing.values())
+            self.cache.put_many(list(missing), computed)
+            found.update(zip(missing, computed))
+        return [found[key] for key in keys]
+
+    def embed_queries(self, queries):
+        """Sorgu vektörleri (önbelleğe yazılmaz)"""
+        queries = list(queries)
+        return [vector.tolist() for vector in self._encode(queries)] if queries else []
+
+
+def make_embedder(chroma_dir, model_name=None, batch_size=64):
+    """chroma_dir altında önbellekli varsayılan embedder (EMBEDDING_CACHE_DIR ile başka dizin seçilebilir)"""
+    cache_dir = os.getenv("EMBEDDING_CACHE_DIR") or os.path.join(chroma_dir, EMBEDDING_CACHE_DIRNAME)
+    return SentenceTransformerEmbedder(model_name, batch_size=batch_size, cache_dir=cache_dir)
@@ -0,0 +1,213 @@
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from PyPDF2 import PdfReader
+from .manifest import IngestManifest, hash_bytes, hash_file, hash_text
+
+_CHUNK_ID = re.compile(r"^page_(\d+)_chunk_\d+$")
+
+
+def chunk_page(chunk_id):
+    """iter_page_chunks'ın ürettiği parça id'sinden sayfa numarası (tanınmazsa None)"""
+    match = _CHUNK_ID.match(chunk_id)
+    return int(match.group(1)) if match else None
+
+
+def _page_fingerprint(page):
+    """Sayfanın içerik akışının özeti (metin çıkarmadan)"""
+    try:
+        contents = page.get_contents()
+        if contents is not None:
+            return hash_bytes(contents.get_data())
+    except Exception:
+        pass
+    return hash_text(page.extract_text() or "")
+
+
+def fingerprint_pages(pdf_path):
+    """Sayfa numarası (1'den başlar) -> içerik özeti"""
+    reader = PdfReader(pdf_path)
+    return {page_num: _page_fingerprint(page) for page_num, page in enumerate(reader.pages, start=1)}
+
+
+def _extract_pages(pdf_path, page_numbers):
+    """Verilen sayfaların metnini çıkar (işçi süreçte çalışır)"""
+    reader = PdfReader(pdf_path)
+    return [(page_num, reader.pages[page_num - 1].extract_text() or "") for page_num in page_numbers]
+
+
+def iter_page_texts(pdf_path, page_numbers, workers=None, pages_per_task=8):
+    """Sayfa metinlerini süreç havuzunda çıkar ve hazır oldukça (sayfa, metin) üret"""
+    page_numbers = list(page_numbers)
+    if not page_numbers:
+        return
+    workers = workers if workers is not None else (os.cpu_count() or 1)
+    tasks = [page_numbers[i:i + pages_per_task] for i in range(0, len(page_numbers), pages_per_task)]
+    if workers <= 1 or len(tasks) == 1:
+        for task in tasks:
+            yield from _extract_pages(pdf_path, task)
+        return
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+        futures = [executor.submit(_extract_pages, pdf_path, task) for task in tasks]
+        for future in as_completed(futures):
+            yield from future.result()
+
+
+def iter_page_chunks(page_texts, chunker):
+    """(sayfa, metin) akışından (sayfa, [(id, parça, metadata), ...]) üret"""
+    for page, text in page_texts:
+        chunks = [chunk for chunk in chunker.split(text) if chunk["text"].strip()] if text.strip() else []
+        records = []
+        for j, chunk in enumerate(chunks):
+            metadata = {
+                "source": f"page_{page}",
+                "page": page,
+                "chunk_id": j,
+                "char_start": chunk["char_start"],
+                "char_end": chunk["char_end"],
+            }
+            if chunk.get("token_count") is not None:
+                metadata["token_count"] = chunk["token_count"]
+            records.append((f"page_{page}_chunk_{j}", chunk["text"], metadata))
+        yield page, records
+
+
+class PDFIngestor:
+    """PDF'i paralel olarak çıkarıp koleksiyona toplu (batch) yazan, kaldığı yerden devam edebilen yükleyici.
+
+    İlerleme manifest'e her batch sonrası yazılır; kesilen bir yükleme aynı PDF ile
+    tekrar başlatıldığında tamamlanmış sayfalar atlanır. `embedder` verilirse her
+    batch'in vektörleri tek seferde (önbellekten veya modelden) hesaplanıp açıkça
+    yazılır ve embedding modeli de manifest ayarlarına katılır.
+    """
+
+    def __init__(self, collection, pdf_path, chroma_dir, chunker,
+                 batch_size=64, workers=None, progress=None, embedder=None):
+        self.collection = collection
+        self.pdf_path = pdf_path
+        self.chroma_dir = chroma_dir
+        self.chunker = chunker
+        self.embedder = embedder
+        self.config = chunker.config()
+        if embedder is not None:
+            self.config = dict(self.config, embedding_model=embedder.model_name)
+        if getattr(collection, "name", None) is not None:
+            # Depo değişince (ör. chroma -> numpy) manifest yeni depoyu tarif etmez: baştan kur
+            self.config = dict(self.config, retriever=collection.name)
+        self.batch_size = max(1, batch_size)
+        self.workers = workers
+        self.progress = progress or _print_progress
+
+    def run(self, force=False):
+        """Gerekirse PDF'i yükle; yapılan işin özetini döndür"""
+        stat = os.stat(self.pdf_path)
+        manifest = IngestManifest.load(self.chroma_dir)
+        count = self.collection.count()
+
+        if not force and count > 0 and not manifest.in_progress \
+                and manifest.matches_stat(self.pdf_path, stat, self.config):
+            return {"status": "up_to_date", "pages": 0, "chunks": 0, "removed": 0}
+
+        file_hash = hash_file(self.pdf_path)
+        if not force and count > 0 and not manifest.in_progress \
+                and manifest.file_hash == file_hash and manifest.config == self.config:
+            manifest.update_stat(self.pdf_path, stat, file_hash, self.config)
+            manifest.save()
+            return {"status": "unchanged", "pages": 0, "chunks": 0, "removed": 0}
+
+        resuming = (not force and count > 0 and manifest.in_progress == file_hash
+                    and manifest.config == self.config)
+        if not resuming:
+            if count > 0 and (force or manifest.is_empty or manifest.config != self.config):
+                # Manifest'siz (eski) veya farklı ayarlarla oluşturulmuş koleksiyon: baştan kur
+                self._clear_collection()
+                manifest = IngestManifest(manifest.path)
+            elif count == 0:
+                manifest = IngestManifest(manifest.path)
+        manifest.in_progress = file_hash
+        manifest.config = self.config
+        manifest.save()
+
+        page_hashes = fingerprint_pages(self.pdf_path)
+        changed, removed = manifest.diff_pages(page_hashes)
+
+        for page in removed:
+            self._delete(manifest.chunk_ids(page))
+            manifest.remove_page(page)
+        if removed:
+            manifest.save()
+
+        written = self._write_pages(manifest, page_hashes, changed)
+
+        manifest.in_progress = None
+        manifest.update_stat(self.pdf_path, stat, file_hash, self.config)
+        manifest.save()
+        return {
+            "status": "resumed" if resuming else "updated",
+            "pages": len(changed),
+            "chunks": written,
+            "removed": len(removed),
+        }
+
+    def _write_pages(self, manifest, page_hashes, pages):
+        """Sayfaları paralel çıkar, parçaları tam batch'ler halinde yaz ve manifest'i güncelle"""
+        total = len(pages)
+        done = 0
+        written = 0
+        records = []
+        # Parçaları henüz tamamen yazılmamış sayfalar: (sayfa, id listesi, son parçanın sırası)
+        pending_pages = []
+        for page, page_records in iter_page_chunks(iter_page_texts(self.pdf_path, pages, self.workers), self.chunker):
+            new_ids = [record[0] for record in page_records]
+            keep = set(new_ids)
+            self._delete([i for i in manifest.chunk_ids(page) if i not in keep])
+            records.extend(page_records)
+            pending_pages.append((page, new_ids, written + len(records)))
+            while len(records) >= self.batch_size:
+                self._upsert(records[:self.batch_size])
+                records = records[self.batch_size:]
+                written += self.batch_size
+                done += self._checkpoint(manifest, page_hashes, pending_pages, written)
+                self.progress(done, total, written)
+        if records:
+            self._upsert(records)
+            written += len(records)
+        done += self._checkpoint(manifest, page_hashes, pending_pages, written)
+        self.progress(done, total, written)
+        return written
+
+    def _upsert(self, batch):
+        """Bir batch'i (id, doküman, metadata ve varsa embedding birlikte) tek çağrıda yaz"""
+        documents = [record[1] for record in batch]
+        self.collection.upsert(
+            ids=[record[0] for record in batch],
+            documents=documents,
+            metadatas=[record[2] for record in batch],
+            embeddings=self.embedder(documents) if self.embedder is not None else None
+        )
+
+    def _checkpoint(self, manifest, page_hashes, pending_pages, written):
+        """Tüm parçaları yazılmış sayfaları manifest'e işle ve kaydet"""
+        completed = 0
+        while pending_pages and pending_pages[0][2] <= written:
+            page, ids, _ = pending_pages.pop(0)
+            manifest.set_page(page, page_hashes[page], ids)
+            completed += 1
+        if completed:
+            manifest.save()
+        return completed
+
+    def _delete(self, ids):
+        if ids:
+            self.collection.delete(ids=ids)
+
+    def _clear_collection(self):
+        """Koleksiyondaki tüm parçaları sil"""
+        existing = self.collection.get(include=[])
+        ids = existing.get("ids", [])
+        for start in range(0, len(ids), self.batch_size):
+            self._delete(ids[start:start + self.batch_size])
+
+
+def _print_progress(done, total, written):
+    print(f"📄 {done}/{total} sayfa işlendi, {written} parça yazıldı")
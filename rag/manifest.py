@@ -0,0 +1,121 @@
+import hashlib
+import json
+import os
+
+MANIFEST_FILENAME = "ingest_manifest.json"
+MANIFEST_VERSION = 2
+
+
+def hash_text(text):
+    """Metnin sha256 özeti"""
+    return hashlib.sha256(text.encode("utf-8", errors="surrogatepass")).hexdigest()
+
+
+def hash_bytes(data):
+    """Bayt dizisinin sha256 özeti"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(path, block_size=1 << 20):
+    """Dosyanın sha256 özeti"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class IngestManifest:
+    """Veritabanına alınmış PDF'in dosya ve sayfa özetlerini tutan manifest.
+
+    Dosya `chroma_dir` içinde saklanır. Dosya boyutu ve değişiklik zamanı
+    değişmemişse PDF hiç okunmaz; değişmişse yalnızca özeti farklı olan
+    sayfalar yeniden işlenir. Yükleme sırasında her batch sonrası kaydedilerek
+    checkpoint görevi de görür.
+    """
+
+    def __init__(self, path, data=None):
+        self.path = path
+        data = data or {}
+        self.pdf_path = data.get("pdf_path")
+        self.file_hash = data.get("file_hash")
+        self.size = data.get("size")
+        self.mtime_ns = data.get("mtime_ns")
+        self.config = data.get("config", {})
+        # Yarıda kalan yüklemenin dosya özeti (checkpoint)
+        self.in_progress = data.get("in_progress")
+        # sayfa numarası (str) -> {"hash": ..., "chunk_ids": [...]}
+        self.pages = data.get("pages", {})
+
+    @classmethod
+    def load(cls, chroma_dir):
+        """Manifesti oku; yoksa veya bozuksa boş manifest döndür"""
+        path = os.path.join(chroma_dir, MANIFEST_FILENAME)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != MANIFEST_VERSION:
+                return cls(path)
+            return cls(path, data)
+        except FileNotFoundError:
+            return cls(path)
+        except (OSError, ValueError) as e:
+            print(f"Manifest okunamadı, yeniden oluşturulacak: {e}")
+            return cls(path)
+
+    @property
+    def is_empty(self):
+        return self.file_hash is None
+
+    def matches_stat(self, pdf_path, stat, config):
+        """Dosya yolu, boyut, değişiklik zamanı ve ayarlar manifestle aynı mı"""
+        return (
+            not self.is_empty
+            and self.pdf_path == os.path.abspath(pdf_path)
+            and self.size == stat.st_size
+            and self.mtime_ns == stat.st_mtime_ns
+            and self.config == config
+        )
+
+    def update_stat(self, pdf_path, stat, file_hash, config):
+        self.pdf_path = os.path.abspath(pdf_path)
+        self.size = stat.st_size
+        self.mtime_ns = stat.st_mtime_ns
+        self.file_hash = file_hash
+        self.config = config
+
+    def diff_pages(self, page_hashes):
+        """Yeni sayfa özetlerine göre (değişen, silinen) sayfa listelerini döndür"""
+        changed = [
+            page for page, page_hash in page_hashes.items()
+            if self.pages.get(str(page), {}).get("hash") != page_hash
+        ]
+        removed = [int(page) for page in self.pages if int(page) not in page_hashes]
+        return sorted(changed), sorted(removed)
+
+    def chunk_ids(self, page):
+        return list(self.pages.get(str(page), {}).get("chunk_ids", []))
+
+    def set_page(self, page, page_hash, chunk_ids):
+        self.pages[str(page)] = {"hash": page_hash, "chunk_ids": list(chunk_ids)}
+
+    def remove_page(self, page):
+        self.pages.pop(str(page), None)
+
+    def save(self):
+        """Manifesti atomik olarak diske yaz"""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        data = {
+            "version": MANIFEST_VERSION,
+            "pdf_path": self.pdf_path,
+            "file_hash": self.file_hash,
+            "size": self.size,
+            "mtime_ns": self.mtime_ns,
+            "config": self.config,
+            "in_progress": self.in_progress,
+            "pages": self.pages,
+        }
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
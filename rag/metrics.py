@@ -0,0 +1,275 @@
+import json
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_PREFIX = "ilk_yardim"
+
+_TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+_SIZE_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384)
+
+
+class _NoopSpan:
+    """Ölçüm kapalıyken kullanılan, hiçbir şey yapmayan span"""
+
+    __slots__ = ()
+
+    def set(self, **attrs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    """Bir kod bloğunun süresini ölçen span; bitince sink'lere tek olay olarak gider"""
+
+    __slots__ = ("_metrics", "name", "labels", "attrs", "_started")
+
+    def __init__(self, metrics, name, labels):
+        self._metrics = metrics
+        self.name = name
+        self.labels = labels
+        self.attrs = {}
+        self._started = None
+
+    def set(self, **attrs):
+        """Log satırına eklenecek ek bilgiler (token sayısı, parça sayısı vb.)"""
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self._started
+        labels = dict(self.labels, status="error" if exc_type else "ok")
+        event = {"type": "span", "name": self.name, "labels": labels, "value": seconds}
+        if self.attrs:
+            event["attrs"] = self.attrs
+        if exc_type:
+            event["error"] = f"{exc_type.__name__}: {exc}"
+        self._metrics.record(event)
+        return False
+
+
+class LogSink:
+    """Her olayı tek satırlık JSON olarak `logging`e yazan sink"""
+
+    def __init__(self, logger_name="ilk_yardim.metrics", level=logging.INFO):
+        self.logger = logging.getLogger(logger_name)
+        self.level = level
+        if not self.logger.handlers and not logging.getLogger().handlers:
+            handler = logging.StreamHandler()
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            self.logger.addHandler(handler)
+            self.logger.setLevel(level)
+
+    def record(self, event):
+        if self.logger.isEnabledFor(self.level):
+            line = dict(event, ts=round(time.time(), 3))
+            self.logger.log(self.level, json.dumps(line, ensure_ascii=False, default=str))
+
+
+class PrometheusSink:
+    """Olayları sayaç ve histogramlarda toplayıp Prometheus metin formatında veren sink.
+
+    Span'ler `<isim>_seconds` histogramına, `observe` değerleri `<isim>`
+    histogramına, `inc` değerleri `<isim>` sayacına yazılır. Süre
+    histogramları saniye, diğerleri boyut (token/karakter) kovalarını kullanır.
+    """
+
+    def __init__(self, prefix=METRICS_PREFIX, time_buckets=_TIME_BUCKETS, size_buckets=_SIZE_BUCKETS):
+        self.prefix = prefix
+        self.time_buckets = tuple(time_buckets)
+        self.size_buckets = tuple(size_buckets)
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def record(self, event):
+        kind = event["type"]
+        labels = tuple(sorted(event.get("labels", {}).items()))
+        if kind == "counter":
+            key = (f"{self.prefix}_{event['name']}", labels)
+            with self._lock:
+                self._counters[key] = self._counters.get(key, 0) + event["value"]
+            return
+        if kind == "span":
+            name, buckets = f"{self.prefix}_{event['name']}_seconds", self.time_buckets
+        else:
+            name = f"{self.prefix}_{event['name']}"
+            buckets = self.time_buckets if name.endswith("_seconds") else self.size_buckets
+        value = event["value"]
+        with self._lock:
+            histogram = self._histograms.get((name, labels))
+            if histogram is None:
+                histogram = self._histograms[(name, labels)] = [buckets, [0] * len(buckets), 0.0, 0]
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    histogram[1][i] += 1
+            histogram[2] += value
+            histogram[3] += 1
+
+    def render(self):
+        """Prometheus text exposition (0.0.4) çıktısı"""
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, (b, list(c), s, n)) for key, (b, c, s, n) in self._histograms.items())
+        typed = set()
+        for (name, labels), value in counters:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        for (name, labels), (buckets, counts, total, count) in histograms:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} histogram")
+            for bound, bucket_count in zip(buckets, counts):
+                le = labels + (("le", _format_value(bound)),)
+                lines.append(f"{name}_bucket{_format_labels(le)} {bucket_count}")
+            lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+def _escape(value):
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+def _format_value(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+class Metrics:
+    """Span, sayaç ve gözlemleri takılabilir sink'lere ileten ölçüm noktası.
+
+    Sink yoksa ölçüm kapalıdır: `span` paylaşılan boş bir span döndürür,
+    `inc` ve `observe` hemen döner. Ek hesap gerektiren ölçümler (token
+    sayımı gibi) çağıran tarafta `enabled` ile korunmalıdır.
+    """
+
+    def __init__(self, sinks=()):
+        self.sinks = list(sinks)
+        self.enabled = bool(self.sinks)
+
+    def configure(self, sinks):
+        """Sink listesini değiştir (boş liste ölçümü kapatır)"""
+        self.sinks = list(sinks)
+        self.enabled = bool(self.sinks)
+
+    def add_sink(self, sink):
+        self.configure(self.sinks + [sink])
+        return sink
+
+    def span(self, name, **labels):
+        if not self.enabled:
+            return _NOOP_SPAN
+        return Span(self, name, labels)
+
+    def inc(self, name, value=1, **labels):
+        if self.enabled:
+            self.record({"type": "counter", "name": name, "labels": labels, "value": value})
+
+    def observe(self, name, value, **labels):
+        if self.enabled and value is not None:
+            self.record({"type": "observe", "name": name, "labels": labels, "value": value})
+
+    def record(self, event):
+        for sink in self.sinks:
+            try:
+                sink.record(event)
+            except Exception as e:
+                print(f"Metrik kaydı hatası: {e}")
+
+    def prometheus_text(self):
+        """Kayıtlı Prometheus sink'lerinin çıktısı; yoksa boş metin"""
+        return "".join(sink.render() for sink in self.sinks if isinstance(sink, PrometheusSink))
+
+
+def sinks_from_env(value=None):
+    """METRICS_SINKS ortam değişkeninden (ör. "log,prometheus") sink listesi oluştur"""
+    value = os.getenv("METRICS_SINKS", "") if value is None else value
+    sinks = []
+    for name in (part.strip().lower() for part in value.split(",")):
+        if name == "log":
+            sinks.append(LogSink())
+        elif name == "prometheus":
+            sinks.append(PrometheusSink())
+        elif name:
+            print(f"Bilinmeyen metrik sink'i: {name}")
+    return sinks
+
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics():
+    """Süreç genelinde paylaşılan ölçüm noktası (ilk çağrıda METRICS_SINKS'ten kurulur)"""
+    global _metrics
+    if _metrics is None:
+        with _metrics_lock:
+            if _metrics is None:
+                _metrics = Metrics(sinks_from_env())
+    return _metrics
+
+
+_servers = {}
+_servers_lock = threading.Lock()
+
+
+def serve_metrics(port, host="0.0.0.0", metrics=None):
+    """/metrics uç noktasını arka plan thread'inde sun; aynı port için bir kez başlatılır"""
+    metrics = metrics or get_metrics()
+    with _servers_lock:
+        if port in _servers:
+            return _servers[port]
+        if not any(isinstance(sink, PrometheusSink) for sink in metrics.sinks):
+            metrics.add_sink(PrometheusSink())
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name=f"metrics-{port}", daemon=True).start()
+        _servers[port] = server
+        return server
@@ -1,94 +1,286 @@
 import os
-import chromadb
-from chromadb.config import Settings
-from PyPDF2 import PdfReader
-import re
+import json
+from concurrent.futures import ThreadPoolExecutor
+from .bm25 import BM25Index, reciprocal_rank_fusion
+from .chunking import make_chunker
+from .context_selection import ContextSelector
+from .embeddings import make_embedder
+from .ingestion import PDFIngestor, chunk_page
+from .manifest import IngestManifest, hash_text
+from .metrics import get_metrics
+from .retrieval_cache import QueryEmbeddingCache, RetrievalCache
+from .retrievers import open_retriever, page_range, resolve_retriever
 
 class RAGPipeline:
     """RAG (Retrieval-Augmented Generation) pipeline sınıfı"""
     
-    def __init__(self, pdf_path, chroma_dir="chroma_db"):
+    def __init__(self, pdf_path, chroma_dir="chroma_db", chunker=None,
+                 batch_size=64, workers=None, load=True, hybrid=True, candidate_depth=20, embedder=None,
+                 retriever=None, index_dtype=None, diversify=True, query_embedding_cache=None):
         self.pdf_path = pdf_path
         self.chroma_dir = chroma_dir
-        self.client = None
+        self.chunker = chunker or make_chunker()
+        self.embedder = embedder or make_embedder(chroma_dir)
+        self.batch_size = batch_size
+        self.workers = workers
+        self.retriever = resolve_retriever(retriever)
+        self.index_dtype = index_dtype
         self.collection = None
+        self.embedding_function = None
+        self._fingerprint = None
+        self.hybrid = hybrid
+        self.candidate_depth = candidate_depth
+        self.context_selector = ContextSelector(self.embedder.embed_documents) if diversify else None
+        self.retrieval_cache = RetrievalCache()
+        self.metrics = get_metrics()
+        self._lexical_index = None
+        self._search_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="lexical-search")
         self._initialize_database()
-        self._load_pdf()
+        # Aynı embedder'ı kullanan pipeline'lar (ör. korpus parçaları) sorgu vektörlerini paylaşabilir
+        self.query_embedding_cache = query_embedding_cache or QueryEmbeddingCache(self.embedder.embed_queries)
+        if load:
+            self._load_pdf()
     
     def _initialize_database(self):
-        """ChromaDB veritabanını başlat"""
+        """Vektör deposunu (Chroma veya NumPy) başlat"""
         try:
-            self.client = chromadb.PersistentClient(
-                path=self.chroma_dir,
-                settings=Settings(anonymized_telemetry=False)
+            self.embedding_function = self.embedder
+            self.collection = open_retriever(
+                self.retriever, self.chroma_dir, self.embedding_function, dtype=self.index_dtype
             )
             
-            self.collection = self.client.get_or_create_collection(
-                name="ilk_yardim_knowledge",
-                metadata={"description": "İlk yardım bilgileri"}
-            )
+            # Başka bir embedding modeliyle kurulmuş koleksiyonun vektör boyutu farklı olabilir:
+            # parçaları tek tek silmek yerine koleksiyonu yeniden oluştur
+            manifest = IngestManifest.load(self.chroma_dir)
+            if self.collection.count() > 0 and manifest.config.get("embedding_model") != self.embedder.model_name:
+                print(f"Embedding modeli değişti ({self.embedder.model_name}), koleksiyon yeniden oluşturulacak.")
+                self.collection.reset()
             
         except Exception as e:
             print(f"Veritabanı başlatma hatası: {e}")
             raise
     
     def _load_pdf(self):
-        """PDF dosyasını yükle ve işle"""
+        """PDF dosyasını manifest'e göre artımlı ve toplu olarak yükle"""
         if not os.path.exists(self.pdf_path):
             print(f"PDF dosyası bulunamadı: {self.pdf_path}")
             return
         
         try:
-            reader = PdfReader(self.pdf_path)
-            text_chunks = []
-            
-            for page_num, page in enumerate(reader.pages):
-                text = page.extract_text()
-                if text.strip():
-                    chunks = self._split_text(text, chunk_size=500, overlap=50)
-                    text_chunks.extend(chunks)
-            
-            if self.collection.count() == 0:
-                print(f"PDF'den {len(text_chunks)} parça çıkarıldı, veritabanına ekleniyor...")
-                
-                for i, chunk in enumerate(text_chunks):
-                    if chunk.strip():
-                        self.collection.add(
-                            documents=[chunk],
-                            metadatas=[{"source": f"page_{i//3}", "chunk_id": i}],
-                            ids=[f"chunk_{i}"]
-                        )
-                
-                print("✅ PDF veritabanına başarıyla eklendi!")
+            with self.metrics.span("rag_load_pdf") as span:
+                summary = self.ingest()
+                span.set(**summary)
+                if self.hybrid:
+                    self.lexical_index  # BM25 indeksini ilk sorgudan önce yükle veya oluştur
+            if summary["status"] == "up_to_date":
+                print("✅ Veritabanı güncel, PDF yükleme atlanıyor.")
+            elif summary["status"] == "unchanged":
+                print("✅ PDF içeriği değişmemiş, PDF yükleme atlanıyor.")
             else:
-                print("✅ Veritabanı zaten mevcut, PDF yükleme atlanıyor.")
+                print(f"✅ {summary['pages']} sayfa güncellendi ({summary['chunks']} parça), "
+                      f"{summary['removed']} sayfa silindi.")
                 
         except Exception as e:
             print(f"PDF yükleme hatası: {e}")
             raise
     
-    def _split_text(self, text, chunk_size=500, overlap=50):
-        """Metni belirtilen boyutta parçalara böl"""
-        words = text.split()
-        chunks = []
+    def ingest(self, force=False, progress=None):
+        """PDF'i paralel çıkarıp batch'ler halinde veritabanına yaz"""
+        ingestor = PDFIngestor(
+            self.collection,
+            self.pdf_path,
+            self.chroma_dir,
+            self.chunker,
+            embedder=self.embedder,
+            batch_size=self.batch_size,
+            workers=self.workers,
+            progress=progress
+        )
+        summary = ingestor.run(force=force)
+        self._fingerprint = None
+        if summary["status"] not in ("up_to_date", "unchanged"):
+            self.retrieval_cache.clear()
+            self._lexical_index = None
+        return summary
+    
+    @property
+    def fingerprint(self):
+        """Koleksiyon içeriğinin özeti (PDF özeti + parçalama ve embedding ayarları); içerik değişince değişir"""
+        if self._fingerprint is None:
+            manifest = IngestManifest.load(self.chroma_dir)
+            self._fingerprint = hash_text(json.dumps(
+                {"file_hash": manifest.file_hash, "config": manifest.config}, sort_keys=True
+            ))
+        return self._fingerprint
+    
+    def embed_queries(self, queries):
+        """Sorguları koleksiyonun embedding modeli ile vektöre çevir (önbellekli)"""
+        return self.query_embedding_cache.embed(list(queries))
+    
+    def get_context_chunks(self, query, k=5, pages=None):
+        """Sorguya en uygun parçaları sayfa ve token bilgileriyle birlikte getir"""
+        return self.get_contexts_chunks([query], k, pages)[0]
+    
+    def get_contexts_chunks(self, queries, k=5, pages=None, trim=True):
+        """Birden fazla sorgu için parçaları getir; önbellekte olmayanlar tek depo çağrısıyla sorgulanır.
+        
+        Her parça {'id', 'text', 'page', 'token_count', 'tokenizer', 'distance', 'score'} sözlüğüdür.
+        pages: (ilk, son) sayfa aralığı (uçlar dahil, biri None olabilir); yalnızca bu sayfalar aranır.
+        trim=False ise önceki parçalarda geçen cümleler çıkarılmaz (sonuçları birleştiren çağıran için).
+        """
+        queries = list(queries)
+        pages = page_range(pages)
+        with self.metrics.span("rag_get_context", hybrid=self.hybrid) as span:
+            chunks = [self.retrieval_cache.get(query, k, scope=pages) for query in queries]
+            missing = [i for i, cached in enumerate(chunks) if cached is None]
+            if missing:
+                fetched = self._retrieve([queries[i] for i in missing], k, pages)
+                for i, result in zip(missing, fetched):
+                    chunks[i] = result
+                    self.retrieval_cache.put(queries[i], k, result, scope=pages)
+            trimmed_sentences = 0
+            if self.context_selector is not None and trim:
+                # Cümle kırpma seçilen parçaların birlikteliğine bağlı: önbelleğe tam parçalar yazılır
+                for i, result in enumerate(chunks):
+                    chunks[i], removed = self.context_selector.trim_overlaps(result)
+                    trimmed_sentences += removed
+            if self.metrics.enabled:
+                span.set(queries=len(queries), k=k, cache_misses=len(missing), trimmed_sentences=trimmed_sentences)
+                self.metrics.inc("rag_retrieval_cache_total", len(queries) - len(missing), result="hit")
+                self.metrics.inc("rag_retrieval_cache_total", len(missing), result="miss")
+                for result in chunks:
+                    self.metrics.observe("rag_context_chars", sum(len(chunk["text"]) for chunk in result))
+        return chunks
+    
+    def _retrieve(self, queries, k, pages=None):
+        """Aramayı yap; seçici varsa fazla aday getirip tekrarları at ve MMR ile k parça seç"""
+        if self.context_selector is None:
+            return self._search(queries, k, pages)
+        candidates = self._search(queries, self.context_selector.fetch_k(k), pages)
+        with self.metrics.span("rag_context_select", k=k) as span:
+            results = []
+            duplicates = 0
+            for query_vector, chunks in zip(self.embed_queries(queries), candidates):
+                selected, stats = self.context_selector.select(query_vector, chunks, k)
+                results.append(selected)
+                duplicates += stats["duplicates"]
+            span.set(candidates=sum(len(chunks) for chunks in candidates), duplicates=duplicates)
+        return results
+    
+    def _vector_search(self, queries, n_results, where=None):
+        """Sorguları tek depo çağrısıyla vektör araması yap"""
+        results = self.collection.query(
+            query_embeddings=self.embed_queries(queries),
+            n_results=n_results,
+            where=where
+        )
+        return [self._to_chunks(results, i) for i in range(len(queries))]
+    
+    def _search(self, queries, k, pages=None):
+        """Vektör ve BM25 aramalarını paralel yapıp RRF ile birleştir"""
+        where, allow = page_filter(pages)
+        if not self.hybrid:
+            with self.metrics.span("rag_vector_search"):
+                return self._vector_search(queries, k, where)
+        depth = max(k, self.candidate_depth)
+        lexical_future = self._search_executor.submit(self._lexical_search, queries, depth, allow)
+        with self.metrics.span("rag_vector_search"):
+            vector_results = self._vector_search(queries, depth, where)
+        lexical_results = lexical_future.result()
+        
+        fused_results = []
+        known = {}
+        for vector_chunks, lexical_hits in zip(vector_results, lexical_results):
+            known.update((chunk["id"], chunk) for chunk in vector_chunks)
+            fused_results.append(reciprocal_rank_fusion([
+                [chunk["id"] for chunk in vector_chunks],
+                [chunk_id for chunk_id, _ in lexical_hits]
+            ])[:k])
         
-        for i in range(0, len(words), chunk_size - overlap):
-            chunk = ' '.join(words[i:i + chunk_size])
-            if chunk.strip():
-                chunks.append(chunk)
+        # Sadece BM25'in bulduğu parçaların içeriğini tek çağrıda getir
+        unknown = list({chunk_id for fused in fused_results for chunk_id, _ in fused if chunk_id not in known})
+        if unknown:
+            fetched = self.collection.get(ids=unknown, include=["documents", "metadatas"])
+            for chunk_id, document, metadata in zip(fetched["ids"], fetched["documents"], fetched["metadatas"]):
+                known[chunk_id] = self._make_chunk(chunk_id, document, metadata, None)
         
+        return [
+            [dict(known[chunk_id], score=score) for chunk_id, score in fused if chunk_id in known]
+            for fused in fused_results
+        ]
+    
+    def _lexical_search(self, queries, depth, allow=None):
+        with self.metrics.span("rag_lexical_search"):
+            return [self.lexical_index.search(query, depth, allow) for query in queries]
+    
+    @property
+    def lexical_index(self):
+        """Koleksiyondaki parçalardan kurulan (ve chroma_dir'e kaydedilen) BM25 indeksi"""
+        if self._lexical_index is None:
+            def documents():
+                existing = self.collection.get(include=["documents"])
+                return zip(existing["ids"], existing["documents"])
+            self._lexical_index = BM25Index.load_or_build(self.chroma_dir, self.fingerprint, documents)
+        return self._lexical_index
+    
+    def close(self):
+        self._search_executor.shutdown(wait=False)
+    
+    def cache_stats(self):
+        """Retrieval, sorgu ve parça embedding önbelleklerinin isabet/ıska sayaçları"""
+        stats = {
+            "retrieval": self.retrieval_cache.stats(),
+            "query_embedding": self.query_embedding_cache.stats(),
+        }
+        if self.embedder.cache is not None:
+            stats["chunk_embedding"] = self.embedder.cache.stats()
+        return stats
+    
+    def get_contexts(self, queries, k=5):
+        """Birden fazla sorgu için context metinlerini getir"""
+        try:
+            return [
+                ' '.join(chunk["text"] for chunk in chunks) if chunks else "İlgili bilgi bulunamadı."
+                for chunks in self.get_contexts_chunks(queries, k)
+            ]
+        except Exception as e:
+            print(f"Context alma hatası: {e}")
+            return ["Veritabanı hatası."] * len(queries)
+    
+    def _to_chunks(self, results, index):
+        """Chroma sorgu sonucunun index'inci sorgusunu parça listesine çevir"""
+        if not results['documents'] or not results['documents'][index]:
+            return []
+        metadatas = (results.get('metadatas') or [[]])[index] or []
+        distances = (results.get('distances') or [[]])[index] or []
+        chunks = []
+        for i, document in enumerate(results['documents'][index]):
+            chunks.append(self._make_chunk(
+                results['ids'][index][i],
+                document,
+                metadatas[i] if i < len(metadatas) else None,
+                distances[i] if i < len(distances) else None
+            ))
         return chunks
     
+    def _make_chunk(self, chunk_id, document, metadata, distance):
+        metadata = metadata or {}
+        return {
+            "id": chunk_id,
+            "text": document,
+            "page": metadata.get("page"),
+            "token_count": metadata.get("token_count"),
+            "tokenizer": getattr(self.chunker, "tokenizer_name", None),
+            "distance": distance,
+        }
+    
     def get_context(self, query, k=5):
         """Sorguya en uygun context'i getir"""
         try:
-            results = self.collection.query(
-                query_texts=[query],
-                n_results=k
-            )
+            chunks = self.get_context_chunks(query, k)
             
-            if results['documents'] and results['documents'][0]:
-                context = ' '.join(results['documents'][0])
+            if chunks:
+                context = ' '.join(chunk["text"] for chunk in chunks)
                 return context
             else:
                 return "İlgili bilgi bulunamadı."
@@ -97,8 +289,28 @@ class RAGPipeline:
             print(f"Context alma hatası: {e}")
             return "Veritabanı hatası."
 
+def page_filter(pages):
+    """Sayfa aralığından (depo `where` filtresi, BM25 için parça id filtresi); aralık yoksa (None, None)"""
+    if pages is None:
+        return None, None
+    start, end = pages
+    conditions = []
+    if start is not None:
+        conditions.append({"page": {"$gte": start}})
+    if end is not None:
+        conditions.append({"page": {"$lte": end}})
+    where = conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+    def allow(chunk_id):
+        page = chunk_page(chunk_id)
+        return page is not None and (start is None or page >= start) and (end is None or page <= end)
+    return where, allow
+
+
 def get_rag_pipeline(pdf_path, chroma_dir="chroma_db"):
-    return RAGPipeline(pdf_path, chroma_dir)
+    """Süreç genelinde paylaşılan RAGPipeline örneğini döndür"""
+    from .registry import get_pipeline
+    return get_pipeline(pdf_path, chroma_dir)
 
 def get_context(query, pdf_path, chroma_dir="chroma_db", k=5):
     pipeline = get_rag_pipeline(pdf_path, chroma_dir)
@@ -0,0 +1,349 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+class _Entry:
+    """Registry'de tutulan tek bir kaynak kaydı"""
+
+    def __init__(self, key, factory):
+        self.key = key
+        self.factory = factory
+        self.instance = None
+        self.refcount = 0
+        self.lock = threading.Lock()
+        self.status = "pending"
+        self.error = None
+        self.load_seconds = None
+        self.created_at = None
+        self.last_used = None
+
+    def load(self):
+        """Kaynağı ilk ihtiyaçta (tek sefer) oluştur"""
+        with self.lock:
+            if self.instance is not None:
+                return self.instance
+            self.status = "loading"
+            started = time.perf_counter()
+            try:
+                self.instance = self.factory()
+            except Exception as e:
+                self.status = "error"
+                self.error = str(e)
+                raise
+            self.load_seconds = time.perf_counter() - started
+            self.created_at = time.time()
+            self.status = "ready"
+            self.error = None
+            return self.instance
+
+
+class BackgroundWarmup:
+    """Kaynakları arka plan thread'lerinde yükleyip isim başına hazır olma durumunu tutan yardımcı.
+
+    Aynı isim ikinci kez başlatılmaz; hata alan bir kaynak tekrar başlatılabilir.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._states = {}
+        self._events = {}
+
+    def start(self, loaders):
+        """(isim, yükleyici) çiftlerini başlat; yeni başlatılan isimleri döndür"""
+        started = []
+        with self._lock:
+            for name, loader in loaders:
+                state = self._states.get(name)
+                if state is not None and state["status"] != "error":
+                    continue
+                self._states[name] = {"status": "loading", "error": None, "seconds": None}
+                self._events[name] = threading.Event()
+                started.append((name, loader))
+        for name, loader in started:
+            threading.Thread(target=self._run, args=(name, loader), name=f"warmup-{name}", daemon=True).start()
+        return [name for name, _ in started]
+
+    def _run(self, name, loader):
+        began = time.perf_counter()
+        try:
+            loader()
+            state = {"status": "ready", "error": None}
+        except Exception as e:
+            print(f"Warmup hatası ({name}): {e}")
+            state = {"status": "error", "error": str(e)}
+        state["seconds"] = time.perf_counter() - began
+        with self._lock:
+            self._states[name] = state
+            event = self._events[name]
+        event.set()
+
+    def status(self):
+        """İsim -> {'status': loading|ready|error, 'error', 'seconds'}"""
+        with self._lock:
+            return {name: dict(state) for name, state in self._states.items()}
+
+    def is_ready(self, name):
+        with self._lock:
+            state = self._states.get(name)
+            return state is not None and state["status"] == "ready"
+
+    def wait(self, name, timeout=None):
+        """Kaynak yüklenene (veya hata alana) kadar bekle; hazırsa True"""
+        with self._lock:
+            event = self._events.get(name)
+        if event is None:
+            return False
+        event.wait(timeout)
+        return self.is_ready(name)
+
+
+class ResourceRegistry:
+    """Uzun ömürlü RAGPipeline ve BaseRAGModel örneklerini paylaşan, thread-safe kayıt defteri.
+
+    Kaynaklar (tür, config) anahtarıyla tutulur. Her kaynak bir "slot"a bağlanır;
+    bir slot farklı bir config ile tekrar istendiğinde eski kaynağın referansı bırakılır
+    ve referansı kalmayan kaynak bellekten atılır. Kaynağı bir istek boyunca kullanan
+    kod `lease()` ile ayrıca referans alır; böylece slot başka config'e bağlansa da
+    kaynak, onu kullanan son istek bitene kadar kapatılmaz.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._entries = {}
+        self._slots = {}
+        self.background = BackgroundWarmup()
+
+    def acquire(self, key, factory):
+        """Kaynağı al (yoksa oluştur) ve referans sayısını artır"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = _Entry(key, factory)
+                self._entries[key] = entry
+            entry.refcount += 1
+        try:
+            instance = entry.load()
+        except Exception:
+            self.release(key)
+            raise
+        entry.last_used = time.time()
+        return instance
+
+    def release(self, key):
+        """Referans sayısını azalt, sıfıra inerse kaynağı at"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            entry.refcount = max(0, entry.refcount - 1)
+            if entry.refcount == 0:
+                del self._entries[key]
+                self._close(entry.instance)
+
+    @contextmanager
+    def lease(self, *instances):
+        """Blok boyunca verilen kaynaklar için referans tut (registry'de olmayanlar yok sayılır)"""
+        keys = []
+        with self._lock:
+            for instance in instances:
+                for key, entry in self._entries.items():
+                    if entry.instance is instance:
+                        entry.refcount += 1
+                        keys.append(key)
+                        break
+        try:
+            yield instances[0] if len(instances) == 1 else instances
+        finally:
+            for key in keys:
+                self.release(key)
+
+    def get(self, slot, key, factory):
+        """Slot için kaynağı döndür; slot başka bir config'e bağlıysa eskisini bırak"""
+        with self._lock:
+            previous = self._slots.get(slot)
+            if previous == key:
+                entry = self._entries.get(key)
+                if entry is not None and entry.instance is not None:
+                    entry.last_used = time.time()
+                    return entry.instance
+        instance = self.acquire(key, factory)
+        with self._lock:
+            previous = self._slots.get(slot)
+            self._slots[slot] = key
+        if previous is not None:
+            self.release(previous)
+        return instance
+
+    def peek(self, slot):
+        """Slota bağlı kaynak yüklenmişse döndür, değilse None (kaynak oluşturmaz)"""
+        with self._lock:
+            entry = self._entries.get(self._slots.get(slot))
+            return entry.instance if entry is not None else None
+
+    def evict(self, slot):
+        """Slotu boşalt ve bağlı kaynağın referansını bırak"""
+        with self._lock:
+            key = self._slots.pop(slot, None)
+        if key is not None:
+            self.release(key)
+
+    def clear(self):
+        """Tüm kaynakları at"""
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+            self._slots.clear()
+        for entry in entries:
+            self._close(entry.instance)
+
+    def warmup(self, loaders):
+        """(isim, yükleyici) listesindeki kaynakları önceden yükle; hataları raporla"""
+        errors = {}
+        for name, loader in loaders:
+            try:
+                loader()
+            except Exception as e:
+                print(f"Warmup hatası ({name}): {e}")
+                errors[name] = str(e)
+        return errors
+
+    def warmup_async(self, loaders):
+        """warmup'ın bloklamayan hali: yükleme arka planda sürer, durum `readiness()` ile izlenir"""
+        return self.background.start(loaders)
+
+    def readiness(self):
+        return self.background.status()
+
+    def health(self):
+        """Kayıtlı kaynakların durum raporu"""
+        with self._lock:
+            slots_by_key = {}
+            for slot, key in self._slots.items():
+                slots_by_key.setdefault(key, []).append(slot)
+            report = {}
+            for key, entry in self._entries.items():
+                report[repr(key)] = {
+                    "slots": slots_by_key.get(key, []),
+                    "status": entry.status,
+                    "refcount": entry.refcount,
+                    "load_seconds": entry.load_seconds,
+                    "created_at": entry.created_at,
+                    "last_used": entry.last_used,
+                    "error": entry.error,
+                }
+            return report
+
+    def _close(self, instance):
+        """Kaynağın close() metodu varsa çağır"""
+        close = getattr(instance, "close", None)
+        if callable(close):
+            try:
+                close()
+            except Exception as e:
+                print(f"Kaynak kapatma hatası: {e}")
+
+
+_registry = ResourceRegistry()
+
+
+def get_registry():
+    """Süreç genelindeki paylaşılan registry"""
+    return _registry
+
+
+def get_pipeline(pdf_path, chroma_dir="chroma_db", slot="pipeline"):
+    """Config'e göre paylaşılan RAGPipeline örneğini döndür"""
+    from .rag_pipeline import RAGPipeline
+
+    key = ("pipeline", os.path.abspath(pdf_path), os.path.abspath(chroma_dir))
+    return _registry.get(slot, key, lambda: RAGPipeline(pdf_path, chroma_dir))
+
+
+def get_corpus(pdf_dir, chroma_dir="chroma_db", slot="pipeline"):
+    """Dizindeki PDF'lerden oluşan paylaşılan çok dokümanlı korpus (RAGPipeline ile aynı arama arayüzü)"""
+    from .corpus import CorpusManager
+
+    key = ("corpus", os.path.abspath(pdf_dir), os.path.abspath(chroma_dir))
+    return _registry.get(slot, key, lambda: CorpusManager(pdf_dir, chroma_dir))
+
+
+def get_model(model_cls, model_name=None, slot=None):
+    """Config'e göre paylaşılan BaseRAGModel örneğini döndür"""
+    slot = slot or model_cls.__name__
+    key = ("model", model_cls.__module__, model_cls.__name__, model_name)
+    if model_name is None:
+        factory = model_cls
+    else:
+        factory = lambda: model_cls(model_name)
+    return _registry.get(slot, key, factory)
+
+
+def get_generation_batcher(model, slot, max_batch_size=8, max_wait_ms=20):
+    """Modelin generate_answers metodunu eşzamanlı isteklerle besleyen paylaşılan kuyruk"""
+    from models.batching import MicroBatcher
+
+    def handler(items):
+        return model.generate_answers([query for query, _ in items], [context for _, context in items])
+
+    key = ("batcher", slot, id(model))
+    return _registry.get(f"{slot}:batcher", key,
+                         lambda: MicroBatcher(handler, max_batch_size, max_wait_ms, name=f"{slot}-batcher"))
+
+
+def get_retrieval_batcher(pipeline, slot="pipeline", max_batch_size=16, max_wait_ms=10):
+    """Eşzamanlı (sorgu, k) veya (sorgu, k, filtreler) isteklerini tek çok-sorgulu depo çağrısında toplayan kuyruk.
+
+    filtreler: get_contexts_chunks'a geçilecek (ad, değer) çiftlerinden oluşan demet (ör. (("pages", (3, 10)),)).
+    """
+    from models.batching import MicroBatcher
+
+    def handler(items):
+        # Aynı k ve filtrelere sahip sorgular tek çağrıda gider
+        results = [None] * len(items)
+        groups = {}
+        for i, item in enumerate(items):
+            groups.setdefault((item[1], item[2] if len(item) > 2 else ()), []).append(i)
+        for (k, filters), indices in groups.items():
+            chunks = pipeline.get_contexts_chunks([items[i][0] for i in indices], k, **dict(filters))
+            for i, chunk_list in zip(indices, chunks):
+                results[i] = chunk_list
+        return results
+
+    key = ("batcher", slot, id(pipeline))
+    return _registry.get(f"{slot}:batcher", key,
+                         lambda: MicroBatcher(handler, max_batch_size, max_wait_ms, name=f"{slot}-batcher"))
+
+
+def get_answer_cache(pipeline, slot="answer_cache", **options):
+    """Pipeline'ın koleksiyonuna bağlı, diske kalıcı paylaşılan semantik cevap önbelleği"""
+    from models.answer_cache import SemanticAnswerCache
+
+    persist_path = options.pop("persist_path", None) or os.path.join(pipeline.chroma_dir, "answer_cache.json")
+    # Farklı ayarlarla (eşik, kapasite, yol) istenen önbellekler aynı örneği paylaşmaz; önbellek
+    # pipeline'ın embed_queries'ini tuttuğundan yeni pipeline (batcher'lardaki gibi) yeni örnek alır
+    key = ("answer_cache", id(pipeline), os.path.abspath(persist_path), tuple(sorted(options.items())))
+    cache = _registry.get(slot, key, lambda: SemanticAnswerCache(
+        pipeline.embed_queries,
+        persist_path=persist_path,
+        fingerprint=pipeline.fingerprint,
+        **options
+    ))
+    cache.set_fingerprint(pipeline.fingerprint)
+    return cache
+
+
+def get_session_store(slot="sessions", **options):
+    """Süreç genelinde paylaşılan oturum deposu"""
+    from .sessions import SessionStore
+
+    key = ("sessions", tuple(sorted(options.items())))
+    return _registry.get(slot, key, lambda: SessionStore(**options))
+
+
+def get_comparison_executor(slot="comparison", max_workers=4):
+    """Modelleri paralel çalıştıran paylaşılan yürütücü"""
+    from models.comparison import ComparisonExecutor
+
+    return _registry.get(slot, ("comparison", max_workers), lambda: ComparisonExecutor(max_workers))
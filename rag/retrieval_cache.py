@@ -0,0 +1,155 @@
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+
+_TURKISH_LOWER = str.maketrans({"I": "ı", "İ": "i"})
+_WHITESPACE = re.compile(r"\s+")
+# Parçaya değil sorguya ait alanlar: her sorgu sonucu için ayrı saklanır
+_QUERY_FIELDS = ("distance", "score")
+
+
+def turkish_lower(text):
+    """Türkçe kurallarıyla küçük harfe çevir (I -> ı, İ -> i)"""
+    return text.translate(_TURKISH_LOWER).lower()
+
+
+def normalize_query(query):
+    """Önbellek anahtarı için sorguyu normalize et: Türkçe küçük harf, noktalama ve boşluk katlama"""
+    text = unicodedata.normalize("NFC", turkish_lower(query))
+    text = "".join(" " if unicodedata.category(ch).startswith("P") else ch for ch in text)
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+class _LRU:
+    """Thread-safe, boyut sınırlı LRU sözlük ve isabet sayaçları"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, accept=None):
+        """Değeri döndür ve isabeti say; accept verilmişse değeri kabul etmeyen kayıt ıska sayılır"""
+        with self._lock:
+            value = self._data.get(key)
+            if value is None or (accept is not None and not accept(value)):
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def peek(self, key):
+        """Sayaçları ve sırayı değiştirmeden değeri döndür"""
+        with self._lock:
+            return self._data.get(key)
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._data), "hits": self.hits, "misses": self.misses}
+
+
+def _cache_key(query, scope):
+    key = normalize_query(query)
+    return key if scope is None else (key, scope)
+
+
+class RetrievalCache:
+    """Normalize sorgu -> sıralı (parça id, mesafe, puan) listesi önbelleği.
+
+    Daha büyük bir k için saklanmış sonuç, daha küçük k istekleri için de
+    kullanılır. Parça içerikleri id'ye göre tek bir yerde tutulur.
+    """
+
+    def __init__(self, max_entries=1024):
+        self._results = _LRU(max_entries)
+        self._chunks = {}
+        self._lock = threading.Lock()
+
+    def get(self, query, k, scope=None):
+        """Önbellekte k veya daha fazla sonuçlu kayıt varsa ilk k parçayı döndür.
+        
+        scope: sonucu etkileyen filtreler (ör. sayfa aralığı); farklı scope ayrı kayıttır.
+        """
+        # Daha küçük k ile saklanmış kayıt yetmez, yeniden sorgulanmalı
+        entry = self._results.get(_cache_key(query, scope), accept=lambda value: value[0] >= k)
+        if entry is None:
+            return None
+        _, ranked = entry
+        with self._lock:
+            chunks = []
+            for chunk_id, scores in ranked[:k]:
+                chunk = self._chunks.get(chunk_id)
+                if chunk is None:
+                    return None
+                chunks.append(dict(chunk, **scores))
+        return chunks
+
+    def put(self, query, k, chunks, scope=None):
+        """k için getirilen parçaları sakla"""
+        key = _cache_key(query, scope)
+        existing = self._results.peek(key)
+        if existing is not None and existing[0] > k:
+            return
+        with self._lock:
+            for chunk in chunks:
+                self._chunks[chunk["id"]] = {
+                    name: value for name, value in chunk.items() if name not in _QUERY_FIELDS
+                }
+        ranked = [
+            (chunk["id"], {name: chunk[name] for name in _QUERY_FIELDS if name in chunk})
+            for chunk in chunks
+        ]
+        self._results.put(key, (k, ranked))
+
+    def clear(self):
+        self._results.clear()
+        with self._lock:
+            self._chunks.clear()
+
+    def stats(self):
+        return self._results.stats()
+
+
+class QueryEmbeddingCache:
+    """Normalize sorgu -> embedding vektörü önbelleği"""
+
+    def __init__(self, embed_fn, max_entries=2048):
+        self.embed_fn = embed_fn
+        self._vectors = _LRU(max_entries)
+
+    def embed(self, queries):
+        """Sorguların vektörlerini döndür; önbellekte olmayanları tek çağrıda hesapla"""
+        keys = [normalize_query(query) for query in queries]
+        vectors = [self._vectors.get(key) for key in keys]
+        missing = {}
+        for i, vector in enumerate(vectors):
+            if vector is None:
+                missing.setdefault(keys[i], i)
+        if missing:
+            computed = self.embed_fn([queries[i] for i in missing.values()])
+            fresh = {key: [float(value) for value in vector] for key, vector in zip(missing, computed)}
+            for key, vector in fresh.items():
+                self._vectors.put(key, vector)
+            vectors = [vector if vector is not None else fresh[key] for key, vector in zip(keys, vectors)]
+        return vectors
+
+    def clear(self):
+        self._vectors.clear()
+
+    def stats(self):
+        return self._vectors.stats()
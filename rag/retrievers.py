@@ -0,0 +1,399 @@
+import json
+import os
+import threading
+import numpy as np
+
+COLLECTION_NAME = "ilk_yardim_knowledge"
+NUMPY_INDEX_DIRNAME = "numpy_index"
+RETRIEVERS = ("chroma", "numpy")
+INDEX_DTYPES = ("float32", "float16", "int8")
+
+
+class Retriever:
+    """Vektör deposu arayüzü.
+
+    Metot adları ve dönüş biçimleri Chroma koleksiyonuyla aynıdır; böylece
+    `PDFIngestor`, BM25 indeksi ve `RAGPipeline` hangi deponun kullanıldığını
+    bilmeden çalışır. `query` sonuçları sorgu başına listelerdir
+    (`{"ids": [[...]], "documents": [[...]], "metadatas": [[...]], "distances": [[...]]}`).
+    """
+
+    name = None
+
+    def count(self):
+        raise NotImplementedError
+
+    def upsert(self, ids, documents, metadatas, embeddings=None):
+        raise NotImplementedError
+
+    def delete(self, ids):
+        raise NotImplementedError
+
+    def get(self, ids=None, include=("documents", "metadatas")):
+        raise NotImplementedError
+
+    def query(self, query_embeddings, n_results=5, where=None):
+        """where: Chroma metadata filtresi (ör. {"page": {"$gte": 10}}); yalnızca eşleşen parçalar aranır"""
+        raise NotImplementedError
+
+    def reset(self):
+        """Tüm içeriği sil ve depoyu boş olarak yeniden oluştur"""
+        raise NotImplementedError
+
+
+class ChromaRetriever(Retriever):
+    """chromadb.PersistentClient koleksiyonu (HNSW, SQLite)"""
+
+    name = "chroma"
+
+    def __init__(self, chroma_dir, embedding_function=None, collection_name=COLLECTION_NAME):
+        import chromadb
+        from chromadb.config import Settings
+
+        self.collection_name = collection_name
+        self.embedding_function = embedding_function
+        self.client = chromadb.PersistentClient(path=chroma_dir, settings=Settings(anonymized_telemetry=False))
+        self.collection = self._get_collection()
+
+    def _get_collection(self):
+        return self.client.get_or_create_collection(
+            name=self.collection_name,
+            metadata={"description": "İlk yardım bilgileri"},
+            embedding_function=self.embedding_function
+        )
+
+    def count(self):
+        return self.collection.count()
+
+    def upsert(self, ids, documents, metadatas, embeddings=None):
+        kwargs = {"embeddings": embeddings} if embeddings is not None else {}
+        self.collection.upsert(ids=ids, documents=documents, metadatas=metadatas, **kwargs)
+
+    def delete(self, ids):
+        self.collection.delete(ids=ids)
+
+    def get(self, ids=None, include=("documents", "metadatas")):
+        return self.collection.get(ids=ids, include=list(include))
+
+    def query(self, query_embeddings, n_results=5, where=None):
+        kwargs = {"where": where} if where is not None else {}
+        return self.collection.query(query_embeddings=query_embeddings, n_results=n_results, **kwargs)
+
+    def reset(self):
+        self.client.delete_collection(self.collection_name)
+        self.collection = self._get_collection()
+
+
+class NumpyRetriever(Retriever):
+    """Bellek eşlemeli (memmap) vektör dosyası üzerinde birebir (exact) top-k arama.
+
+    Normalize vektörler `dtype` ile saklanır: float32, float16 veya satır başına
+    ölçekli int8 (4 kat daha küçük). Parça metinleri ve metadata `index.json`
+    içindedir. Her yazım yeni bir nesil dosyası oluşturup `index.json`'u atomik
+    olarak değiştirir; aynı dizini açan sunucu süreçleri dosyayı salt okunur
+    eşlediği için sayfaları işletim sisteminin önbelleğinde paylaşır ve indeks
+    değiştiğinde bir sonraki sorguda yeni nesli yükler. Yazımlar tüm matrisi
+    yeniden yazar; tek PDF'lik (birkaç bin parça) bir korpus için tasarlanmıştır.
+    """
+
+    name = "numpy"
+
+    def __init__(self, index_dir, dtype=None, block_rows=4096):
+        self.index_dir = index_dir
+        self.dtype = (dtype or os.getenv("NUMPY_INDEX_DTYPE") or "float32").lower()
+        if self.dtype not in INDEX_DTYPES:
+            raise ValueError(f"Bilinmeyen indeks tipi: {self.dtype} (seçenekler: {', '.join(INDEX_DTYPES)})")
+        self.block_rows = block_rows
+        self._index_path = os.path.join(index_dir, "index.json")
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._clear_state()
+        self._reload()
+
+    def _clear_state(self):
+        self.generation = 0
+        self.dim = None
+        self._ids = []
+        self._rows = {}
+        self._documents = []
+        self._metadatas = []
+        self._vectors = None
+        self._scales = None
+
+    # --- Okuma ---
+
+    def _reload(self):
+        """index.json değiştiyse (başka bir süreç yazdıysa) yeni nesli eşle"""
+        try:
+            stat = os.stat(self._index_path)
+        except FileNotFoundError:
+            if self._stamp is not None:
+                self._clear_state()
+                self._stamp = None
+            return
+        stamp = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        if stamp == self._stamp:
+            return
+        try:
+            with open(self._index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"NumPy indeksi okunamadı: {e}")
+            return
+        if data.get("dtype") != self.dtype:
+            # Farklı tipte kurulmuş indeks: bir sonraki yazımda bu tiple baştan yazılır
+            print(f"NumPy indeksi {data.get('dtype')} tipinde, {self.dtype} bekleniyordu; yeniden kurulmalı.")
+            self._clear_state()
+            self._stamp = stamp
+            return
+        self._clear_state()
+        self.generation = data["generation"]
+        self.dim = data["dim"]
+        self._ids = data["ids"]
+        self._documents = data["documents"]
+        self._metadatas = data["metadatas"]
+        self._rows = {chunk_id: row for row, chunk_id in enumerate(self._ids)}
+        if self._ids:
+            shape = (len(self._ids), self.dim)
+            self._vectors = np.memmap(self._vector_path(self.generation), dtype=self.dtype, mode="r", shape=shape)
+            if self.dtype == "int8":
+                self._scales = np.memmap(self._scale_path(self.generation), dtype=np.float32, mode="r",
+                                         shape=(len(self._ids),))
+        self._stamp = stamp
+
+    def count(self):
+        with self._lock:
+            self._reload()
+            return len(self._ids)
+
+    def get(self, ids=None, include=("documents", "metadatas")):
+        with self._lock:
+            self._reload()
+            rows = range(len(self._ids)) if ids is None else [self._rows[i] for i in ids if i in self._rows]
+            result = {"ids": [self._ids[row] for row in rows]}
+            if "documents" in include:
+                result["documents"] = [self._documents[row] for row in rows]
+            if "metadatas" in include:
+                result["metadatas"] = [self._metadatas[row] for row in rows]
+            return result
+
+    def query(self, query_embeddings, n_results=5, where=None):
+        queries = _normalize(np.asarray(query_embeddings, dtype=np.float32))
+        with self._lock:
+            self._reload()
+            ids, documents, metadatas = self._ids, self._documents, self._metadatas
+            vectors, scales = self._vectors, self._scales
+        mask = None
+        if where is not None and vectors is not None:
+            mask = np.fromiter((matches_where(metadata, where) for metadata in metadatas), dtype=bool,
+                               count=len(metadatas))
+        result = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        if vectors is None or (mask is not None and not mask.any()):
+            for _ in range(len(queries)):
+                for values in result.values():
+                    values.append([])
+            return result
+
+        scores = self._scores(vectors, scales, queries)
+        if mask is not None:
+            scores[:, ~mask] = -np.inf
+        n_results = min(n_results, len(ids) if mask is None else int(mask.sum()))
+        for row_scores in scores:
+            top = np.argpartition(-row_scores, n_results - 1)[:n_results]
+            top = top[np.argsort(-row_scores[top], kind="stable")]
+            result["ids"].append([ids[row] for row in top])
+            result["documents"].append([documents[row] for row in top])
+            result["metadatas"].append([metadatas[row] for row in top])
+            # Kosinüs uzaklığı (1 - benzerlik)
+            result["distances"].append([float(1.0 - row_scores[row]) for row in top])
+        return result
+
+    def _scores(self, vectors, scales, queries):
+        """(sorgu sayısı, satır sayısı) kosinüs benzerlik matrisi; sıkıştırılmış tipler blok blok açılır"""
+        if self.dtype == "float32":
+            return queries @ np.asarray(vectors).T
+        scores = np.empty((len(queries), len(vectors)), dtype=np.float32)
+        for start in range(0, len(vectors), self.block_rows):
+            block = np.asarray(vectors[start:start + self.block_rows], dtype=np.float32)
+            block_scores = queries @ block.T
+            if scales is not None:
+                block_scores *= scales[start:start + self.block_rows]
+            scores[:, start:start + len(block)] = block_scores
+        return scores
+
+    # --- Yazma ---
+
+    def upsert(self, ids, documents, metadatas, embeddings=None):
+        if embeddings is None:
+            raise ValueError("NumPy deposu için embedding'ler açıkça verilmelidir")
+        embeddings = _normalize(np.asarray(embeddings, dtype=np.float32))
+        with self._lock:
+            self._reload()
+            matrix = self._dense()
+            all_ids, all_documents, all_metadatas = list(self._ids), list(self._documents), list(self._metadatas)
+            rows = dict(self._rows)
+            appended = []
+            for chunk_id, document, metadata, vector in zip(ids, documents, metadatas, embeddings):
+                row = rows.get(chunk_id)
+                if row is None:
+                    rows[chunk_id] = len(all_ids)
+                    all_ids.append(chunk_id)
+                    all_documents.append(document)
+                    all_metadatas.append(metadata)
+                    appended.append(vector)
+                elif row < len(matrix):
+                    all_documents[row] = document
+                    all_metadatas[row] = metadata
+                    matrix[row] = vector
+                else:
+                    # Aynı çağrıda iki kez gelen yeni id: son değer geçerli
+                    all_documents[row] = document
+                    all_metadatas[row] = metadata
+                    appended[row - len(matrix)] = vector
+            if appended:
+                matrix = np.vstack([matrix, np.stack(appended)]) if len(matrix) else np.stack(appended)
+            self._write(all_ids, all_documents, all_metadatas, matrix)
+
+    def delete(self, ids):
+        with self._lock:
+            self._reload()
+            remove = {self._rows[i] for i in ids if i in self._rows}
+            if not remove:
+                return
+            keep = [row for row in range(len(self._ids)) if row not in remove]
+            self._write(
+                [self._ids[row] for row in keep],
+                [self._documents[row] for row in keep],
+                [self._metadatas[row] for row in keep],
+                self._dense()[keep]
+            )
+
+    def reset(self):
+        with self._lock:
+            self._write([], [], [], np.zeros((0, self.dim or 0), dtype=np.float32))
+
+    def _dense(self):
+        """Mevcut vektörlerin float32 kopyası"""
+        if self._vectors is None:
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+        matrix = np.array(self._vectors, dtype=np.float32)
+        if self._scales is not None:
+            matrix = matrix * np.asarray(self._scales)[:, None]
+        return matrix
+
+    def _write(self, ids, documents, metadatas, matrix):
+        """Yeni nesli yaz, index.json'u atomik olarak değiştir ve eski nesli sil"""
+        os.makedirs(self.index_dir, exist_ok=True)
+        previous = self.generation
+        generation = previous + 1
+        dim = int(matrix.shape[1]) if len(ids) else self.dim
+        if len(ids):
+            if self.dtype == "int8":
+                scales = np.abs(matrix).max(axis=1) / 127.0
+                scales[scales == 0] = 1.0
+                stored = np.round(matrix / scales[:, None]).astype(np.int8)
+                _write_array(self._scale_path(generation), scales.astype(np.float32))
+            else:
+                stored = matrix.astype(self.dtype)
+            _write_array(self._vector_path(generation), stored)
+
+        tmp_path = self._index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "generation": generation,
+                "dtype": self.dtype,
+                "dim": dim,
+                "ids": ids,
+                "documents": documents,
+                "metadatas": metadatas,
+            }, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, self._index_path)
+
+        # Eski nesli eşlemiş süreçler dosya silinse de okumaya devam edebilir
+        for path in (self._vector_path(previous), self._scale_path(previous)):
+            if os.path.exists(path):
+                os.remove(path)
+        self._reload()
+
+    def _vector_path(self, generation):
+        return os.path.join(self.index_dir, f"vectors-{generation}.{self.dtype}")
+
+    def _scale_path(self, generation):
+        return os.path.join(self.index_dir, f"scales-{generation}.f32")
+
+
+_OPERATORS = {
+    "$eq": lambda value, target: value == target,
+    "$ne": lambda value, target: value != target,
+    "$gt": lambda value, target: value is not None and value > target,
+    "$gte": lambda value, target: value is not None and value >= target,
+    "$lt": lambda value, target: value is not None and value < target,
+    "$lte": lambda value, target: value is not None and value <= target,
+    "$in": lambda value, target: value in target,
+    "$nin": lambda value, target: value not in target,
+}
+
+
+def matches_where(metadata, where):
+    """Metadata'nın Chroma `where` filtresine (alan karşılaştırmaları, $and, $or) uyup uymadığı"""
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches_where(metadata, item) for item in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_where(metadata, item) for item in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = metadata.get(key)
+            if not all(_OPERATORS[op](value, target) for op, target in condition.items()):
+                return False
+        elif metadata.get(key) != condition:
+            return False
+    return True
+
+
+def page_range(pages):
+    """Sayfa aralığını (ilk, son) demetine çevir; aralık yoksa None"""
+    if not pages:
+        return None
+    start, end = pages
+    start = int(start) if start is not None else None
+    end = int(end) if end is not None else None
+    if start is None and end is None:
+        return None
+    if start is not None and end is not None and start > end:
+        raise ValueError(f"Geçersiz sayfa aralığı: {start}-{end}")
+    return start, end
+
+
+def _normalize(matrix):
+    if matrix.ndim == 1:
+        matrix = matrix[None, :]
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _write_array(path, array):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(np.ascontiguousarray(array).tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def resolve_retriever(name=None):
+    """Depo adını (argüman > RETRIEVER_BACKEND > chroma) doğrula"""
+    name = (name or os.getenv("RETRIEVER_BACKEND") or "chroma").lower()
+    if name not in RETRIEVERS:
+        raise ValueError(f"Bilinmeyen retriever: {name} (seçenekler: {', '.join(RETRIEVERS)})")
+    return name
+
+
+def open_retriever(name, chroma_dir, embedding_function=None, dtype=None):
+    """chroma_dir altında seçilen vektör deposunu aç"""
+    name = resolve_retriever(name)
+    if name == "numpy":
+        return NumpyRetriever(os.path.join(chroma_dir, NUMPY_INDEX_DIRNAME), dtype=dtype)
+    return ChromaRetriever(chroma_dir, embedding_function)
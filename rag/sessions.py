@@ -0,0 +1,245 @@
+import threading
+import time
+from collections import OrderedDict, deque
+import numpy as np
+from .retrieval_cache import normalize_query
+
+# Takip sorusunu başlatan ve yeniden yazarken atılan ifadeler ("peki ya çocuklarda?")
+_LEAD_PHRASES = ("peki", "ya", "ve", "ayrıca", "bir de", "o zaman", "bu durumda", "öyleyse")
+# Kısa sorunun başında önceki konuya gönderme yapan kelimeler ("bunu nasıl yaparım?")
+_REFERENCE_WORDS = frozenset("bu bunu bunun buna bunda bunlar bunları o onu onun ona onda onlar şu şunu aynı".split())
+_QUESTION_WORDS = frozenset("ne neler nedir nasıl neden niçin niye hangi kaç mı mi mu mü".split())
+# Bundan uzun sorular kendi başına anlaşılır sayılır ve yeniden yazılmaz
+_MAX_FOLLOWUP_WORDS = 5
+_VECTOR_BYTES = 4
+_RECORD_OVERHEAD = 64
+
+
+def is_followup(question):
+    """Soru önceki konuya bağlı kısa bir takip sorusu gibi mi görünüyor.
+
+    Takip sorusu: bir giriş ifadesiyle başlayan ("peki ...", "ya ..."), "ya" ile
+    biten ya da gönderme kelimesiyle başlayan soru ("bunu nasıl yaparım?"; "Onu bilmiyorum" değil).
+    """
+    text = normalize_query(question)
+    words = text.split()
+    if not words or len(words) > _MAX_FOLLOWUP_WORDS:
+        return False
+    if any(text == phrase or text.startswith(phrase + " ") for phrase in _LEAD_PHRASES):
+        return True
+    if words[-1] == "ya":
+        return True
+    return words[0] in _REFERENCE_WORDS and ("?" in question or any(word in _QUESTION_WORDS for word in words))
+
+
+def rewrite_followup(question, previous_query):
+    """Takip sorusunu önceki konunun sorgusuyla birleştirip tek başına anlaşılır hale getir.
+
+    "peki ya çocuklarda?" + "Yanıklarda ilk yardım nasıl yapılır?" ->
+    "Yanıklarda ilk yardım nasıl yapılır, çocuklarda?"
+    """
+    if not previous_query or not is_followup(question):
+        return question
+    words = question.strip().rstrip("?!. ").split()
+    changed = True
+    while words and changed:
+        changed = False
+        for phrase in _LEAD_PHRASES:
+            size = len(phrase.split())
+            if normalize_query(" ".join(words[:size])) == phrase:
+                words = words[size:]
+                changed = True
+                break
+    if words and normalize_query(words[-1]) == "ya":
+        words = words[:-1]
+    base = previous_query.strip().rstrip("?!. ")
+    return f"{base}, {' '.join(words)}?" if words else f"{base}?"
+
+
+def _text_bytes(text):
+    return len(text.encode("utf-8", errors="surrogatepass")) if text else 0
+
+
+class Turn:
+    """Tek soru-cevap kaydı (kullanıcının sorusu, bağımsız sorgu, konu sorgusu, kısaltılmış cevap).
+
+    topic: takip sorularının birleştirildiği, yeniden yazılmamış konu sorgusu; takip
+    sorularında önceki turun konusu korunur, böylece yeniden yazımlar birikmez.
+    """
+
+    __slots__ = ("question", "query", "topic", "answer", "tokens")
+
+    def __init__(self, question, query, answer, tokens, topic=None):
+        self.question = question
+        self.query = query
+        self.topic = topic or query
+        self.answer = answer
+        self.tokens = tokens
+
+    @property
+    def size(self):
+        topic = _text_bytes(self.topic) if self.topic is not self.query else 0
+        return (_RECORD_OVERHEAD + _text_bytes(self.question) + _text_bytes(self.query) + topic
+                + _text_bytes(self.answer))
+
+    def to_dict(self):
+        return {"question": self.question, "query": self.query, "answer": self.answer}
+
+
+class Session:
+    """Bir oturumun sınırlı geçmişi ve son retrieval sonucu"""
+
+    __slots__ = ("session_id", "turns", "last_vector", "last_k", "last_scope", "last_chunks", "last_access", "size")
+
+    def __init__(self, session_id, now):
+        self.session_id = session_id
+        self.turns = deque()
+        self.last_vector = None
+        self.last_k = None
+        self.last_scope = None
+        self.last_chunks = None
+        self.last_access = now
+        self.size = _RECORD_OVERHEAD
+
+    @property
+    def last_topic(self):
+        return self.turns[-1].topic if self.turns else None
+
+    def history(self):
+        return [turn.to_dict() for turn in self.turns]
+
+    def _measure(self):
+        size = _RECORD_OVERHEAD + sum(turn.size for turn in self.turns)
+        if self.last_vector is not None:
+            size += self.last_vector.size * _VECTOR_BYTES
+        if self.last_chunks:
+            size += sum(_RECORD_OVERHEAD + _text_bytes(chunk.get("text")) for chunk in self.last_chunks)
+        return size
+
+
+class SessionStore:
+    """Çok turlu sohbetler için bellek sınırlı oturum deposu.
+
+    Oturum başına en fazla `max_turns` tur ve `max_history_tokens` (tahmini)
+    token geçmiş tutulur; cevaplar `max_answer_chars` karaktere kısaltılır.
+    Oturumlar son erişim sırasıyla tutulur: `ttl_seconds` boyunca kullanılmayan
+    oturumlar ve toplam boyut `max_bytes`'ı veya sayı `max_sessions`'ı aşınca en
+    eski oturumlar atılır. Takip soruları önceki sorguyla birleştirilerek
+    bağımsız sorguya çevrilir; yeni sorgu önceki turun sorgusuna yeterince
+    yakınsa (`reuse_threshold` kosinüs benzerliği) önceki parçalar yeniden
+    kullanılır ve vektör araması yapılmaz.
+    """
+
+    def __init__(self, max_sessions=1000, ttl_seconds=1800, max_bytes=32 * 1024 * 1024, max_turns=6,
+                 max_history_tokens=1024, max_answer_chars=600, reuse_threshold=0.92, clock=time.monotonic):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.max_turns = max_turns
+        self.max_history_tokens = max_history_tokens
+        self.max_answer_chars = max_answer_chars
+        self.reuse_threshold = reuse_threshold
+        self.clock = clock
+        self._sessions = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evicted = 0
+        self.reused = 0
+
+    def get(self, session_id):
+        """Oturumu getir (yoksa oluştur) ve en son kullanılan olarak işaretle"""
+        now = self.clock()
+        with self._lock:
+            self._expire(now)
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = Session(session_id, now)
+                self._sessions[session_id] = session
+                self._bytes += session.size
+                self._evict()
+            else:
+                self._sessions.move_to_end(session_id)
+            session.last_access = now
+            return session
+
+    def standalone_query(self, session, question):
+        """Soruyu oturumun son konusuna göre bağımsız sorguya çevir"""
+        with self._lock:
+            topic = session.last_topic
+        return rewrite_followup(question, topic)
+
+    def context(self, session, query, k, fetch, embed_queries, scope=None):
+        """(parçalar, yeniden kullanıldı mı): önceki tura yakın sorguda önceki parçalar, değilse fetch().
+
+        scope: aramayı daraltan filtreler; yalnızca aynı filtrelerle getirilmiş parçalar yeniden kullanılır.
+        """
+        vector = np.asarray(embed_queries([query])[0], dtype=np.float32)
+        vector /= max(float(np.linalg.norm(vector)), 1e-12)
+        with self._lock:
+            previous_vector, previous_k, previous_chunks = session.last_vector, session.last_k, session.last_chunks
+            same_scope = session.last_scope == scope
+        if previous_chunks and same_scope and previous_k >= k \
+                and float(vector @ previous_vector) >= self.reuse_threshold:
+            with self._lock:
+                self.reused += 1
+            return previous_chunks[:k], True
+        chunks = fetch()
+        with self._lock:
+            session.last_vector = vector
+            session.last_k = k
+            session.last_scope = scope
+            session.last_chunks = chunks if isinstance(chunks, list) else None
+            self._resize(session)
+        return chunks, False
+
+    def record(self, session, question, query, answer, count_tokens=None):
+        """Turu geçmişe ekle; tur ve token sınırını aşan eski turları at"""
+        from models.prompt_packing import estimate_tokens
+
+        count_tokens = count_tokens or estimate_tokens
+        answer = (answer or "")[:self.max_answer_chars]
+        turn = Turn(question, query, answer, count_tokens(f"{question} {answer}"))
+        with self._lock:
+            # Yeniden yazılmış takip sorusu konuyu değiştirmez
+            if query != question and session.last_topic:
+                turn.topic = session.last_topic
+            session.turns.append(turn)
+            tokens = sum(item.tokens for item in session.turns)
+            while len(session.turns) > 1 and (len(session.turns) > self.max_turns or tokens > self.max_history_tokens):
+                tokens -= session.turns.popleft().tokens
+            session.last_access = self.clock()
+            self._resize(session)
+            self._evict()
+
+    def history(self, session_id):
+        with self._lock:
+            session = self._sessions.get(session_id)
+            return session.history() if session is not None else []
+
+    def _resize(self, session):
+        size = session._measure()
+        if session.session_id in self._sessions:
+            self._bytes += size - session.size
+        session.size = size
+
+    def _expire(self, now):
+        """Sıra son erişime göre: baştan süresi dolanları at"""
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if now - session.last_access < self.ttl_seconds:
+                break
+            self._drop(session.session_id)
+
+    def _evict(self):
+        while self._sessions and (len(self._sessions) > self.max_sessions or self._bytes > self.max_bytes):
+            self._drop(next(iter(self._sessions)))
+
+    def _drop(self, session_id):
+        session = self._sessions.pop(session_id)
+        self._bytes -= session.size
+        self.evicted += 1
+
+    def stats(self):
+        with self._lock:
+            return {"sessions": len(self._sessions), "bytes": self._bytes, "evicted": self.evicted,
+                    "reused_contexts": self.reused}
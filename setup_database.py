@@ -0,0 +1,135 @@
+"""Vektör veritabanını sunumdan önce (offline) oluştur.
+
+Kullanım:
+    python setup_database.py
+    python setup_database.py --pdf data/ilk-yardim.pdf --chroma-dir chroma_db --batch-size 128 --workers 4
+    python setup_database.py --embedding-model sentence-transformers/paraphrase-multilingual-mpnet-base-v2
+    python setup_database.py --retriever numpy --index-dtype int8
+    python setup_database.py --pdf-dir data/pdfs                 # çok dokümanlı korpus
+    python setup_database.py --pdf-dir data/pdfs --disable zehirlenmeler --list
+"""
+import argparse
+import os
+import sys
+import time
+from rag.chunking import make_chunker
+from rag.corpus import CorpusManager
+from rag.embeddings import make_embedder
+from rag.rag_pipeline import RAGPipeline
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="İlk yardım PDF'ini vektör veritabanına yükle")
+    parser.add_argument("--pdf", default=os.path.join("data", "ilk-yardim.pdf"), help="PDF dosyası")
+    parser.add_argument("--chroma-dir", default="chroma_db", help="Vektör veritabanı dizini")
+    parser.add_argument("--chunker", choices=["token", "word"], default="token",
+                        help="Parçalama yöntemi: token (cümle sınırlı, tokenizer'a göre) veya word (eski)")
+    parser.add_argument("--chunk-size", type=int, default=None,
+                        help="Parça boyutu (token: 200, word: 500 kelime)")
+    parser.add_argument("--overlap", type=int, default=None,
+                        help="Parçalar arası örtüşme (token: 20, word: 50 kelime)")
+    parser.add_argument("--batch-size", type=int, default=64, help="Tek yazımda eklenecek parça sayısı")
+    parser.add_argument("--workers", type=int, default=None, help="Sayfa çıkarma süreç sayısı (varsayılan: CPU sayısı)")
+    parser.add_argument("--embedding-model", default=None,
+                        help="sentence-transformers modeli (varsayılan: EMBEDDING_MODEL veya çok dilli MiniLM)")
+    parser.add_argument("--embedding-batch-size", type=int, default=64, help="Tek encode çağrısındaki parça sayısı")
+    parser.add_argument("--retriever", choices=["chroma", "numpy"], default=None,
+                        help="Vektör deposu (varsayılan: RETRIEVER_BACKEND veya chroma)")
+    parser.add_argument("--index-dtype", choices=["float32", "float16", "int8"], default=None,
+                        help="NumPy deposunda vektör tipi (varsayılan: NUMPY_INDEX_DTYPE veya float32)")
+    parser.add_argument("--force", action="store_true", help="Manifest'i yok sayıp baştan oluştur")
+    parser.add_argument("--pdf-dir", default=None,
+                        help="Dizindeki tüm PDF'leri doküman başına ayrı indeksle (korpus modu)")
+    parser.add_argument("--enable", action="append", default=[], metavar="ID",
+                        help="Korpus dokümanını aramalara dahil et (tekrarlanabilir)")
+    parser.add_argument("--disable", action="append", default=[], metavar="ID",
+                        help="Korpus dokümanını yeniden indekslemeden aramalardan çıkar (tekrarlanabilir)")
+    parser.add_argument("--list", action="store_true", help="Korpus dokümanlarını listele (indeksleme yapmaz)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.pdf_dir:
+        return setup_corpus(args)
+    if args.enable or args.disable or args.list:
+        print("--enable, --disable ve --list yalnızca --pdf-dir ile kullanılabilir")
+        return 1
+    if not os.path.exists(args.pdf):
+        print(f"PDF dosyası bulunamadı: {args.pdf}")
+        return 1
+
+    started = time.perf_counter()
+    pipeline = RAGPipeline(
+        args.pdf,
+        args.chroma_dir,
+        chunker=make_chunker(args.chunker, args.chunk_size, args.overlap),
+        batch_size=args.batch_size,
+        workers=args.workers,
+        load=False,
+        embedder=make_embedder(args.chroma_dir, args.embedding_model, args.embedding_batch_size),
+        retriever=args.retriever,
+        index_dtype=args.index_dtype
+    )
+    summary = pipeline.ingest(force=args.force)
+    elapsed = time.perf_counter() - started
+
+    if summary["status"] in ("up_to_date", "unchanged"):
+        print(f"✅ Veritabanı zaten güncel ({elapsed:.1f} sn).")
+    else:
+        print(f"✅ {summary['pages']} sayfa, {summary['chunks']} parça yazıldı; "
+              f"{summary['removed']} sayfa silindi ({elapsed:.1f} sn).")
+    print(f"Toplam parça: {pipeline.collection.count()}")
+    cache = pipeline.embedder.cache.stats()
+    print(f"Embedding önbelleği: {cache['entries']} vektör, {cache['hits']} isabet, {cache['misses']} yeni hesaplama")
+    return 0
+
+
+def setup_corpus(args):
+    """Korpus modu: dizini eşitle veya yalnızca dokümanları aç/kapat/listele"""
+    if not os.path.isdir(args.pdf_dir):
+        print(f"PDF dizini bulunamadı: {args.pdf_dir}")
+        return 1
+    started = time.perf_counter()
+    corpus = CorpusManager(
+        args.pdf_dir,
+        args.chroma_dir,
+        chunker=make_chunker(args.chunker, args.chunk_size, args.overlap),
+        embedder=make_embedder(args.chroma_dir, args.embedding_model, args.embedding_batch_size),
+        retriever=args.retriever,
+        index_dtype=args.index_dtype,
+        batch_size=args.batch_size,
+        workers=args.workers,
+        load=False
+    )
+    try:
+        toggles = [(doc_id, True) for doc_id in args.enable] + [(doc_id, False) for doc_id in args.disable]
+        if toggles or args.list:
+            for doc_id, enabled in toggles:
+                try:
+                    corpus.set_enabled(doc_id, enabled)
+                except KeyError as e:
+                    print(e.args[0])
+                    return 1
+                print(f"{'✅ Açıldı' if enabled else '⏸️ Kapatıldı'}: {doc_id}")
+        else:
+            for doc_id, summary in corpus.sync(force=args.force).items():
+                if summary["status"] == "removed":
+                    print(f"🗑️ {doc_id}: PDF silinmiş, indeksi kaldırıldı")
+                elif summary["status"] in ("up_to_date", "unchanged"):
+                    print(f"✅ {doc_id}: zaten güncel")
+                else:
+                    print(f"✅ {doc_id}: {summary['pages']} sayfa, {summary['chunks']} parça yazıldı; "
+                          f"{summary['removed']} sayfa silindi")
+            print(f"Süre: {time.perf_counter() - started:.1f} sn")
+        for entry in corpus.list_documents():
+            state = "açık" if entry.get("enabled", True) else "kapalı"
+            print(f"  {entry['id']:<30} {state:<7} {entry.get('pages', '?')} sayfa, "
+                  f"{entry.get('chunks', '?')} parça  {entry.get('title') or ''}")
+    finally:
+        corpus.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+
+from models import answer_cache
+from models.answer_cache import SemanticAnswerCache
+
+VECTORS = {
+    "yanıkta ne yapılır": [1.0, 0.0, 0.0],
+    "yanık olunca ne yapmalı": [0.99, 0.1, 0.0],
+    "kanama nasıl durdurulur": [0.0, 1.0, 0.0],
+    "bayılan kişiye ne yapılır": [0.0, 0.0, 1.0],
+}
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+def embed(queries):
+    return [np.asarray(VECTORS[query], dtype=np.float32) for query in queries]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(answer_cache, "time", clock)
+    return clock
+
+
+def test_exact_and_semantic_hits():
+    cache = SemanticAnswerCache(embed, threshold=0.9)
+    cache.store("flan_t5", "yanıkta ne yapılır", "Soğuk suya tutun.")
+
+    assert cache.lookup("flan_t5", "Yanıkta ne yapılır?") == ("Soğuk suya tutun.", None)
+    assert cache.lookup("flan_t5", "yanık olunca ne yapmalı") == ("Soğuk suya tutun.", None)
+    assert cache.lookup("flan_t5", "kanama nasıl durdurulur") is None
+    assert cache.stats() == {"entries": 1, "hits": 2, "semantic_hits": 1, "misses": 1}
+
+
+def test_namespaces_are_separate():
+    cache = SemanticAnswerCache(embed)
+    cache.store("flan_t5", "yanıkta ne yapılır", "flan")
+
+    assert cache.lookup("gemini", "yanıkta ne yapılır") is None
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = SemanticAnswerCache(embed, ttl_seconds=60)
+    cache.store("flan_t5", "yanıkta ne yapılır", "cevap")
+
+    clock.now += 59
+    assert cache.lookup("flan_t5", "yanıkta ne yapılır") is not None
+    clock.now += 2
+    assert cache.lookup("flan_t5", "yanıkta ne yapılır") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = SemanticAnswerCache(embed, max_entries=2)
+    cache.store("flan_t5", "yanıkta ne yapılır", "yanık")
+    cache.store("flan_t5", "kanama nasıl durdurulur", "kanama")
+    cache.lookup("flan_t5", "yanıkta ne yapılır")
+    cache.store("flan_t5", "bayılan kişiye ne yapılır", "bayılma")
+
+    assert cache.lookup("flan_t5", "kanama nasıl durdurulur") is None
+    assert cache.lookup("flan_t5", "yanıkta ne yapılır") == ("yanık", None)
+    assert cache.lookup("flan_t5", "bayılan kişiye ne yapılır") == ("bayılma", None)
+
+
+def test_fingerprint_change_invalidates():
+    cache = SemanticAnswerCache(embed, fingerprint="a")
+    cache.store("flan_t5", "yanıkta ne yapılır", "cevap")
+
+    cache.set_fingerprint("a")
+    assert cache.lookup("flan_t5", "yanıkta ne yapılır") is not None
+    cache.set_fingerprint("b")
+    assert cache.lookup("flan_t5", "yanıkta ne yapılır") is None
+
+
+def test_persisted_entries_reload_only_for_same_fingerprint(tmp_path):
+    path = str(tmp_path / "answer_cache.json")
+    cache = SemanticAnswerCache(embed, persist_path=path, fingerprint="a", flush_interval=60)
+    cache.store("flan_t5", "yanıkta ne yapılır", "cevap", context=[{"page": 3}])
+    cache.close()
+
+    reopened = SemanticAnswerCache(embed, persist_path=path, fingerprint="a")
+    assert reopened.lookup("flan_t5", "yanık olunca ne yapmalı") == ("cevap", [{"page": 3}])
+    reopened.close()
+
+    stale = SemanticAnswerCache(embed, persist_path=path, fingerprint="b")
+    assert stale.stats()["entries"] == 0
+    stale.close()
@@ -0,0 +1,80 @@
+import threading
+
+import pytest
+
+from models.batching import MicroBatcher
+
+
+class RecordingHandler:
+    def __init__(self):
+        self.batches = []
+        self._lock = threading.Lock()
+
+    def __call__(self, items):
+        with self._lock:
+            self.batches.append(list(items))
+        return [item * 2 for item in items]
+
+
+def test_results_fan_out_to_each_caller():
+    handler = RecordingHandler()
+    batcher = MicroBatcher(handler, max_batch_size=8, max_wait_ms=200)
+    futures = [batcher.submit(i) for i in range(5)]
+
+    assert [future.result(timeout=5) for future in futures] == [0, 2, 4, 6, 8]
+    assert handler.batches == [[0, 1, 2, 3, 4]]
+    batcher.close()
+
+
+def test_concurrent_process_calls_share_batches():
+    handler = RecordingHandler()
+    batcher = MicroBatcher(handler, max_batch_size=4, max_wait_ms=200)
+    barrier = threading.Barrier(10)
+    results = {}
+
+    def worker(i):
+        barrier.wait()
+        results[i] = batcher.process(i, timeout=5)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == {i: i * 2 for i in range(10)}
+    assert sorted(item for batch in handler.batches for item in batch) == list(range(10))
+    assert all(len(batch) <= 4 for batch in handler.batches)
+    assert len(handler.batches) < 10
+    batcher.close()
+
+
+def test_handler_error_reaches_every_caller():
+    def failing(items):
+        raise ValueError("model hatası")
+
+    batcher = MicroBatcher(failing, max_wait_ms=100)
+    futures = [batcher.submit(i) for i in range(3)]
+
+    for future in futures:
+        with pytest.raises(ValueError):
+            future.result(timeout=5)
+    batcher.close()
+
+
+def test_result_length_mismatch_is_an_error():
+    batcher = MicroBatcher(lambda items: items[:1], max_wait_ms=100)
+    futures = [batcher.submit(i) for i in range(2)]
+
+    for future in futures:
+        with pytest.raises(RuntimeError):
+            future.result(timeout=5)
+    batcher.close()
+
+
+def test_closed_batcher_rejects_new_items():
+    batcher = MicroBatcher(RecordingHandler())
+    batcher.close()
+
+    with pytest.raises(RuntimeError):
+        batcher.submit(1)
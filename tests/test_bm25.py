@@ -0,0 +1,55 @@
+import os
+
+from rag.bm25 import BM25_FILENAME, BM25Index
+
+DOCUMENTS = [
+    ("p1-0", "Yanık bölgesini soğuk suya tutun."),
+    ("p2-0", "Kanayan yere temiz bezle baskı uygulayın."),
+    ("p3-0", "Bayılan kişinin bacaklarını yukarı kaldırın."),
+]
+
+
+class CountingDocuments:
+    def __init__(self, documents):
+        self.documents = documents
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return list(self.documents)
+
+
+def test_search_ranks_matching_document_first():
+    index = BM25Index.build(DOCUMENTS)
+
+    assert index.search("kanama baskı", k=1)[0][0] == "p2-0"
+    assert index.search("kanama baskı", k=3, allow=lambda doc_id: doc_id != "p2-0") == []
+
+
+def test_saved_index_is_reused_for_same_fingerprint(tmp_path):
+    documents = CountingDocuments(DOCUMENTS)
+    built = BM25Index.load_or_build(str(tmp_path), "fp1", documents)
+    loaded = BM25Index.load_or_build(str(tmp_path), "fp1", documents)
+
+    assert documents.calls == 1
+    assert os.path.exists(tmp_path / BM25_FILENAME)
+    assert loaded.search("yanık su", k=3) == built.search("yanık su", k=3)
+
+
+def test_index_is_rebuilt_when_fingerprint_changes(tmp_path):
+    BM25Index.load_or_build(str(tmp_path), "fp1", CountingDocuments(DOCUMENTS))
+    documents = CountingDocuments(DOCUMENTS[:1])
+    rebuilt = BM25Index.load_or_build(str(tmp_path), "fp2", documents)
+
+    assert documents.calls == 1
+    assert len(rebuilt) == 1
+    assert BM25Index.load(str(tmp_path / BM25_FILENAME)).fingerprint == "fp2"
+
+
+def test_corrupt_index_is_rebuilt(tmp_path):
+    (tmp_path / BM25_FILENAME).write_text("{bozuk", encoding="utf-8")
+    documents = CountingDocuments(DOCUMENTS)
+
+    index = BM25Index.load_or_build(str(tmp_path), "fp1", documents)
+    assert documents.calls == 1
+    assert len(index) == 3
@@ -0,0 +1,51 @@
+import pytest
+
+from models.intent_router import IntentRouter
+
+EXAMPLES = [
+    ("Greeting", "Merhaba, size nasıl yardımcı olabilirim?"),
+    ("Reject", "Üzgünüm, bu konuda yardımcı olamam."),
+    ("FirstAidInfo", "Yanık durumunda ne yapmalıyım?"),
+]
+
+
+@pytest.fixture(scope="module")
+def router():
+    return IntentRouter(examples=EXAMPLES)
+
+
+@pytest.mark.parametrize("query, intent", [
+    ("Merhaba", "Greeting"),
+    ("selam kanka", "Greeting"),
+    ("kesinlikle merhaba", "Greeting"),
+    ("merhaba çıkış", "Greeting"),
+    ("Merhaba, size nasıl yardımcı olabilirim?", "Greeting"),
+    ("Görüşürüz", "Goodbye"),
+    ("tamam", "Goodbye"),
+    ("Çok teşekkürler", "Thanks"),
+    ("Hava durumu nasıl?", "Reject"),
+    ("bitcoin fiyatı ne?", "Reject"),
+    ("Bana bir şiir yaz", "Reject"),
+])
+def test_social_and_reject_intents(router, query, intent):
+    assert router.route(query) == intent
+
+
+@pytest.mark.parametrize("query", [
+    "Merhaba, elimi kestim",
+    "Merhaba, yanıkta ne yapmalı?",
+    "Maç sırasında oyuncu bayıldı",
+    "Kod yazarken elimi kestim",
+    "peki ya çocuklarda?",
+    "Kanama nasıl durdurulur?",
+    "Yanık durumunda ne yapmalıyım?",
+    "",
+])
+def test_first_aid_queries_go_to_retrieval(router, query):
+    assert router.route(query) is None
+
+
+def test_dataset_reject_rows_are_responses_not_examples(router):
+    assert router.route("Üzgünüm, bu konuda yardımcı olamam.") is None
+    assert "Üzgünüm, bu konuda yardımcı olamam." in router.responses["Reject"]
+    assert router.respond("Reject") in router.responses["Reject"]
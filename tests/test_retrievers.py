@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from rag.retrievers import NumpyRetriever
+
+IDS = ["p1-0", "p1-1", "p2-0"]
+DOCUMENTS = ["yanık", "kanama", "bayılma"]
+METADATAS = [{"page": 1}, {"page": 1}, {"page": 2}]
+EMBEDDINGS = np.eye(3, dtype=np.float32)
+
+
+@pytest.fixture(params=["float32", "float16", "int8"])
+def index_dir(request, tmp_path):
+    retriever = NumpyRetriever(str(tmp_path), dtype=request.param)
+    retriever.upsert(IDS, DOCUMENTS, METADATAS, embeddings=EMBEDDINGS)
+    return str(tmp_path), request.param
+
+
+def test_query_returns_nearest_chunks(index_dir):
+    path, dtype = index_dir
+    retriever = NumpyRetriever(path, dtype=dtype)
+
+    result = retriever.query([[0.1, 0.9, 0.0]], n_results=2)
+    assert result["ids"] == [["p1-1", "p1-0"]]
+    assert result["documents"] == [["kanama", "yanık"]]
+    assert result["distances"][0][0] == pytest.approx(1 - 0.9 / np.hypot(0.1, 0.9), abs=1e-2)
+
+
+def test_where_filter_limits_results(index_dir):
+    path, dtype = index_dir
+    retriever = NumpyRetriever(path, dtype=dtype)
+
+    assert retriever.query([[0.0, 1.0, 0.0]], n_results=3, where={"page": 2})["ids"] == [["p2-0"]]
+    assert retriever.query([[0.0, 1.0, 0.0]], n_results=3, where={"page": 9})["ids"] == [[]]
+
+
+def test_reopened_index_keeps_data(index_dir):
+    path, dtype = index_dir
+    reopened = NumpyRetriever(path, dtype=dtype)
+
+    assert reopened.count() == 3
+    assert reopened.get(ids=["p2-0"]) == {"ids": ["p2-0"], "documents": ["bayılma"], "metadatas": [{"page": 2}]}
+
+
+def test_delete_and_upsert_are_seen_by_other_readers(index_dir):
+    path, dtype = index_dir
+    writer = NumpyRetriever(path, dtype=dtype)
+    reader = NumpyRetriever(path, dtype=dtype)
+
+    writer.delete(["p1-1"])
+    writer.upsert(["p1-0"], ["yanık (güncel)"], [{"page": 1}], embeddings=[[0.0, 1.0, 0.0]])
+
+    assert reader.count() == 2
+    result = reader.query([[0.0, 1.0, 0.0]], n_results=1)
+    assert result["ids"] == [["p1-0"]]
+    assert result["documents"] == [["yanık (güncel)"]]
+    assert NumpyRetriever(path, dtype=dtype).count() == 2
+
+
+def test_upsert_requires_embeddings(tmp_path):
+    with pytest.raises(ValueError):
+        NumpyRetriever(str(tmp_path)).upsert(["a"], ["metin"], [{}])
@@ -0,0 +1,113 @@
+import numpy as np
+import pytest
+
+from rag.sessions import SessionStore, is_followup, rewrite_followup
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def ask(store, session, question, answer="cevap"):
+    query = store.standalone_query(session, question)
+    store.record(session, question, query, answer, count_tokens=lambda text: len(text.split()))
+    return query
+
+
+@pytest.mark.parametrize("question, expected", [
+    ("peki ya çocuklarda?", True),
+    ("bebeklerde ya", True),
+    ("bunu nasıl yaparım?", True),
+    ("Onu bilmiyorum", False),
+    ("Yanıklarda ilk yardım nasıl yapılır?", False),
+    ("peki kalp masajı yaparken kaburga kırılırsa ne yapmalıyım?", False),
+])
+def test_is_followup(question, expected):
+    assert is_followup(question) is expected
+
+
+def test_rewrite_followup():
+    assert rewrite_followup("peki ya çocuklarda?", "Yanıklarda ilk yardım nasıl yapılır?") == \
+        "Yanıklarda ilk yardım nasıl yapılır, çocuklarda?"
+    assert rewrite_followup("Onu bilmiyorum", "Yanıklarda ilk yardım nasıl yapılır?") == "Onu bilmiyorum"
+    assert rewrite_followup("peki ya çocuklarda?", None) == "peki ya çocuklarda?"
+
+
+def test_followups_are_rewritten_against_the_topic():
+    store = SessionStore()
+    session = store.get("s1")
+    ask(store, session, "Yanıklarda ilk yardım nasıl yapılır?")
+
+    assert ask(store, session, "peki ya çocuklarda?") == "Yanıklarda ilk yardım nasıl yapılır, çocuklarda?"
+    assert ask(store, session, "peki bebeklerde?") == "Yanıklarda ilk yardım nasıl yapılır, bebeklerde?"
+    assert ask(store, session, "Kanama nasıl durdurulur?") == "Kanama nasıl durdurulur?"
+    assert ask(store, session, "peki ya burunda?") == "Kanama nasıl durdurulur, burunda?"
+
+
+def test_oldest_session_is_evicted_over_max_sessions():
+    store = SessionStore(max_sessions=2)
+    store.get("a")
+    store.get("b")
+    store.get("a")
+    store.get("c")
+
+    assert store.stats()["sessions"] == 2
+    assert store.stats()["evicted"] == 1
+    store.record(store.get("a"), "soru", "soru", "cevap", count_tokens=len)
+    assert store.history("a") == [{"question": "soru", "query": "soru", "answer": "cevap"}]
+    assert store.history("b") == []
+
+
+def test_idle_sessions_expire():
+    clock = FakeClock()
+    store = SessionStore(ttl_seconds=60, clock=clock)
+    ask(store, store.get("a"), "Yanık nasıl tedavi edilir?")
+    clock.now = 30
+    store.get("b")
+    clock.now = 61
+    store.get("c")
+
+    assert store.history("a") == []
+    assert store.stats()["sessions"] == 2
+
+
+def test_byte_budget_evicts_oldest_sessions():
+    store = SessionStore(max_bytes=2000, max_answer_chars=10_000)
+    for session_id in "abc":
+        ask(store, store.get(session_id), "Yanık nasıl tedavi edilir?", answer="x" * 800)
+
+    stats = store.stats()
+    assert stats["bytes"] <= 2000
+    assert store.history("a") == []
+    assert len(store.history("c")) == 1
+
+
+def test_turn_limit_drops_oldest_turns():
+    store = SessionStore(max_turns=2)
+    session = store.get("a")
+    for question in ("Yanık nedir?", "Kanama nedir?", "Bayılma nedir?"):
+        ask(store, session, question)
+
+    assert [turn["question"] for turn in store.history("a")] == ["Kanama nedir?", "Bayılma nedir?"]
+
+
+def test_similar_query_reuses_previous_context():
+    store = SessionStore(reuse_threshold=0.9)
+    session = store.get("a")
+    vectors = {"yanık": [1.0, 0.0], "yanıkta": [0.99, 0.05], "kanama": [0.0, 1.0]}
+    embed = lambda queries: [np.asarray(vectors[query]) for query in queries]
+    fetches = []
+
+    def fetch():
+        fetches.append(1)
+        return [{"text": "parça", "page": 1}]
+
+    assert store.context(session, "yanık", 3, fetch, embed) == ([{"text": "parça", "page": 1}], False)
+    assert store.context(session, "yanıkta", 2, fetch, embed)[1] is True
+    assert store.context(session, "yanıkta", 2, fetch, embed, scope={"page": 1})[1] is False
+    assert store.context(session, "kanama", 2, fetch, embed, scope={"page": 1})[1] is False
+    assert len(fetches) == 3